@@ -0,0 +1,328 @@
+import argparse
+import copy
+import http.client
+import io
+import json
+import platform
+import random
+import sys
+import threading
+import time
+
+from game_files import Game, CompactGame, RolloutGame, VectorGame
+from game_files.agents import ISMCTSPlayer, RandomPlayer
+from game_files.parallel import ParallelISMCTSPlayer, SearchPool
+from game_files.players import PlayerRole, TurnPhase
+
+# Engine benchmarks with fixed seeds, e.g.
+#	python Benchmark.py --output bench.json
+#	python Benchmark.py --baseline bench.json --tolerance 0.2
+# Every benchmark returns {metric: value}: metrics ending in _per_s are throughputs and the ones ending in _speedup are
+# throughputs relative to a serial run (higher is better), everything else is a cost in microseconds or a ratio (lower
+# is better). Against a baseline the exit code is 1 if any metric regressed
+
+# Average seconds per call of fn(state) over every prepared state, repeated until at least min_time has passed
+def measure(fn,states,min_time=0.2):
+	if not states:
+		raise ValueError("Nothing to measure")
+	calls = 0
+	elapsed = 0.0
+	while calls == 0 or elapsed < min_time:
+		for state in states:
+			t = time.perf_counter()
+			fn(state)
+			elapsed += time.perf_counter() - t
+			calls += 1
+	return elapsed/calls
+
+# Games from seeded random play stopped at their infect phase
+def infect_phase_games(game_class,count,seed=0):
+	rng = random.Random(seed)
+	games = []
+	g = 0
+	while len(games) < count:
+		game = game_class([RandomPlayer(),RandomPlayer()],log_game=False)
+		game.setup(seed=seed*100003+g)
+		g += 1
+		for turn in range(rng.randint(0,6)):
+			if game.turn_phase == TurnPhase.NEW:
+				game.game_turn()
+		if game.turn_phase != TurnPhase.NEW:
+			continue
+		game.start_turn()
+		while game.turn_phase == TurnPhase.ACTIONS or game.turn_phase == TurnPhase.DISCARD:
+			if game.turn_phase == TurnPhase.ACTIONS:
+				game.do_action(*game.players[game.current_player].request_action(game))
+			else:
+				game.do_discard(game.players[game.current_player].request_discard(game))
+		if game.turn_phase == TurnPhase.DRAW:
+			game.draw_phase()
+		if game.turn_phase == TurnPhase.INFECT:
+			games.append(game)
+	return games
+
+# Clones of seeded random games at every turn phase they go through, by phase, until there are count decisions
+# Every game has one player of each role of roles. Random players seldom fill their hands, hoarding players only drive
+# so that they have to discard every other turn
+def phase_states(count,roles=(PlayerRole.MEDIC,PlayerRole.SCIENTIST),seed=0,hoard=False):
+	states = {phase: [] for phase in (TurnPhase.NEW,TurnPhase.ACTIONS,TurnPhase.DRAW,TurnPhase.DISCARD,TurnPhase.INFECT)}
+	g = 0
+	while len(states[TurnPhase.ACTIONS]) < count:
+		game = Game([RandomPlayer() for role in roles],log_game=False)
+		game.setup(list(roles),seed=seed*100003+g)
+		g += 1
+		while game.game_state == game.game_state.PLAYING:
+			states[game.turn_phase].append(game.clone())
+			if game.turn_phase == TurnPhase.NEW:
+				game.start_turn()
+			elif game.turn_phase == TurnPhase.ACTIONS and hoard:
+				game.do_action("drive_ferry",{'target': game.agent_rng.choice(game.cities[game.players[game.current_player].position].neighbors)})
+			elif game.turn_phase == TurnPhase.ACTIONS:
+				game.do_action(*game.players[game.current_player].request_action(game))
+			elif game.turn_phase == TurnPhase.DISCARD:
+				game.do_discard(game.players[game.current_player].request_discard(game))
+			elif game.turn_phase == TurnPhase.DRAW:
+				game.draw_phase()
+			else:
+				game.end_turn()
+	return states
+
+def clone_benchmark(game_class,count=50):
+	games = infect_phase_games(game_class,count)
+	clones = []
+	results = {
+		'clone_us': measure(lambda game: clones.append(game.clone()),games)*1e6,
+		'deepcopy_us': measure(copy.deepcopy,games)*1e6,
+		'end_turn_us': measure(lambda game: game.end_turn(),[game.clone() for game in games for r in range(20)],min_time=0)*1e6
+	}
+	results['end_turn/clone'] = results['end_turn_us']/results['clone_us']
+	return results
+
+# Cost of every turn step, each applied once to its own clone of a state of that phase (repeat clones per state),
+# and of the read-only calls
+def step_benchmark(count=400,repeat=5,seed=0):
+	states = phase_states(count,seed=seed)
+	rng = random.Random(seed)
+	decisions = [(state.clone(),state.players[state.current_player].sample_action(state,rng)) for state in states[TurnPhase.ACTIONS] for r in range(repeat)]
+	discards = [(state.clone(),rng.choice(state.players[state.current_player].cards).name) for state in phase_states(count,seed=seed,hoard=True)[TurnPhase.DISCARD] for r in range(repeat)]
+	clones = lambda phase: [state.clone() for state in states[phase] for r in range(repeat)]
+	return {
+		'start_turn_us': measure(lambda game: game.start_turn(),clones(TurnPhase.NEW),min_time=0)*1e6,
+		'do_action_us': measure(lambda decision: decision[0].do_action(*decision[1]),decisions,min_time=0)*1e6,
+		'draw_phase_us': measure(lambda game: game.draw_phase(),clones(TurnPhase.DRAW),min_time=0)*1e6,
+		'do_discard_us': measure(lambda discard: discard[0].do_discard(discard[1]),discards,min_time=0)*1e6,
+		'end_turn_us': measure(lambda game: game.end_turn(),clones(TurnPhase.INFECT),min_time=0)*1e6,
+		'calculate_distances_us': measure(lambda game: game.calculate_distances(),states[TurnPhase.ACTIONS])*1e6,
+		'get_id_us': measure(lambda game: game.get_id(),states[TurnPhase.ACTIONS])*1e6,
+		'get_hash_us': measure(lambda game: game.get_hash(),states[TurnPhase.ACTIONS])*1e6,
+		'clone_us': measure(lambda game: game.clone(),states[TurnPhase.ACTIONS])*1e6,
+		'deepcopy_us': measure(copy.deepcopy,states[TurnPhase.ACTIONS][:count//4])*1e6
+	}
+
+def available_actions_cold(game):
+	player = game.players[game.current_player]
+	player.action_cache.clear()
+	return player.available_actions(game)
+
+# available_actions of the current player per role and phase, without its cache (cold) and asked again in the same state (cached)
+def available_actions_benchmark(count=200,seed=0):
+	roles = [PlayerRole.MEDIC,PlayerRole.OPERATIONS_EXPERT,PlayerRole.QUARANTINE_SPECIALIST,PlayerRole.RESEARCHER,PlayerRole.SCIENTIST,PlayerRole.DISPATCHER]
+	results = {}
+	for r,role in enumerate(roles):
+		states = phase_states(count,(role,roles[(r+1)%len(roles)]),seed)
+		states[TurnPhase.DISCARD] = phase_states(count,(role,roles[(r+1)%len(roles)]),seed,hoard=True)[TurnPhase.DISCARD]
+		for phase in (TurnPhase.ACTIONS,TurnPhase.DISCARD):
+			own = [state for state in states[phase] if state.players[state.current_player].playerrole==role]
+			name = role.name.lower()+"_"+phase.name.lower()
+			results[name+"_cold_us"] = measure(available_actions_cold,own)*1e6
+			results[name+"_cached_us"] = sum(measure(lambda game: game.players[game.current_player].available_actions(game),[state],min_time=0.002) for state in own[:20])/len(own[:20])*1e6
+	return results
+
+# Complete games of RandomPlayer per second through game_loop
+def games_benchmark(players=2,min_time=1.0,seed=0):
+	games, start = 0, time.perf_counter()
+	while time.perf_counter()-start < min_time:
+		game = Game([RandomPlayer() for p in range(players)],log_game=False)
+		game.setup(seed=seed*100003+games)
+		game.game_loop()
+		games += 1
+	return {'games_per_s': games/(time.perf_counter()-start)}
+
+# Decisions per second of random play, one Game at a time and N games in lockstep
+def vector_benchmark(n_games=1024,players=2,min_time=1.0,seed=0):
+	rng = random.Random(seed)
+	games, steps, start = 0, 0, time.perf_counter()
+	while time.perf_counter()-start < min_time:
+		game = Game([RandomPlayer() for p in range(players)],log_game=False)
+		game.setup(seed=seed*100003+games)
+		games += 1
+		while game.advance():
+			game.do_action_index(rng.choice(game.action_space.legal_action_mask(game).nonzero()[0]))
+			steps += 1
+	results = {'Game_steps_per_s': steps/(time.perf_counter()-start)}
+	rng = random.Random(seed)
+	games, steps, start = 0, 0, time.perf_counter()
+	while time.perf_counter()-start < min_time:
+		game = Game([RandomPlayer() for p in range(players)],log_game=False)
+		game.setup(seed=seed*100003+games)
+		games += 1
+		rollout = RolloutGame(game)
+		while rollout.advance():
+			rollout.step(rng.choice(rollout.legal_actions()))
+			steps += 1
+	results['RolloutGame_steps_per_s'] = steps/(time.perf_counter()-start)
+	vector = VectorGame(n_games,players,seed=seed)
+	steps, start = 0, time.perf_counter()
+	while time.perf_counter()-start < min_time:
+		steps += int((~vector.done).sum())
+		vector.step(vector.random_actions())
+		vector.reset(vector.done)
+	results['VectorGame_steps_per_s'] = steps/(time.perf_counter()-start)
+	return results
+
+def percentile(values,q):
+	values = sorted(values)
+	return values[min(int(q*len(values)),len(values)-1)]
+
+# Latency of /newgame and /game requests of Server.py on a local port, the human player takes random actions
+# The threaded server takes a new connection per request, the asyncio one keeps the same connection open
+def server_benchmark(requests=300,seed=0,asyncio=False):
+	import Server
+	class QuietHandler(Server.MyHandler):
+		def log_message(self,*args):
+			pass
+	Server.gameresults = io.StringIO()
+	random.seed(seed)
+	rng = random.Random(seed)
+	if asyncio:
+		server = Server.AsyncHTTPServer(("127.0.0.1",0))
+	else:
+		server = Server.ThreadingHTTPServer(("127.0.0.1",0),QuietHandler)
+	thread = threading.Thread(target=server.serve_forever,daemon=True)
+	thread.start()
+	if asyncio:
+		server.started.wait()
+	latencies = {'newgame': [], 'game': []}
+	kept = []
+	def get(path,kind):
+		connection = kept[0] if kept else http.client.HTTPConnection(*server.server_address)
+		start = time.perf_counter()
+		connection.request("GET",path)
+		body = connection.getresponse().read()
+		latencies[kind].append(time.perf_counter()-start)
+		if asyncio:
+			kept[:] = [connection]
+		else:
+			connection.close()
+		return body
+	try:
+		gid = None
+		while len(latencies['game']) < requests:
+			if gid is None:
+				state = json.loads(get("/newgame","newgame"))
+				gid, pid = state['gid'], state['pid']
+			game = Server.games[gid]
+			query = "pid="+pid+"&action=wait"
+			if game.current_player == 0 and game.turn_phase == TurnPhase.ACTIONS:
+				action, kwargs = game.players[0].sample_action(game,rng)
+				query = "pid="+pid+"&action="+action+"".join("&"+key+"="+("-".join(value) if isinstance(value,list) else str(value)) for key,value in kwargs.items())
+			elif game.current_player == 0 and game.turn_phase == TurnPhase.DISCARD:
+				query = "pid="+pid+"&action=discard&discard="+rng.choice(game.players[0].cards).name
+			get("/game"+gid+"?"+query,"game")
+			if game.game_state != game.game_state.PLAYING:
+				del Server.games[gid]
+				gid = None
+	finally:
+		for connection in kept:
+			connection.close()
+		server.shutdown()
+		server.server_close()
+	results = {}
+	for kind,values in latencies.items():
+		results[kind+"_mean_us"] = sum(values)/len(values)*1e6
+		results[kind+"_p50_us"] = percentile(values,0.5)*1e6
+		results[kind+"_p95_us"] = percentile(values,0.95)*1e6
+	return results
+
+# Iterations per second of ISMCTSPlayer and of ParallelISMCTSPlayer in both modes on every core, from the first decision
+# of seeded games, and their speedups over the serial search. Leaf mode selects in the calling process, the share of its
+# time spent there bounds its speedup
+def search_benchmark(iterations=1024,decisions=3,workers=None,seed=0):
+	agents = {'serial': lambda: ISMCTSPlayer(iterations=iterations),
+		'root': lambda: ParallelISMCTSPlayer(workers,"root",iterations=iterations),
+		'leaf': lambda: ParallelISMCTSPlayer(workers,"leaf",iterations=iterations)}
+	results = {}
+	selection = elapsed = 0.0
+	for name,agent in agents.items():
+		done, start = 0, time.perf_counter()
+		for d in range(decisions):
+			game = Game([agent(),agent()],log_game=False)
+			game.setup(seed=seed*100003+d)
+			game.advance()
+			player = game.players[game.current_player]
+			player.search_action(game)
+			done += player.search.stats['iterations']
+			if name == "leaf":
+				selection += player.search.stats['selection_time']
+				elapsed += player.search.stats['time']
+		results[name+'_iterations_per_s'] = done/(time.perf_counter()-start)
+	for name in ('root','leaf'):
+		results[name+'_speedup'] = results[name+'_iterations_per_s']/results['serial_iterations_per_s']
+	results['leaf_selection_share'] = selection/elapsed
+	SearchPool.close_all()
+	return results
+
+BENCHMARKS = {
+	'games': games_benchmark,
+	'steps': step_benchmark,
+	'available_actions': available_actions_benchmark,
+	'clone_Game': lambda: clone_benchmark(Game),
+	'clone_CompactGame': lambda: clone_benchmark(CompactGame),
+	'random_play': vector_benchmark,
+	'server': server_benchmark,
+	'server_asyncio': lambda: server_benchmark(asyncio=True),
+	'search': search_benchmark
+}
+
+def higher_is_better(metric):
+	return metric.endswith("_per_s") or metric.endswith("_speedup")
+
+# Relative change of every metric present in both runs, positive when worse, and the ones worse than tolerance
+def compare(results,baseline,tolerance=0.1):
+	changes = {}
+	regressions = []
+	for name,metrics in results.items():
+		for metric,value in metrics.items():
+			old = baseline.get(name,{}).get(metric)
+			if old is None or old == 0:
+				continue
+			change = (old-value)/old if higher_is_better(metric) else (value-old)/old
+			changes[name+"."+metric] = change
+			if change > tolerance:
+				regressions.append(name+"."+metric)
+	return changes,regressions
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Benchmarks the engine with fixed seeds")
+	parser.add_argument("--only",nargs="+",default=list(BENCHMARKS),choices=list(BENCHMARKS))
+	parser.add_argument("--output",default=None,help="JSON file receiving the results")
+	parser.add_argument("--baseline",default=None,help="JSON results of an earlier run to compare against")
+	parser.add_argument("--tolerance",type=float,default=0.1,help="relative change counted as a regression")
+	args = parser.parse_args()
+
+	results = {}
+	for name in args.only:
+		results[name] = BENCHMARKS[name]()
+		sys.stdout.write(name+": "+", ".join(metric+"="+format(value,".2f") for metric,value in results[name].items())+"\n")
+		sys.stdout.flush()
+	report = {'python': platform.python_version(), 'machine': platform.machine(), 'time': time.strftime("%Y-%m-%d %H:%M:%S"), 'results': results}
+	if args.output is not None:
+		with open(args.output,"w") as output:
+			json.dump(report,output,indent="\t")
+	if args.baseline is not None:
+		with open(args.baseline) as baseline:
+			changes, regressions = compare(results,json.load(baseline)['results'],args.tolerance)
+		for metric,change in sorted(changes.items()):
+			sys.stdout.write(("REGRESSION " if metric in regressions else "")+metric+": "+format(change*100,"+.1f")+"%\n")
+		sys.stdout.write(str(len(regressions))+" regressions over "+format(args.tolerance*100,".0f")+"%\n")
+		sys.exit(1 if regressions else 0)
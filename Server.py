@@ -3,13 +3,18 @@
 @author: Blopa
 """
 
-from city_cards import city_cards
-from Game import Game,Player,TurnPhase,GameState
-from Players import RandomPlayer
+from game_files.agents import RandomPlayer
+from game_files.cities import CITY_CARDS
+from game_files.game import Game, GameState
+from game_files.players import Player, TurnPhase
 
 import http.server as BaseHTTPServer
 import socketserver as SocketServer
 
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
 import hashlib
 import json
 import os
@@ -31,12 +36,92 @@ PORT_NUMBER = 31337
 
 # Logs
 errlog = sys.stdout if debug else open("server.log","w")
-gameresults = open("game_results.log","a")
+# Opened on the first finished game (see results_log), importing the module creates no file
+gameresults = None
+results_lock = threading.Lock()
 
-# Required to keep track of games and locking
-games = {}
+def results_log():
+	global gameresults
+	with results_lock:
+		if gameresults is None:
+			gameresults = open("game_results.log","a")
+		return gameresults
+
+# Games by gid, split in shards each behind its own lock so that requests for unrelated games seldom wait for each other
+# A shard lock only covers its dictionary: every game has its own lock, held by the request playing its steps
+class GameRegistry():
+	def __init__(self,shards=64):
+		self.shards = [{} for s in range(shards)]
+		self.locks = [threading.Lock() for s in range(shards)]
+	
+	def __len__(self):
+		return sum(len(shard) for shard in self.shards)
+	
+	def __contains__(self,gid):
+		return self.entry(gid) is not None
+	
+	def __getitem__(self,gid):
+		entry = self.entry(gid)
+		if entry is None:
+			raise KeyError(gid)
+		return entry[0]
+	
+	def __setitem__(self,gid,game):
+		s = hash(gid)%len(self.shards)
+		with self.locks[s]:
+			self.shards[s][gid] = (game,threading.Lock())
+	
+	def __delitem__(self,gid):
+		if self.pop(gid) is None:
+			raise KeyError(gid)
+	
+	# (game, lock) of gid or None
+	def entry(self,gid):
+		s = hash(gid)%len(self.shards)
+		with self.locks[s]:
+			return self.shards[s].get(gid)
+	
+	def get(self,gid,default=None):
+		entry = self.entry(gid)
+		return default if entry is None else entry[0]
+	
+	def pop(self,gid,default=None):
+		s = hash(gid)%len(self.shards)
+		with self.locks[s]:
+			entry = self.shards[s].pop(gid,None)
+		return default if entry is None else entry[0]
+	
+	# Snapshot of the games, taken one shard at a time
+	def values(self):
+		values = []
+		for shard, lock in zip(self.shards,self.locks):
+			with lock:
+				values.extend(game for game, game_lock in shard.values())
+		return values
+	
+	# Holds the lock of game gid while in the block, which gets the game or None if it does not exist (anymore)
+	@contextlib.contextmanager
+	def locked(self,gid):
+		entry = self.entry(gid)
+		if entry is None:
+			yield None
+			return
+		with entry[1]:
+			# It may have been removed while waiting for its lock
+			yield entry[0] if self.entry(gid) is entry else None
+	
+	# Removes the games idle since before deadline, one shard at a time, and returns their (gid, game, lock)
+	def collect(self,deadline):
+		removed = []
+		for shard, lock in zip(self.shards,self.locks):
+			with lock:
+				gids = [gid for gid, (game, game_lock) in shard.items() if game.ping <= deadline]
+				removed.extend((gid,*shard.pop(gid)) for gid in gids)
+		return removed
+
+# Required to keep track of games and participants
+games = GameRegistry()
 participants = {}
-gamelock = threading.Lock()
 
 # Types of computer players
 computers = [RandomPlayer]
@@ -45,34 +130,27 @@ computers = [RandomPlayer]
 def signal_handler(signal, frame):
 	errlog.write("Signal - kill received\n")
 	errlog.flush()
-	for g in games:
-		games[g].close_game()
+	for game in games.values():
+		game.close_game()
 	sys.exit(0)
-signal.signal(signal.SIGINT, signal_handler)
 
-# In charge of removing idle games (>=30 minutes)
+# In charge of removing idle games (>=30 minutes), closed outside of the registry locks once their last request is over
 def garbage_collector():
 	while True:
 		time.sleep(300)
 		print("Garbage collection cycle")
-		gamelock.acquire()
-		gids = list(games.keys())
-		t = time.time()
-		for g in gids:
-			if t - games[g].ping >= 1800:
-				print("Removing:",g)
-				try:
-					# Closes game, removes it from games dict
-					games[g].close_game()
-					del games[g]
-				except Exception:
-					# No idea what this is 
-					traceback.print_exc()
-		gamelock.release()
+		for g, game, lock in games.collect(time.time()-1800):
+			print("Removing:",g)
+			try:
+				with lock:
+					game.close_game()
+			except Exception:
+				# No idea what this is 
+				traceback.print_exc()
 
 # Child class special for the server
 class ServerGame(Game):
-	def __init__(self,gid,players,epidemic_cards=5,cities=city_cards,starting_city="atlanta",number_cubes=24):
+	def __init__(self,gid,players,epidemic_cards=5,cities=CITY_CARDS,starting_city="atlanta",number_cubes=24):
 		self.time_init = time.time()
 		self.ping = self.time_init
 		self.gid = gid
@@ -81,103 +159,88 @@ class ServerGame(Game):
 	def close_game(self):
 		print(time.asctime() + " Closing game: "+self.gid)
 		if log_games:
-			self.logger.close()
+			self.commons['logger'].close()
 
-# Handler for the server
-class MyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
-	def do_HEAD(self):
-		self.send_response(200)
-		self.send_header("Content-type", "text/html")
-		self.end_headers()
-		
-	def do_GET(self):
-		try:
-			return self.perform_response()
-		except Exception:
-			errlog.write(traceback.format_exc())
-			errlog.flush()
+# Reply to a request, independent of the server that sends it: the body is either bytes or the name of a file to stream
+class Response():
+	def __init__(self,status,content_type=None,body=b"",cors=False,filename=None):
+		self.status = status
+		self.content_type = content_type
+		self.body = body
+		self.cors = cors
+		self.filename = filename
 	
-	def invalid(self,gid,ispid=False):
-		return len(gid)!=16 or len([c for c in gid if c not in string.hexdigits])!=0 or ((gid not in participants) if ispid else (gid not in games))
-		
-	def writestring(self, s):
-		self.wfile.write(s.encode("utf-8"))
-	
-	def ok(self,content_type="text/html"):
-		self.send_response(200)
-		self.send_header("Content-type", content_type)
-		self.send_header("Access-Control-Allow-Credentials", "true")
-		self.send_header("Access-Control-Allow-Headers", "Accept, X-Access-Token, X-Application-Name, X-Request-Sent-Time")
-		self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-		self.send_header("Access-Control-Allow-Origin", "*")
-		self.end_headers()
-	
-	def send_text(self,filename):
-		self.ok()
-		f = open(filename,"r")
-		lines = f.readlines()
-		f.close()
-		for line in lines:
-			self.writestring(line)
+	def headers(self):
+		headers = [("Content-type",self.content_type)] if self.content_type is not None else []
+		if self.cors:
+			headers.extend(CORS_HEADERS)
+		return headers
 	
-	def perform_response(self,tvars = {}):
-		game = None
-		# Main page = consent page
-		if not self.path or self.path == "/" or self.path.startswith("/consent"):
-			self.send_text("html/consent.html")
-			return
-		if self.path.startswith("/tutorial"):
-			self.send_text("html/tutorial.html")
-			return
-		if (self.path.startswith("/build/") or self.path.startswith("/images/")) and ".." not in self.path:
-			fname = self.path[1:]
-			if os.path.exists(fname) and os.path.isfile(fname):
-				f = open(fname, "rb")
-				self.send_response(200)
-				self.end_headers()
-				shutil.copyfileobj(f, self.wfile)
-				f.close()
-			else:
-				self.send_response(404)
-				self.end_headers()
-				self.wfile.write("Not found".encode("utf8"))
-			return			
-		if self.path.startswith("/newgame"):
-			self.ok("text/json")
-			gamelock.acquire()
-			pid = self.getgid()
-			ai = random.choice(computers)
-			# TODO: In participants save information regarding randomness selection and player roles
-			participants[pid] = [ai.__name__]
-			gid = self.getgid()
-			game = ServerGame(gid,[Player(),ai()])
-			games[gid] = game
-			gamelock.release()
-			game.setup()
-			if game.current_player != 0:
-				game.game_turn()
-			game.start_turn()
-			game_state = game()
-			game_state.update({"gid": gid, "pid": pid})
-			game_state = json.dumps(game_state,indent="\t").split('\n')	
-			for line in game_state:
-				self.writestring(line)
-			return
-		if self.path.startswith("/game"):
-			gid = self.path[5:self.path.find('?')]
-			gamelock.acquire()
-			if gid in games:
-				game = games[gid]
-			else:
+	def length(self):
+		return os.path.getsize(self.filename) if self.filename is not None else len(self.body)
+
+CORS_HEADERS = [
+	("Access-Control-Allow-Credentials", "true"),
+	("Access-Control-Allow-Headers", "Accept, X-Access-Token, X-Application-Name, X-Request-Sent-Time"),
+	("Access-Control-Allow-Methods", "GET, POST, OPTIONS"),
+	("Access-Control-Allow-Origin", "*")
+]
+
+def invalid(gid,ispid=False):
+	return len(gid)!=16 or len([c for c in gid if c not in string.hexdigits])!=0 or ((gid not in participants) if ispid else (gid not in games))
+
+def getgid(peer):
+	peer = str(peer) + str(time.time()) + str(os.urandom(4))
+	return hashlib.sha224(peer.encode("utf8")).hexdigest()[:16]
+
+def json_response(game_state):
+	# Sent without line breaks, as the client always got it
+	return Response(200,"text/json","".join(json.dumps(game_state,indent="\t").split('\n')).encode("utf-8"),cors=True)
+
+def text_response(filename):
+	f = open(filename,"rb")
+	body = f.read()
+	f.close()
+	return Response(200,"text/html",body,cors=True)
+
+# Answers a GET of path from peer (used for the ids of new games), shared by both servers
+def respond(path,peer):
+	game = None
+	# Main page = consent page
+	if not path or path == "/" or path.startswith("/consent"):
+		return text_response("html/consent.html")
+	if path.startswith("/tutorial"):
+		return text_response("html/tutorial.html")
+	if (path.startswith("/build/") or path.startswith("/images/")) and ".." not in path:
+		fname = path[1:]
+		if os.path.exists(fname) and os.path.isfile(fname):
+			return Response(200,filename=fname)
+		return Response(404,body="Not found".encode("utf8"))
+	if path.startswith("/newgame"):
+		pid = getgid(peer)
+		ai = random.choice(computers)
+		# TODO: In participants save information regarding randomness selection and player roles
+		participants[pid] = [ai.__name__]
+		gid = getgid(peer)
+		game = ServerGame(gid,[Player(),ai()])
+		game.setup()
+		if game.current_player != 0:
+			game.game_turn()
+		game.start_turn()
+		game_state = game()
+		game_state.update({"gid": gid, "pid": pid})
+		# Only reachable once set up, no other request can see it half done
+		games[gid] = game
+		return json_response(game_state)
+	if path.startswith("/game"):
+		gid = path[5:path.find('?')]
+		# The whole step sequence runs under the lock of the game: requests of the same game are played in turn
+		with games.locked(gid) as game:
+			if game is None:
 				print("Game not found, gid: "+gid)
-				gamelock.release()
-				self.send_response(400)
-				self.send_header("Content-type", "text/html")
-				self.end_headers()
-				return
-			gamelock.release()
+				return Response(400,"text/html")
 			game.ping = time.time()
-			path = self.path[self.path.find('?')+1:]
+			path = path[path.find('?')+1:]
 			get_dictionary = {get[:get.find("=")]: get[get.find("=")+1:] for get in path.split("&")}
 			pid = get_dictionary['pid']
 			del get_dictionary['pid']
@@ -226,23 +289,41 @@ class MyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
 					game.end_turn()
 				if game.turn_phase==TurnPhase.NEW:
 					game.start_turn()
-			self.ok("text/json")
-			game_state = json.dumps(game(),indent="\t").split('\n')
-			for line in game_state:
-				self.writestring(line)
+			response = json_response(game())
 			if game.game_state==GameState.LOST or game.game_state==GameState.WON:
 				# Saves game results to game_results.log
-				gameresults.write(",".join([gid, pid, str(time.time() - game.time_init),*[str(param) for param in participants[pid]],game.game_state.name,str(sum(list(game.cures.values()))),str(sum(list(game.eradicated.values()))),str(len(game.player_deck.deck)),str(game.outbreak_counter),*[str(value) for value in game.remaining_disease_cubes.values()]])+"\n")
+				results_log().write(",".join([gid, pid, str(time.time() - game.time_init),*[str(param) for param in participants[pid]],game.game_state.name,str(sum(list(game.cures.values()))),str(sum(list(game.eradicated.values()))),str(len(game.player_deck.deck)),str(game.outbreak_counter),*[str(value) for value in game.remaining_disease_cubes.values()]])+"\n")
 				# Results: gid, pid, time_taken, participants info, won/loss, cures_found, eradicated_diseases, pcards_remaining, outbreaks, disease_cubes_remaining x4
 				# TODO: record player answers to survey
-			return
-		self.send_response(400)
+			return response
+	return Response(400,"text/html")
+
+# Handler for the threaded server
+class MyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	def do_HEAD(self):
+		self.send_response(200)
 		self.send_header("Content-type", "text/html")
 		self.end_headers()
-
-	def getgid(self):
-		peer = str(self.connection.getpeername()) + str(time.time()) + str(os.urandom(4))
-		return hashlib.sha224(peer.encode("utf8")).hexdigest()[:16]
+		
+	def do_GET(self):
+		try:
+			return self.perform_response()
+		except Exception:
+			errlog.write(traceback.format_exc())
+			errlog.flush()
+	
+	def perform_response(self):
+		response = respond(self.path,self.connection.getpeername())
+		self.send_response(response.status)
+		for header in response.headers():
+			self.send_header(*header)
+		self.end_headers()
+		if response.filename is not None:
+			f = open(response.filename, "rb")
+			shutil.copyfileobj(f, self.wfile)
+			f.close()
+		else:
+			self.wfile.write(response.body)
 
 class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
 	# Actually processes the request by instantiating RequestHandlerClass and calling its handle() method.
@@ -251,13 +332,145 @@ class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer
 		# "super" can not be used because BaseServer is not created from object
 		BaseHTTPServer.HTTPServer.finish_request(self, request, client_address) 
 
+# Single thread asyncio server with persistent (keep-alive) connections for many concurrent sessions
+#	max_connections: connections over it are answered 503 and closed
+#	max_requests: requests handled at once (games are played in a pool of workers threads), the others wait for a slot
+#	and stop reading from their connection meanwhile
+#	keep_alive: seconds an idle connection is kept open
+#	max_body: largest request body read (and discarded), longer ones are answered 413 and the connection closed
+# Bodies are written with backpressure (the writer is drained after every chunk of a file)
+class AsyncHTTPServer():
+	REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error", 501: "Not Implemented", 503: "Service Unavailable"}
+	CHUNK = 1<<16
+
+	def __init__(self,address,max_connections=10000,max_requests=64,workers=None,keep_alive=30,max_body=1<<16):
+		self.address = address
+		self.max_connections = max_connections
+		self.max_requests = max_requests
+		self.keep_alive = keep_alive
+		self.max_body = max_body
+		self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+		self.connections = 0
+		self.server = None
+		self.server_address = address
+		self.started = threading.Event()
+
+	async def serve(self):
+		self.loop = asyncio.get_running_loop()
+		self.requests = asyncio.Semaphore(self.max_requests)
+		self.stopping = asyncio.Event()
+		self.server = await asyncio.start_server(self.handle_connection,*self.address)
+		self.server_address = self.server.sockets[0].getsockname()[:2]
+		self.started.set()
+		async with self.server:
+			await self.stopping.wait()
+
+	# Same interface as the socketserver servers, shutdown is called from another thread
+	def serve_forever(self):
+		asyncio.run(self.serve())
+
+	def shutdown(self):
+		self.loop.call_soon_threadsafe(self.stopping.set)
+
+	def server_close(self):
+		self.executor.shutdown(wait=False)
+
+	async def handle_connection(self,reader,writer):
+		peer = writer.get_extra_info("peername")
+		if self.connections >= self.max_connections:
+			await self.send(writer,Response(503,"text/html"),False)
+			writer.close()
+			return
+		self.connections += 1
+		try:
+			keep = True
+			while keep:
+				try:
+					head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),self.keep_alive)
+				except (asyncio.TimeoutError,asyncio.IncompleteReadError,asyncio.LimitOverrunError,ConnectionError):
+					break
+				lines = head.decode("latin-1").split("\r\n")
+				parts = lines[0].split()
+				if len(parts) != 3:
+					await self.send(writer,Response(400,"text/html"),False)
+					break
+				method, path, version = parts
+				headers = {line[:line.find(":")].strip().lower(): line[line.find(":")+1:].strip() for line in lines[1:] if ":" in line}
+				try:
+					length = int(headers.get("content-length",0))
+				except ValueError:
+					length = -1
+				if length < 0:
+					await self.send(writer,Response(400,"text/html"),False)
+					break
+				if length > self.max_body:
+					await self.send(writer,Response(413,"text/html"),False)
+					break
+				if length > 0:
+					await reader.readexactly(length)
+				connection = headers.get("connection","").lower()
+				keep = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+				if method == "HEAD":
+					response = Response(200,"text/html")
+				elif method != "GET":
+					response = Response(501,"text/html")
+				else:
+					async with self.requests:
+						try:
+							response = await asyncio.get_running_loop().run_in_executor(self.executor,respond,path,peer)
+						except Exception:
+							errlog.write(traceback.format_exc())
+							errlog.flush()
+							response = Response(500,"text/html")
+							keep = False
+				await self.send(writer,response,keep,method != "HEAD")
+		except (ConnectionError,asyncio.IncompleteReadError):
+			pass
+		finally:
+			self.connections -= 1
+			writer.close()
+
+	async def send(self,writer,response,keep,body=True):
+		head = ["HTTP/1.1 "+str(response.status)+" "+self.REASONS.get(response.status,"")]
+		head.extend(name+": "+value for name,value in response.headers())
+		head.append("Content-Length: "+str(response.length() if body else 0))
+		head.append("Connection: "+("keep-alive" if keep else "close"))
+		writer.write(("\r\n".join(head)+"\r\n\r\n").encode("latin-1"))
+		if not body:
+			await writer.drain()
+		elif response.filename is None:
+			writer.write(response.body)
+			await writer.drain()
+		else:
+			loop = asyncio.get_running_loop()
+			f = open(response.filename,"rb")
+			try:
+				chunk = await loop.run_in_executor(self.executor,f.read,self.CHUNK)
+				while chunk:
+					writer.write(chunk)
+					await writer.drain()
+					chunk = await loop.run_in_executor(self.executor,f.read,self.CHUNK)
+			finally:
+				f.close()
+
 # Executed if main		
 if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="PAIndemic server")
+	parser.add_argument("--asyncio",action="store_true",help="single thread asyncio server with keep-alive instead of a thread per request")
+	parser.add_argument("--max-connections",type=int,default=10000,help="open connections of the asyncio server")
+	parser.add_argument("--max-requests",type=int,default=64,help="requests handled at once by the asyncio server")
+	parser.add_argument("--workers",type=int,default=None,help="threads playing the games of the asyncio server")
+	parser.add_argument("--max-body",type=int,default=1<<16,help="largest request body accepted by the asyncio server")
+	args = parser.parse_args()
+	signal.signal(signal.SIGINT, signal_handler)
 	# Creates logs folder
 	if not os.path.exists("logs/"):
 		os.makedirs("logs")
 	# Creates server, requires ((HOST, PORT), MyTCPHandler)
-	server = ThreadingHTTPServer((HOST_NAME, PORT_NUMBER), MyHandler)
+	if args.asyncio:
+		server = AsyncHTTPServer((HOST_NAME, PORT_NUMBER),args.max_connections,args.max_requests,args.workers,max_body=args.max_body)
+	else:
+		server = ThreadingHTTPServer((HOST_NAME, PORT_NUMBER), MyHandler)
 	errlog.write(time.asctime() + " Server Starts - %s:%s\n" % (HOST_NAME, PORT_NUMBER))
 	errlog.flush()
 	# Threads the garbage collector
@@ -3,18 +3,54 @@
 @author: Blopa
 """
 
-from Game import Game
-from Players import RandomPlayer
+import argparse
+import itertools
+import sys
 
-game_test = Game([RandomPlayer() for i in range(2)])
+from game_files.players import PlayerRole
+from game_files.records import RecordWriter
+from game_files.tournament import Tournament
 
-errors = 0
-for t in range(100000):
-	if (t+1)%10000 == 0:
-		print("Game: "+str(t+1))
-	game_test.setup()
-	game_test.game_loop()
-	if game_test.commons['error_flag']:
-		errors += 1
+# Plays every agent against every combination of the given configuration values over a process pool
+# e.g. python Tests.py --games 1000 --agents RandomPlayer --players 2 3 --epidemic-cards 4 5 --output results.csv
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description="Plays games of every agent under every configuration in parallel")
+	parser.add_argument("--games",type=int,default=100000,help="games per agent and configuration")
+	parser.add_argument("--agents",nargs="+",default=["RandomPlayer"],help="classes of game_files.agents or module:Class")
+	parser.add_argument("--players",type=int,nargs="+",default=[2])
+	parser.add_argument("--epidemic-cards",type=int,nargs="+",default=[4])
+	parser.add_argument("--number-cubes",type=int,nargs="+",default=[24])
+	parser.add_argument("--roles",nargs="+",default=None,help="fixed roles for every game, e.g. MEDIC SCIENTIST")
+	parser.add_argument("--workers",type=int,default=None,help="processes, all cores by default")
+	parser.add_argument("--seed",type=int,default=0)
+	parser.add_argument("--output",default=None,help="CSV file receiving one line per game as they finish")
+	parser.add_argument("--records",default=None,help="file the record of every game is appended to (see game_files/records.py)")
+	parser.add_argument("--progress",type=int,default=10000,help="prints the games played every this many games")
+	args = parser.parse_args()
 
-print("Total errors: "+str(errors))
+	roles = [PlayerRole[role] for role in args.roles] if args.roles else None
+	configs = [{'players': p, 'epidemic_cards': e, 'number_cubes': n, 'roles': roles} for p,e,n in itertools.product(args.players,args.epidemic_cards,args.number_cubes)]
+	tournament = Tournament(args.agents,configs,args.games,args.workers,args.seed,record=args.records is not None)
+	output = open(args.output,"w") if args.output else None
+	records = RecordWriter(args.records) if args.records else None
+	columns = None
+	played = 0
+	for result in tournament.run():
+		played += 1
+		if records is not None and 'record' in result:
+			records.write(result.pop('record'))
+		if output is not None:
+			if columns is None:
+				columns = [key for key in result if key != 'traceback']
+				output.write(",".join(columns)+"\n")
+			output.write(",".join(str(result.get(column,"")) for column in columns)+"\n")
+		if 'traceback' in result:
+			sys.stderr.write(result['traceback'])
+		if played%args.progress == 0:
+			print("Game: "+str(played))
+	if output is not None:
+		output.close()
+	if records is not None:
+		records.close()
+	print(tournament)
+	print("Total errors: "+str(sum(summary.errors for summary in tournament.summaries.values())))
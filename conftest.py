@@ -0,0 +1 @@
+# Makes game_files importable from the tests under tests/ when pytest runs from the repository root
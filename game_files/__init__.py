@@ -1 +1,5 @@
-from .game import Game
\ No newline at end of file
+from .actions import ActionSpace, legal_action_mask
+from .game import Game
+from .rollout import RolloutGame
+from .state import CompactGame
+from .vector import VectorGame
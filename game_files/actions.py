@@ -0,0 +1,189 @@
+import numpy as np
+
+from .decks import CardType
+from .players import Player, PlayerRole, TurnPhase
+
+# Fixed integer encoding of every action of a map and player count, one block per action type:
+#	drive_ferry, direct_flight, charter_flight, shuttle_flight: target city
+#	build_researchstation: no replacement followed by the city losing its research station
+#	treat_disease, discover_cure: color (cures use the canonical choice of cards, see cure_cards)
+#	give_knowledge, receive_knowledge: other player's pid x city card
+#	rally_flight: player pid x target player pid
+#	special_charter_flight: discarded city card x target city
+#	discard: city card
+class ActionSpace():
+	_cache = {}
+
+	@classmethod
+	def get(cls,tables,players):
+		space = cls._cache.get((id(tables),players))
+		if space is None or space.tables is not tables:
+			space = cls(tables,players)
+			cls._cache[(id(tables),players)] = space
+		return space
+
+	def __repr__(self):
+		return "ActionSpace: "+str(self.size)+" actions ("+", ".join(name+"="+str(self.sizes[name]) for name in self.names)+")"
+
+	def __init__(self,tables,players):
+		self.tables = tables
+		self.players = players
+		V, C, P = tables.n_cities, tables.n_colors, players
+		shapes = [
+			(Player.drive_ferry.__name__,(V,)),
+			(Player.direct_flight.__name__,(V,)),
+			(Player.charter_flight.__name__,(V,)),
+			(Player.shuttle_flight.__name__,(V,)),
+			(Player.build_researchstation.__name__,(V+1,)),
+			(Player.treat_disease.__name__,(C,)),
+			(Player.give_knowledge.__name__,(P,V)),
+			(Player.receive_knowledge.__name__,(P,V)),
+			(Player.discover_cure.__name__,(C,)),
+			(Player.rally_flight.__name__,(P,P)),
+			(Player.special_charter_flight.__name__,(V,V)),
+			(Player.discard.__name__,(V,))
+		]
+		self.names = [name for name,shape in shapes]
+		self.shapes = dict(shapes)
+		self.sizes = {name: int(np.prod(shape)) for name,shape in shapes}
+		self.offsets = {}
+		self.size = 0
+		for name in self.names:
+			self.offsets[name] = self.size
+			self.size += self.sizes[name]
+		# Block of every index, used by decode
+		self.block_of = np.zeros(self.size,dtype=np.int8)
+		for b,name in enumerate(self.names):
+			self.block_of[self.offsets[name]:self.offsets[name]+self.sizes[name]] = b
+
+	# Canonical cards for a cure: the player's cards of that color with the lowest map index
+	def cure_cards(self,game,player,color):
+		needed = 4 if player.playerrole==PlayerRole.SCIENTIST else 5
+		cards = [card.name for card in player.cards if card.cardtype==CardType.CITY and card.name in game.cities and game.cities[card.name].color==color]
+		if len(cards) < needed:
+			return None
+		cards.sort(key=self.tables.index.get)
+		return cards[:needed]
+
+	def encode(self,action,kwargs):
+		index = self.tables.index
+		offset = self.offsets[action]
+		if action in (Player.drive_ferry.__name__,Player.direct_flight.__name__,Player.charter_flight.__name__,Player.shuttle_flight.__name__):
+			return offset+index[kwargs['target']]
+		if action == Player.build_researchstation.__name__:
+			replace = kwargs.get('replace')
+			return offset if replace is None or replace=="none" else offset+1+index[replace]
+		if action in (Player.treat_disease.__name__,Player.discover_cure.__name__):
+			return offset+self.tables.color_index[kwargs['color']]
+		if action == Player.give_knowledge.__name__:
+			return offset+(kwargs['receiver']%self.players)*self.tables.n_cities+index[kwargs['target']]
+		if action == Player.receive_knowledge.__name__:
+			return offset+(kwargs['giver']%self.players)*self.tables.n_cities+index[kwargs['target']]
+		if action == Player.rally_flight.__name__:
+			return offset+(kwargs['player']%self.players)*self.players+kwargs['target_player']%self.players
+		if action == Player.special_charter_flight.__name__:
+			return offset+index[kwargs['discard']]*self.tables.n_cities+index[kwargs['target']]
+		if action == Player.discard.__name__:
+			return offset+index[kwargs['discard']]
+		raise ValueError("Action without integer encoding: "+str(action))
+
+	# Returns (action, kwargs) as expected by Game.do_action, the game is needed to pick the cards of a cure
+	def decode(self,game,action_index):
+		action = self.names[self.block_of[action_index]]
+		i = int(action_index)-self.offsets[action]
+		names = self.tables.names
+		V = self.tables.n_cities
+		if action in (Player.drive_ferry.__name__,Player.direct_flight.__name__,Player.charter_flight.__name__,Player.shuttle_flight.__name__):
+			return action,{'target': names[i]}
+		if action == Player.build_researchstation.__name__:
+			return action,{'replace': "none" if i==0 else names[i-1]}
+		if action == Player.treat_disease.__name__:
+			return action,{'color': self.tables.colors[i]}
+		if action == Player.give_knowledge.__name__:
+			return action,{'receiver': i//V, 'target': names[i%V]}
+		if action == Player.receive_knowledge.__name__:
+			return action,{'giver': i//V, 'target': names[i%V]}
+		if action == Player.discover_cure.__name__:
+			color = self.tables.colors[i]
+			return action,{'color': color, 'chosen_cards': self.cure_cards(game,game.players[game.current_player],color)}
+		if action == Player.rally_flight.__name__:
+			return action,{'player': i//self.players, 'target_player': i%self.players}
+		if action == Player.special_charter_flight.__name__:
+			return action,{'discard': names[i//V], 'target': names[i%V]}
+		return action,{'discard': names[i]}
+
+	# Same legal moves as Player.available_actions for the current player, with cures collapsed to one per color
+	def legal_action_mask(self,game,out=None):
+		mask = np.zeros(self.size,dtype=bool) if out is None else out
+		mask[:] = False
+		player = game.players[game.current_player]
+		tables = self.tables
+		index = tables.index
+		V = tables.n_cities
+		hand = [index[card.name] for card in player.cards if card.cardtype==CardType.CITY and card.name in index]
+		if game.turn_phase == TurnPhase.ACTIONS:
+			position = index[player.position]
+			city = game.cities[player.position]
+			at_station = city.research_station
+			stations = game.distances.stations
+			offset = self.offsets[Player.drive_ferry.__name__]
+			for neighbor in tables.neighbors[position]:
+				mask[offset+neighbor] = True
+			offset = self.offsets[Player.direct_flight.__name__]
+			for card in hand:
+				if card != position:
+					mask[offset+card] = True
+			if position in hand:
+				offset = self.offsets[Player.charter_flight.__name__]
+				mask[offset:offset+V] = True
+				mask[offset+position] = False
+			if at_station and game.research_station_counter>1:
+				offset = self.offsets[Player.shuttle_flight.__name__]
+				for station in stations:
+					if station != position:
+						mask[offset+station] = True
+			if (position in hand or player.playerrole==PlayerRole.OPERATIONS_EXPERT) and not at_station:
+				offset = self.offsets[Player.build_researchstation.__name__]
+				if game.research_station_counter < 6:
+					mask[offset] = True
+				else:
+					for station in stations:
+						mask[offset+1+station] = True
+			offset = self.offsets[Player.treat_disease.__name__]
+			for c,color in enumerate(tables.colors):
+				if city.disease_cubes[color]>0:
+					mask[offset+c] = True
+			give = self.offsets[Player.give_knowledge.__name__]
+			receive = self.offsets[Player.receive_knowledge.__name__]
+			for other in game.players:
+				if other is not player and other.position==player.position:
+					for card in hand:
+						if card==position or player.playerrole==PlayerRole.RESEARCHER:
+							mask[give+other.pid*V+card] = True
+					for card in other.cards:
+						if card.cardtype==CardType.CITY and card.name in index and (card.name==player.position or other.playerrole==PlayerRole.RESEARCHER):
+							mask[receive+other.pid*V+index[card.name]] = True
+			if at_station:
+				offset = self.offsets[Player.discover_cure.__name__]
+				needed = 4 if player.playerrole==PlayerRole.SCIENTIST else 5
+				counts = np.bincount(tables.city_color[hand],minlength=tables.n_colors) if hand else np.zeros(tables.n_colors,dtype=np.int64)
+				mask[offset:offset+tables.n_colors] = counts>=needed
+			if player.playerrole == PlayerRole.DISPATCHER:
+				offset = self.offsets[Player.rally_flight.__name__]
+				for p,moved in enumerate(game.players):
+					for t,target in enumerate(game.players):
+						if moved.position != target.position:
+							mask[offset+p*self.players+t] = True
+			if player.playerrole==PlayerRole.OPERATIONS_EXPERT and player.special_move and at_station:
+				offset = self.offsets[Player.special_charter_flight.__name__]
+				for card in hand:
+					mask[offset+card*V:offset+(card+1)*V] = True
+					mask[offset+card*V+position] = False
+		elif game.turn_phase == TurnPhase.DISCARD:
+			offset = self.offsets[Player.discard.__name__]
+			for card in hand:
+				mask[offset+card] = True
+		return mask
+
+def legal_action_mask(game,out=None):
+	return game.action_space.legal_action_mask(game,out)
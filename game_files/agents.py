@@ -1,19 +1,183 @@
+import math
 import random
+import time
 
-from .players import Player
+from .determinization import DeterminizationSampler
+from .game import GameState
+from .players import Player, PlayerRole, TurnPhase
+from .rollout import RolloutGame
 
 # Agents have to return (tuple action to use, arg to use w action)
 class RandomPlayer(Player):
 	def request_action(self,game):
-		options = self.available_actions(game)
-		all_options = []
-		for action in options:
-			possible_kwargs = options[action]
-			for kwargs in possible_kwargs:
-				all_options.append([action, kwargs])
-		selection = random.choice(all_options)
-		return selection[0],selection[1]
-	
+		return self.sample_action(game,game.agent_rng)
+
 	def request_discard(self,game):
-		return random.choice(self.cards).name
+		return game.agent_rng.choice(self.cards).name
+
+# Node of an information set tree, children by index of the integer action space (the action of the node)
+# available counts the iterations in which the node could have been chosen (its action was legal in that determinization)
+class ISMCTSNode():
+	def __repr__(self):
+		return "ISMCTSNode: "+str(self.visits)+" visits, "+str(len(self.children))+" children, value: "+str(self.value/self.visits if self.visits else 0)
+
+	def __init__(self,action=None):
+		self.action = action
+		self.children = {}
+		self.visits = 0
+		self.available = 0
+		self.value = 0.0
+
+# Search kept between consecutive requests of the same turn, shared by the copies the game makes of the player
+# Trees are not copied or pickled with the player
+class SearchTree():
+	def __init__(self):
+		self.root = None
+		self.key = None
+		self.stats = {}
+
+	def __getstate__(self):
+		return {'root': None, 'key': None, 'stats': self.stats}
+
+# Single observer information set MCTS for every player (the same agent plans the moves of the whole team)
+# Every iteration plays a clone of the game with both decks determinized (see determinization.py) down the tree and a
+# random rollout of rollout_turns turns on a RolloutGame (see rollout.py), scored by evaluate. The search stops after iterations iterations if given,
+# otherwise after time_limit seconds. The stats of the last search are in search.stats, printed after every decision if report is set
+class ISMCTSPlayer(Player):
+	def __init__(self,iterations=None,time_limit=1.0,exploration=0.7,rollout_turns=2,samples=64,report=False):
+		super().__init__()
+		self.iterations = iterations
+		self.time_limit = time_limit
+		self.exploration = exploration
+		self.rollout_turns = rollout_turns
+		self.samples = samples
+		self.report = report
+		self.search = SearchTree()
+
+	def request_action(self,game):
+		return game.action_space.decode(game,self.search_action(game))
+
+	def request_discard(self,game):
+		return game.action_space.decode(game,self.search_action(game))[1]['discard']
+
+	# Runs the search from the current decision and returns the most visited action index
+	def search_action(self,game):
+		search = self.search
+		key = (game.get_hash(),game.current_player)
+		# Continue the tree of the last request when the game is where the chosen action led
+		root = search.root if search.key==key else None
+		if root is None:
+			root = ISMCTSNode()
+		reused = root.visits
+		legal = game.action_space.legal_action_mask(game).nonzero()[0].tolist()
+		start = time.perf_counter()
+		iterations, nodes = self.grow(root,game,start) if len(legal)>1 else (0,0)
+		elapsed = time.perf_counter()-start
+		action = max(legal,key=lambda a: root.children[a].visits if a in root.children else -1)
+		# Keep the subtree if the next decision comes before any card is drawn
+		after = game.clone()
+		after.do_action_index(action)
+		if action in root.children and after.game_state==GameState.PLAYING and (after.turn_phase==TurnPhase.ACTIONS or after.turn_phase==TurnPhase.DISCARD):
+			search.root = root.children[action]
+			search.key = (after.get_hash(),after.current_player)
+		else:
+			search.root = search.key = None
+		search.stats = {
+			'iterations': iterations,
+			'nodes': nodes,
+			'reused_visits': reused,
+			'time': elapsed,
+			'nodes_per_second': nodes/elapsed if elapsed>0 else 0.0
+		}
+		# Diagnostics stay out of the game log, which the players see
+		if self.report:
+			print("ISMCTS: "+str(iterations)+" iterations, "+str(nodes)+" nodes in "+format(elapsed,".3f")+"s ("+format(search.stats['nodes_per_second'],".0f")+" nodes/s)")
+		return action
+
+	def searching(self,iterations,start):
+		if self.iterations is not None:
+			return iterations<self.iterations
+		return time.perf_counter()-start<self.time_limit
+
+	# Adds iterations to the tree of root until the budget runs out, returns the iterations and tree nodes visited
+	def grow(self,root,game,start):
+		sampler = DeterminizationSampler(game,self.samples)
+		rng = random.Random(game.agent_rng.getrandbits(64))
+		iterations = nodes = 0
+		k = self.samples
+		while self.searching(iterations,start):
+			if k==self.samples:
+				sampler.sample()
+				k = 0
+			state = sampler.determinize(game,k)
+			state.use_rng(rng)
+			k += 1
+			path = self.select(root,state,rng)
+			self.backup(path,self.rollout(state,rng))
+			nodes += len(path)
+			iterations += 1
+		return iterations,nodes
+
+	# Selection and expansion on a determinized clone, the state is left at the new leaf
+	# Nodes of the path are counted as visited right away, so paths selected before their rollouts are
+	# backed up (leaf parallelism) spread over the tree (virtual loss)
+	def select(self,root,state,rng):
+		path = [root]
+		node = root
+		mask = None
+		while state.advance():
+			mask = state.action_space.legal_action_mask(state,mask)
+			legal = mask.nonzero()[0].tolist()
+			untried = []
+			for action in legal:
+				child = node.children.get(action)
+				if child is None:
+					untried.append(action)
+				else:
+					child.available += 1
+			if untried:
+				action = rng.choice(untried)
+				child = node.children[action] = ISMCTSNode(action)
+				child.available = 1
+				state.do_action_index(action)
+				path.append(child)
+				break
+			action = max(legal,key=lambda a: self.ucb(node.children[a]))
+			node = node.children[action]
+			state.do_action_index(action)
+			path.append(node)
+		for node in path:
+			node.visits += 1
+		return path
+
+	def backup(self,path,value):
+		for node in path:
+			node.value += value
+
+	# Upper confidence bound over the iterations in which the node was available instead of its parent's visits
+	def ucb(self,node):
+		return node.value/node.visits+self.exploration*math.sqrt(math.log(node.available)/node.visits)
+
+	# Random play for rollout_turns turns (or until the game ends) on a RolloutGame, valued by evaluate
+	def rollout(self,game,rng):
+		engine = RolloutGame(game,rng)
+		engine.play(self.rollout_turns,rng)
+		return self.evaluate(engine)
 
+	# Value of a rollout (RolloutGame) in [0, 1]: 1 for a win, 0 for a loss, otherwise cures, cards towards the missing
+	# cures, outbreaks and remaining disease cubes
+	def evaluate(self,engine):
+		if engine.game_state==GameState.WON:
+			return 1.0
+		if engine.game_state==GameState.LOST:
+			return 0.0
+		colors = len(engine.cures)
+		city_color = engine.tables.city_color
+		progress = 0.0
+		for c in range(colors):
+			if not engine.cures[c]:
+				progress += max(min(sum(city_color[card]==c for card in hand)/(4 if role==PlayerRole.SCIENTIST else 5),1.0) for hand,role in zip(engine.hands,engine.roles))
+		cures = sum(engine.cures)/colors
+		outbreaks = 1-engine.outbreak_counter/8
+		cubes = min(engine.remaining_disease_cubes)/engine.number_cubes
+		return 0.5*cures+0.2*progress/colors+0.15*outbreaks+0.15*cubes
@@ -1,5 +1,10 @@
 import copy
 
+import numpy as np
+
+from .events import EventType
+from .outbreaks import apply_cascade, cascade, chain_size
+
 CITY_CARDS = {
 	'algiers': {'country':'algeria','color':'black','pop':2946000,'pop_density':6500,'connects':['madrid', 'paris', 'istanbul', 'cairo']},
 	'atlanta': {'country':'united_states','color':'blue','pop':4715000,'pop_density':700,'connects':['chicago', 'washington', 'miami']},
@@ -51,6 +56,46 @@ CITY_CARDS = {
 	'washington': {'country':'united_states','color':'blue','pop':4679000,'pop_density':1400,'connects':['montreal', 'new_york', 'atlanta', 'miami']},
 }
 
+class MapTables():
+	# Static, read-only tables derived from a cities dictionary, built once per map and shared by every game using it
+	_cache = {}
+	
+	@classmethod
+	def get(cls,cities=CITY_CARDS):
+		tables = cls._cache.get(id(cities))
+		if tables is None or tables.cities is not cities:
+			tables = cls(cities)
+			cls._cache[id(cities)] = tables
+		return tables
+	
+	def __init__(self,cities):
+		self.cities = cities
+		self.names = list(cities.keys())
+		self.index = {city: i for i,city in enumerate(self.names)}
+		self.colors = []
+		for city in cities:
+			if cities[city]['color'] not in self.colors:
+				self.colors.append(cities[city]['color'])
+		self.color_index = {color: c for c,color in enumerate(self.colors)}
+		self.n_cities = len(self.names)
+		self.n_colors = len(self.colors)
+		self.city_color = np.array([self.color_index[cities[city]['color']] for city in self.names],dtype=np.int8)
+		self.neighbors = [tuple(self.index[n] for n in cities[city]['connects']) for city in self.names]
+		self.adjacency = np.zeros((self.n_cities,self.n_cities),dtype=bool)
+		for i,neighbors in enumerate(self.neighbors):
+			self.adjacency[i,list(neighbors)] = True
+		self.population = np.array([cities[city]['pop'] for city in self.names],dtype=np.int64)
+
+# Cubes of one color per city index, read by outbreaks.cascade
+class ColorCubes():
+	def __init__(self,cities,names,color):
+		self.cities = cities
+		self.names = names
+		self.color = color
+	
+	def __getitem__(self,city):
+		return self.cities[self.names[city]].disease_cubes[self.color]
+
 class City():
 	def __repr__(self):
 		return self.name+": Diseases: "+str([color+"="+str(self.disease_cubes[color]) for color in self.disease_cubes]) + " R.S: "+str(1 if self.research_station else 0)
@@ -68,38 +113,54 @@ class City():
 		self.disease_cubes = {c: 0 for c in colors}
 		self.research_station = False
 	
+	# Cities are copied on every write (copy-on-write), this skips the generic reduce protocol of copy.copy
+	def __copy__(self):
+		city = object.__new__(self.__class__)
+		city.__dict__.update(self.__dict__)
+		return city
+	
 	def get_id(self):
 		return (
 				tuple(self.disease_cubes.values()),
 				self.research_station
 		)
 	
-	def infect(self,game,infection,color,outbreak_chain=[]):
-		if not game.eradicated[color] and self.name not in game.protected_cities and not (game.medic_position==self.name and game.cures[color]):
-			net_infection = min(3-self.disease_cubes[color],infection)
-			self.disease_cubes = copy.copy(self.disease_cubes)
-			self.disease_cubes[color] += net_infection
-			game.remaining_disease_cubes = copy.copy(game.remaining_disease_cubes)
+	# Infection event starting at this city, the chain reaction is computed first (see outbreaks.py) and then applied
+	def infect(self,game,infection,color):
+		tables = game.map_tables
+		steps, added, chain = cascade(ColorCubes(game.cities,tables.names,color),tables.index[self.name],infection,tables.neighbors,game.blocked_cities(color))
+		apply_cascade(game,color,steps,self.cubes_adder(game,color))
+		if chain and game.instruments is not None:
+			game.instruments.outbreak(chain_size(chain))
+	
+	# The city infected first is expected to be already copied by the caller, other cities (and their cubes) and the
+	# remaining cubes are copied once per event
+	def cubes_adder(self,game,color):
+		copied = set()
+		def add(city,name,net_infection):
+			if not copied:
+				game.remaining_disease_cubes = copy.copy(game.remaining_disease_cubes)
+			if name not in copied:
+				if name != self.name:
+					game.cities[name] = copy.copy(game.cities[name])
+				game.cities[name].disease_cubes = copy.copy(game.cities[name].disease_cubes)
+				copied.add(name)
+			cubes = game.cities[name].disease_cubes
+			current = cubes[color]
+			cubes[color] += net_infection
 			game.remaining_disease_cubes[color] -= net_infection
-			game.log("Infect "+str(net_infection)+"-"+color+" at: "+self.name)
-			# Outbreak
-			if infection > net_infection:
-				game.log("Outbreak at: "+self.name)
-				outbreak_chain.append(self.name)
-				game.outbreak_counter += 1
-				for city_name in self.neighbors:
-					if city_name not in outbreak_chain:
-						game.cities[city_name] = copy.copy(game.cities[city_name])
-						game.cities[city_name].infect(game,1,color,outbreak_chain)
-		else:
-			game.log("Infection prevented at: "+self.name)
+			return current
+		return add
 			
 	def disinfect(self,game,disinfection,color):
+		game.hash_cubes(self.name,color,self.disease_cubes[color],self.disease_cubes[color]-disinfection)
 		self.disease_cubes = copy.copy(self.disease_cubes)
 		self.disease_cubes[color] -= disinfection
 		game.remaining_disease_cubes = copy.copy(game.remaining_disease_cubes)
 		game.remaining_disease_cubes[color] += disinfection
 		if game.cures[color] and game.remaining_disease_cubes[color]==game.commons['number_cubes']:
+			if not game.eradicated[color]:
+				game.hash_eradicated(color)
 			game.eradicated = copy.copy(game.eradicated)
 			game.eradicated[color] = True
-			game.log("Eradicated "+color+" disease")
+			game.emit(EventType.ERADICATED,color)
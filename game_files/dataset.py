@@ -0,0 +1,232 @@
+import json
+import multiprocessing
+import os
+import uuid
+
+import numpy as np
+
+from .actions import ActionSpace
+from .cities import CITY_CARDS, MapTables
+from .game import Game, GameState
+from .observation import ObservationEncoder
+from .tournament import CONFIG_DEFAULTS, game_seed, resolve_agent
+
+# Trajectories of many games as fixed-width rows of memory-mapped .npy shards, one row per decision:
+#	observations (size,) of observation.py before the decision, masks the legal action mask packed in bits (see unpack_masks),
+#	actions the integer action id taken, rewards (cures, plus 1 for a win or -1 for a loss, gained until the next decision),
+#	dones set on the last decision of a game and episodes the game of the row within its writer
+# Every writer owns its shards (named after the writer) and appends one line to manifest.jsonl when it seals one, so writers
+# in many processes can share a directory. Readers only see sealed shards
+MANIFEST = "manifest.jsonl"
+FIELDS = ('observations','masks','actions','rewards','dones','episodes')
+
+def score(game):
+	return sum(game.cures.values())+(game.game_state==GameState.WON)-(game.game_state==GameState.LOST)
+
+# Legal masks (..., bytes) of a shard back to booleans (..., actions)
+def unpack_masks(packed,actions):
+	return np.unpackbits(packed,axis=-1,count=actions).view(bool)
+
+class TrajectoryWriter():
+	def __repr__(self):
+		return "TrajectoryWriter: "+self.name+", "+str(self.shards)+" shards sealed, "+str(self.episodes)+" games"
+
+	def __init__(self,directory,players,name=None,shard_rows=1<<16,dtype=np.int8):
+		os.makedirs(directory,exist_ok=True)
+		tables = MapTables.get(CITY_CARDS)
+		self.directory = directory
+		self.players = players
+		self.name = name if name is not None else str(os.getpid())+"-"+uuid.uuid4().hex[:8]
+		self.shard_rows = shard_rows
+		self.dtype = np.dtype(dtype)
+		self.encoder = ObservationEncoder.get(tables,players)
+		self.space = ActionSpace.get(tables,players)
+		self.mask = np.zeros(self.space.size,dtype=bool)
+		self.widths = {
+			'observations': ((self.encoder.size,),self.dtype),
+			'masks': (((self.space.size+7)//8,),np.uint8),
+			'actions': ((),np.int16),
+			'rewards': ((),np.float32),
+			'dones': ((),bool),
+			'episodes': ((),np.int32)
+		}
+		self.arrays = None
+		self.shards = 0
+		self.row = 0
+		self.written = 0
+		self.episodes = 0
+		self.last = None
+		self.last_score = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+	def shard_name(self):
+		return self.name+"-"+format(self.shards,"05d")
+
+	def open_shard(self):
+		prefix = os.path.join(self.directory,self.shard_name())
+		self.arrays = {field: np.lib.format.open_memmap(prefix+"."+field+".npy",mode="w+",dtype=dtype,shape=(self.shard_rows,)+shape) for field,(shape,dtype) in self.widths.items()}
+		self.row = 0
+
+	# Flushes the current shard and publishes it in the manifest, empty shards are removed
+	def seal(self):
+		if self.arrays is None:
+			return
+		name = self.shard_name()
+		for array in self.arrays.values():
+			array.flush()
+		self.arrays = None
+		if self.row == 0:
+			for field in FIELDS:
+				os.remove(os.path.join(self.directory,name+"."+field+".npy"))
+			return
+		entry = {'shard': name, 'rows': self.row, 'players': self.players, 'observation_size': self.encoder.size, 'actions': self.space.size, 'dtype': self.dtype.str}
+		# A single write with O_APPEND keeps the lines of concurrent writers whole
+		fd = os.open(os.path.join(self.directory,MANIFEST),os.O_WRONLY|os.O_APPEND|os.O_CREAT,0o644)
+		try:
+			os.write(fd,(json.dumps(entry)+"\n").encode())
+		finally:
+			os.close(fd)
+		self.shards += 1
+
+	# Writes the observation and mask of the game waiting for a decision in the next row, kept once commit is called
+	def observe(self,game):
+		current = score(game)
+		if self.last is not None:
+			arrays, row = self.last
+			arrays['rewards'][row] = current-self.last_score
+		if self.arrays is None or self.row == self.shard_rows:
+			self.seal()
+			self.open_shard()
+		self.encoder.encode(game,self.arrays['observations'][self.row])
+		self.arrays['masks'][self.row] = np.packbits(self.space.legal_action_mask(game,self.mask))
+		self.arrays['episodes'][self.row] = self.episodes
+		self.pending_score = current
+
+	def commit(self,action_index):
+		self.arrays['actions'][self.row] = action_index
+		self.arrays['dones'][self.row] = False
+		self.last = (self.arrays,self.row)
+		self.last_score = self.pending_score
+		self.row += 1
+		self.written += 1
+
+	# Closes the game of the last rows with its final reward
+	def finish(self,game):
+		if self.last is not None:
+			arrays, row = self.last
+			arrays['rewards'][row] = score(game)-self.last_score
+			arrays['dones'][row] = True
+		self.last = None
+		self.episodes += 1
+
+	def close(self):
+		self.seal()
+
+# Feeds the decisions of a game to a TrajectoryWriter as they are taken (Game.do_action and Game.do_discard call it)
+class TrajectoryRecorder():
+	def __init__(self,game,writer):
+		self.game = game
+		self.writer = writer
+		game.recorder = self
+
+	def encode(self,game,action,kwargs):
+		self.writer.observe(game)
+		return (game.action_space.encode(action,kwargs),)
+
+	def add(self,game,entries):
+		self.writer.commit(entries[0])
+
+	def finish(self):
+		if self.game.recorder is self:
+			self.game.recorder = None
+		self.writer.finish(self.game)
+
+# Zero-copy reads of the sealed shards of a directory, refresh picks up the shards sealed since
+class TrajectoryDataset():
+	def __repr__(self):
+		return "TrajectoryDataset: "+str(len(self))+" rows in "+str(len(self.entries))+" shards"
+
+	def __init__(self,directory):
+		self.directory = directory
+		self.entries = []
+		self.arrays = []
+		self.offsets = np.zeros(1,dtype=np.int64)
+		self.refresh()
+
+	def refresh(self):
+		path = os.path.join(self.directory,MANIFEST)
+		if not os.path.exists(path):
+			return
+		with open(path) as manifest:
+			lines = manifest.read().splitlines()
+		for line in lines[len(self.entries):]:
+			entry = json.loads(line)
+			prefix = os.path.join(self.directory,entry['shard'])
+			self.entries.append(entry)
+			self.arrays.append({field: np.load(prefix+"."+field+".npy",mmap_mode="r")[:entry['rows']] for field in FIELDS})
+		self.offsets = np.concatenate(([0],np.cumsum([entry['rows'] for entry in self.entries]))).astype(np.int64)
+
+	def __len__(self):
+		return int(self.offsets[-1])
+
+	# Fields of shard i as read-only memory maps
+	def shard(self,i):
+		return self.arrays[i]
+
+	# Fields of the given rows (gathered, so copied), masks unpacked if unpack is set
+	# Without any shard there are no row shapes, the fields are then empty 1-d arrays (and any index is out of range)
+	def rows(self,indices,unpack=False):
+		indices = np.asarray(indices,dtype=np.int64)
+		if not self.arrays:
+			if len(indices):
+				raise IndexError("row "+str(indices[0])+" of an empty dataset")
+			return {field: np.empty(0) for field in FIELDS}
+		shards = np.searchsorted(self.offsets,indices,side="right")-1
+		batch = {field: np.empty((len(indices),)+self.arrays[0][field].shape[1:],dtype=self.arrays[0][field].dtype) for field in FIELDS}
+		for s in np.unique(shards):
+			selected = shards==s
+			local = indices[selected]-self.offsets[s]
+			for field in FIELDS:
+				batch[field][selected] = self.arrays[s][field][local]
+		if unpack:
+			batch['masks'] = unpack_masks(batch['masks'],self.entries[0]['actions'])
+		return batch
+
+	# Batches of rows over the whole dataset, shuffled with rng if given
+	def batches(self,batch_size,rng=None,unpack=False):
+		order = np.arange(len(self)) if rng is None else rng.permutation(len(self))
+		for start in range(0,len(order),batch_size):
+			yield self.rows(order[start:start+batch_size],unpack)
+
+# Plays the games of a task (directory, agent, config, first game, stop game, seed, shard rows) with its own writer
+# Returns the rows written
+def write_games(task):
+	directory, agent, config, start, stop, seed, shard_rows = task
+	parameters = dict(CONFIG_DEFAULTS,**config)
+	agent_class = resolve_agent(agent)
+	with TrajectoryWriter(directory,parameters['players'],name="games"+format(start,"09d"),shard_rows=shard_rows) as writer:
+		for game_index in range(start,stop):
+			game = Game([agent_class() for p in range(parameters['players'])],parameters['epidemic_cards'],starting_city=parameters['starting_city'],number_cubes=parameters['number_cubes'],log_game=False)
+			game.setup(parameters['roles'],seed=game_seed(seed,0,0,game_index))
+			recorder = TrajectoryRecorder(game,writer)
+			game.game_loop()
+			recorder.finish()
+	return writer.written
+
+# Self-play pipeline: games games of agent under config over a process pool, tasks of games_per_task games each
+# write their own shards into directory. Game seeds are derived from seed as in tournament.py
+def generate_trajectories(directory,agent="RandomPlayer",config=None,games=1,workers=None,seed=0,games_per_task=256,shard_rows=1<<16):
+	config = {} if config is None else config
+	tasks = [(directory,agent,config,start,min(start+games_per_task,games),seed,shard_rows) for start in range(0,games,games_per_task)]
+	if workers == 1:
+		for task in tasks:
+			write_games(task)
+	else:
+		with multiprocessing.Pool(workers) as pool:
+			pool.map(write_games,tasks,chunksize=1)
+	return TrajectoryDataset(directory)
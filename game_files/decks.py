@@ -64,15 +64,19 @@ class PlayerDeck():
 	
 	@property
 	def possible_deck(self):
+		return self.sample_deck(random)
+	
+	# Random deck consistent with what players know (pile sizes and epidemics), drawn with the given generator
+	def sample_deck(self,rng):
 		pile_info = [[len(pile),any([card.cardtype==CardType.EPIDEMIC for card in pile])] for pile in self.deck]		
 		cards = [card for pile in self.deck for card in pile if card.cardtype != CardType.EPIDEMIC]
 		deck = []
-		random.shuffle(cards)
+		rng.shuffle(cards)
 		for p in pile_info:
 			pile = [Card(name="Epidemic",cardtype=CardType.EPIDEMIC,color="epidemic")] if p[1] else []
 			for c in range(len(pile),p[0]):
 				pile.append(cards.pop())
-			random.shuffle(pile)
+			rng.shuffle(pile)
 			deck.append(pile)
 		return deck
 
@@ -110,10 +114,10 @@ class InfectionDeck():
 		self.discard.append(city)
 		return city
 	
-	def intensify(self):
+	def intensify(self,rng=random):
 		self.deck = copy.copy(self.deck)
 		self.discard = copy.copy(self.discard)
-		random.shuffle(self.discard)
+		rng.shuffle(self.discard)
 		self.deck.append(self.discard)
 		self.discard = []
 		
@@ -126,10 +130,13 @@ class InfectionDeck():
 		
 	@property
 	def possible_deck(self):
+		return self.sample_deck(random)
+	
+	def sample_deck(self,rng):
 		deck = []
 		for pile in self.deck:
 			new_pile = copy.copy(pile)
-			random.shuffle(new_pile)
+			rng.shuffle(new_pile)
 			deck.append(new_pile)
 		return deck
 		
\ No newline at end of file
@@ -0,0 +1,84 @@
+import copy
+
+import numpy as np
+
+from .decks import CardType
+
+# Samples K orders of the hidden decks of a game at once as index arrays, in draw order (top card first)
+#	player deck: the cards left are known, not their order, and every pile keeps its size and its epidemic (if not drawn)
+#	infection deck: every pile keeps its cards (known_cards), only their order inside the pile is unknown
+# City cards are map indices and epidemics are n_cities, as in VectorGame. Buffers are reused between samples
+class DeterminizationSampler():
+	def __repr__(self):
+		return "DeterminizationSampler: "+str(self.samples)+" samples, player deck: "+str(self.player_orders.shape[1])+" cards in "+str(len(self.player_piles))+" piles, infection deck: "+str(self.infection_orders.shape[1])+" cards in "+str(len(self.infection_piles))+" piles"
+
+	def __init__(self,game,samples=64,rng=None):
+		self.tables = game.map_tables
+		self.samples = samples
+		self.epidemic = self.tables.n_cities
+		# Seeded from the agents generator so searches of seeded games are reproducible
+		self.rng = np.random.default_rng(game.agent_rng.getrandbits(64)) if rng is None else rng
+		self.update(game)
+
+	# Reads what is known of the decks, to be called again when the decks change
+	def update(self,game):
+		index = self.tables.index
+		K = self.samples
+		# Piles in draw order, the last pile of a deck is drawn first
+		self.player_piles = [(len(pile),any(card.cardtype==CardType.EPIDEMIC for card in pile)) for pile in reversed(game.player_deck.deck)]
+		self.player_cards = np.array([index[card.name] for pile in game.player_deck.deck for card in pile if card.cardtype==CardType.CITY],dtype=np.int16)
+		self.infection_piles = [np.array(sorted(index[card.name] for card in pile),dtype=np.int16) for pile in reversed(game.infection_deck.deck)]
+		# Cards of the game by index to rebuild decks
+		self.cards = {}
+		for pile in game.player_deck.deck:
+			for card in pile:
+				self.cards[self.epidemic if card.cardtype==CardType.EPIDEMIC else index[card.name]] = card
+		self.infection_cards = {index[card.name]: card for pile in game.infection_deck.deck for card in pile}
+		# Player deck template: the unknown cards take the first slots of every pile, its epidemic the last one
+		sizes = np.array([size for size,epidemic in self.player_piles],dtype=np.int64)
+		self.player_pile_of = np.repeat(np.arange(len(sizes)),sizes)
+		self.player_epidemic_slots = np.cumsum(sizes)[[epidemic for size,epidemic in self.player_piles]]-1 if len(sizes) else np.zeros(0,dtype=np.int64)
+		self.player_card_slots = np.setdiff1d(np.arange(int(sizes.sum())),self.player_epidemic_slots)
+		self.player_orders = np.full((K,int(sizes.sum())),self.epidemic,dtype=np.int16)
+		self.infection_template = np.concatenate(self.infection_piles) if self.infection_piles else np.zeros(0,dtype=np.int16)
+		self.infection_pile_of = np.repeat(np.arange(len(self.infection_piles)),[len(pile) for pile in self.infection_piles])
+		self.infection_orders = np.zeros((K,len(self.infection_template)),dtype=np.int16)
+
+	# Shuffles rows of values inside the groups given by pile_of (sorted group ids), one permutation per row
+	def shuffle_piles(self,values,pile_of):
+		keys = self.rng.random(values.shape)+pile_of
+		return np.take_along_axis(values,np.argsort(keys,axis=1),axis=1)
+
+	# Draws self.samples determinizations into player_orders and infection_orders and returns both
+	def sample(self):
+		K = self.samples
+		if self.player_orders.shape[1]:
+			# Random split of the unknown cards into the piles, then a random position for every epidemic
+			cards = np.argsort(self.rng.random((K,len(self.player_cards))),axis=1)
+			self.player_orders[:,self.player_card_slots] = self.player_cards[cards]
+			self.player_orders[:,self.player_epidemic_slots] = self.epidemic
+			self.player_orders[:] = self.shuffle_piles(self.player_orders,self.player_pile_of)
+		if self.infection_orders.shape[1]:
+			self.infection_orders[:] = self.shuffle_piles(np.broadcast_to(self.infection_template,self.infection_orders.shape),self.infection_pile_of)
+		return self.player_orders,self.infection_orders
+
+	# Rebuilds the piles of a deck (top pile last, top card last) from a draw order
+	def piles(self,order,piles,cards):
+		deck = []
+		start = 0
+		for size in piles:
+			deck.append([cards[card] for card in order[start:start+size][::-1].tolist()])
+			start += size
+		deck.reverse()
+		return deck
+
+	# Gives the decks of game (a clone, decks are replaced copy-on-write) the order of sample k
+	def install(self,game,k):
+		game.player_deck = copy.copy(game.player_deck)
+		game.player_deck.deck = self.piles(self.player_orders[k],[size for size,epidemic in self.player_piles],self.cards)
+		game.infection_deck = copy.copy(game.infection_deck)
+		game.infection_deck.deck = self.piles(self.infection_orders[k],[len(pile) for pile in self.infection_piles],self.infection_cards)
+		return game
+
+	def determinize(self,game,k):
+		return self.install(game.clone(),k)
@@ -0,0 +1,83 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+# All-pairs shortest paths of the static map (no research stations), computed once per MapTables
+def static_distances(tables):
+	distances = getattr(tables,'static_distances',None)
+	if distances is None:
+		n = tables.n_cities
+		distances = np.full((n,n),n,dtype=np.int16)
+		distances[tables.adjacency] = 1
+		np.fill_diagonal(distances,0)
+		# Floyd-Warshall, one vectorized relaxation per intermediate city
+		for k in range(n):
+			np.minimum(distances,distances[:,k,None]+distances[None,k,:],out=distances)
+		distances.setflags(write=False)
+		tables.static_distances = distances
+	return distances
+
+class DistanceRow(Mapping):
+	def __repr__(self):
+		return str(dict(self))
+
+	def __init__(self,distances,index):
+		self.distances = distances
+		self.index = index
+
+	def __getitem__(self,target):
+		return int(self.distances.matrix[self.index,self.distances.tables.index[target]])
+
+	def __iter__(self):
+		return iter(self.distances.tables.names)
+
+	def __len__(self):
+		return self.distances.tables.n_cities
+
+# Shortest path lengths (in actions) between cities, research stations form a clique where every shuttle flight costs 1
+# Lookups work as the old dictionary: distances[origin][target], the dense matrix is in distances.matrix
+# Updates never write into existing arrays so a shallow copy is enough for copy-on-write
+class Distances(Mapping):
+	def __repr__(self):
+		return "Distances between "+str(self.tables.n_cities)+" cities, research stations at: "+str([self.tables.names[s] for s in self.stations])
+
+	def __init__(self,tables,stations=()):
+		self.tables = tables
+		self.static = static_distances(tables)
+		self.stations = tuple(tables.index[city] for city in stations)
+		self.update()
+
+	def __getitem__(self,city):
+		return DistanceRow(self,self.tables.index[city])
+
+	def __iter__(self):
+		return iter(self.tables.names)
+
+	def __len__(self):
+		return self.tables.n_cities
+
+	def distance(self,origin,target):
+		return int(self.matrix[self.tables.index[origin],self.tables.index[target]])
+
+	# Any shortest path uses the station clique at most once: origin -> nearest station -> shuttle -> nearest station -> target
+	# When both ends share their nearest station that route is longer than the static path, so the minimum stays exact
+	def update(self,to_station=None):
+		if to_station is None:
+			to_station = self.static[:,list(self.stations)].min(axis=1) if self.stations else None
+		self.to_station = to_station
+		if to_station is None:
+			self.matrix = self.static
+		else:
+			self.matrix = np.minimum(self.static,to_station[:,None]+1+to_station[None,:])
+
+	def add_station(self,city):
+		s = self.tables.index[city]
+		if s not in self.stations:
+			self.stations = self.stations+(s,)
+			self.update(self.static[:,s] if self.to_station is None else np.minimum(self.to_station,self.static[:,s]))
+
+	def remove_station(self,city):
+		s = self.tables.index[city]
+		if s in self.stations:
+			self.stations = tuple(station for station in self.stations if station!=s)
+			self.update()
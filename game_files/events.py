@@ -0,0 +1,140 @@
+import collections
+from enum import IntEnum, auto
+
+class EventType(IntEnum):
+	MESSAGE = auto()
+	SETUP = auto()
+	GAME_START = auto()
+	GAME_WON = auto()
+	GAME_LOST = auto()
+	GAME_INVALID = auto()
+	TURN_BEGIN = auto()
+	DRAW = auto()
+	EPIDEMIC = auto()
+	INFECT = auto()
+	OUTBREAK = auto()
+	PREVENTED = auto()
+	ERADICATED = auto()
+	HEAL = auto()
+	DISCARD = auto()
+	MUST_DISCARD = auto()
+	DRIVE_FERRY = auto()
+	DIRECT_FLIGHT = auto()
+	CHARTER_FLIGHT = auto()
+	SHUTTLE_FLIGHT = auto()
+	BUILD = auto()
+	REMOVE_STATION = auto()
+	TREAT = auto()
+	GIVE = auto()
+	RECEIVE = auto()
+	CURE = auto()
+	RALLY = auto()
+	SPECIAL_CHARTER_FLIGHT = auto()
+
+# Text of every event type, formatted with the event arguments (roles are PlayerRole members)
+TEMPLATES = {
+	EventType.MESSAGE: "{0}",
+	EventType.SETUP: "Setting game up",
+	EventType.GAME_START: "Starting game",
+	EventType.GAME_WON: "Players won the game",
+	EventType.GAME_LOST: "Players lost the game",
+	EventType.GAME_INVALID: "This should not happen",
+	EventType.TURN_BEGIN: "Turn begin: {0.name}",
+	EventType.DRAW: "{0.name} drew: {1}",
+	EventType.EPIDEMIC: "{0.name} drew: epidemic\nEpidemic at: {1}",
+	EventType.INFECT: "Infect {0}-{1} at: {2}",
+	EventType.OUTBREAK: "Outbreak at: {0}",
+	EventType.PREVENTED: "Infection prevented at: {0}",
+	EventType.ERADICATED: "Eradicated {0} disease",
+	EventType.HEAL: "MEDIC healed {0} at {1}",
+	EventType.DISCARD: "{0.name} discarded: {1}",
+	EventType.MUST_DISCARD: "{0.name} must discard",
+	EventType.DRIVE_FERRY: "{0.name} drove to: {1}",
+	EventType.DIRECT_FLIGHT: "{0.name} direct flew to: {1}",
+	EventType.CHARTER_FLIGHT: "{0.name} charter flew to: {1}",
+	EventType.SHUTTLE_FLIGHT: "{0.name} shuttle flew to: {1}",
+	EventType.BUILD: "{0.name} built research station",
+	EventType.REMOVE_STATION: "{0.name} removed research station at: {1}",
+	EventType.TREAT: "{0.name} treated: {1}",
+	EventType.GIVE: "{0.name} gave {1} to: {2.name}",
+	EventType.RECEIVE: "{0.name} received {1} from: {2.name}",
+	EventType.CURE: "{0.name} found cure for: {1}",
+	EventType.RALLY: "DISPATCHER rallied {0.name} to: {1.name}",
+	EventType.SPECIAL_CHARTER_FLIGHT: "{0.name} special charter flew to: {1} discarding: {2}"
+}
+
+# Events are tuples (EventType, *arguments), text is only built when rendered
+def render(event):
+	return TEMPLATES[event[0]].format(*event[1:])
+
+# Sinks are called with every event as it is emitted
+class StreamSink():
+	def __init__(self,stream):
+		self.stream = stream
+
+	def __call__(self,event):
+		self.stream.write(render(event)+"\n")
+
+class FileSink(StreamSink):
+	def __init__(self,filename,mode="a"):
+		super().__init__(open(filename,mode))
+
+	def close(self):
+		self.stream.close()
+
+class MemorySink():
+	def __init__(self):
+		self.events = []
+
+	def __call__(self,event):
+		self.events.append(event)
+
+	def text(self):
+		return "".join(render(event)+"\n" for event in self.events)
+
+# Last capacity events of a game plus the sinks they are forwarded to
+# unread counts the events emitted since the last drain, the game log of Game.__call__
+class EventLog():
+	def __repr__(self):
+		return "EventLog: "+str(len(self.buffer))+" events, "+str(self.unread)+" unread, "+str(len(self.sinks))+" sinks"
+
+	def __init__(self,capacity=10000,sinks=(),keep=True):
+		self.buffer = collections.deque(maxlen=capacity) if keep else None
+		self.sinks = list(sinks)
+		self.unread = 0
+
+	def __iter__(self):
+		return iter(self.buffer if self.buffer is not None else ())
+
+	def __len__(self):
+		return len(self.buffer) if self.buffer is not None else 0
+
+	def emit(self,event):
+		if self.buffer is not None:
+			self.buffer.append(event)
+			self.unread += 1
+		for sink in self.sinks:
+			sink(event)
+
+	def add_sink(self,sink):
+		self.sinks.append(sink)
+
+	def remove_sink(self,sink):
+		self.sinks.remove(sink)
+
+	def text(self,events=None):
+		return "".join(render(event)+"\n" for event in (self if events is None else events))
+
+	# Events since the last drain (the oldest may have been dropped by the ring buffer)
+	def unread_events(self):
+		if self.buffer is None or self.unread == 0:
+			return []
+		return list(self.buffer)[-min(self.unread,len(self.buffer)):]
+
+	def drain(self):
+		events = self.unread_events()
+		self.unread = 0
+		return self.text(events)
+
+	def mark_read(self):
+		self.unread = 0
@@ -1,18 +1,71 @@
+import contextlib
 import copy
+import functools
 import random
 import traceback
 from enum import IntEnum, auto
 
-from .cities import CITY_CARDS, City
+import numpy as np
+
+from .actions import ActionSpace
+from .cities import CITY_CARDS, City, MapTables
+from .distances import Distances
+from .events import EventLog, EventType, StreamSink
+from .hashing import ZobristKeys, full_hash
+from .observation import ObservationEncoder
 from .decks import Card, InfectionDeck, PlayerDeck, CardType
 from .players import PlayerRole, TurnPhase
 
+# Generator streams of a seeded game: deck shuffles and setup, and agents (so agent choices never change the cards)
+# Generators of Game.spawn_rng are children of SPAWN_STREAM, so they never repeat the other two
+GAME_STREAM = 0
+AGENT_STREAM = 1
+SPAWN_STREAM = 2
+
+# Phase of Game.game_turn when no instruments are attached
+NO_PHASE = contextlib.nullcontext()
+
+def no_phase(name,action=None):
+	return NO_PHASE
+
+# States kept by Game.verify_hash to look for hash collisions
+HASH_IDS_LIMIT = 1<<16
+
+# Independent random.Random for every (seed, stream, children...) key
+def make_rng(seed,stream=GAME_STREAM,*children):
+	return random.Random(int(np.random.SeedSequence(seed,spawn_key=(stream,)+children).generate_state(1,np.uint64)[0]))
+
+# Copy of a random.Random at the same position (copy.copy seeds a new generator before setting its state)
+def copy_rng(rng):
+	other = random.Random.__new__(random.Random)
+	other.setstate(rng.getstate())
+	return other
+
 class GameState(IntEnum):
 	NOT_PLAYING = auto()
 	PLAYING = auto()
 	LOST = auto()
 	WON = auto()
 
+# Records what a turn step changed when the game has an active journal so that Game.undo can revert it
+# Mutations are copy-on-write, so the previous values of the replaced attributes are an exact delta
+def journaled(uses_rng=False):
+	def decorator(step):
+		@functools.wraps(step)
+		def wrapper(self,*args,**kwargs):
+			if self.journal is None:
+				return step(self,*args,**kwargs)
+			before = self.__dict__.copy()
+			rng_state = self.rng.getstate() if uses_rng else None
+			saved_state = self.journal_state()
+			result = step(self,*args,**kwargs)
+			changed = {key: value for key,value in before.items() if self.__dict__.get(key,before) is not value}
+			added = [key for key in self.__dict__ if key not in before]
+			self.journal.append((changed,added,saved_state,rng_state))
+			return result
+		return wrapper
+	return decorator
+
 class Game():
 	
 	def __repr__(self):
@@ -47,12 +100,15 @@ class Game():
 			'player_deck': self.player_deck(),
 			'actions': self.players[self.current_player].available_actions(self),
 			'remaining_actions': self.actions,
-			'game_log': self.commons['game_log']
+			'game_log': self.events.drain() if self.events is not None else ""
 		}
-		self.commons['game_log'] = ""
 		return game
 	
-	def __init__(self,players,epidemic_cards=4,cities=CITY_CARDS,starting_city="atlanta",number_cubes=24,log_game=True,external_log=None):
+	# Observation vector of what the players know (see observation.py), unlike __call__ it leaves the game log unread
+	def observation(self,out=None):
+		return ObservationEncoder.get(self.map_tables,len(self.players)).encode(self,out)
+	
+	def __init__(self,players,epidemic_cards=4,cities=CITY_CARDS,starting_city="atlanta",number_cubes=24,log_game=True,external_log=None,verify_hash=False,seed=None):
 		assert(starting_city in cities)
 		# Save game parameters
 		self.commons = {}
@@ -62,7 +118,8 @@ class Game():
 		self.commons['colors'] = []
 		self.commons['logger'] = external_log
 		self.commons['log_game'] = log_game
-		self.commons['game_log'] = ""
+		self.commons['verify_hash'] = verify_hash
+		self.commons['hash_ids'] = {}
 		# Gather city colors and disease cubes
 		for city in CITY_CARDS:
 			if CITY_CARDS[city]['color'] not in self.commons['colors']:
@@ -84,6 +141,21 @@ class Game():
 		self.current_turn = -1
 		self.turn_phase = TurnPhase.INACTIVE
 		self.game_state = GameState.NOT_PLAYING
+		self.map_tables = MapTables.get(CITY_CARDS)
+		# Incremental hash of positions, hands, cubes, research stations, cures and eradications
+		self.zobrist_keys = ZobristKeys.get(self.map_tables,len(players))
+		self.zobrist = 0
+		self.journal = None
+		# Receives every decision taken when set (see records.GameRecorder and dataset.TrajectoryRecorder), recorded counts its entries so undo reverts them
+		self.recorder = None
+		self.recorded = 0
+		# Per-phase timers and counters when set (see instrumentation.py)
+		self.instruments = None
+		self.action_space = ActionSpace.get(self.map_tables,len(players))
+		# Events are kept when log_game is set and written to external_log, nothing is recorded without either
+		self.events = EventLog(sinks=[StreamSink(external_log)] if external_log is not None else [],keep=log_game) if log_game or external_log is not None else None
+		# Unseeded games use the global random module as before
+		self.set_seed(seed)
 	
 	def get_id(self):
 		# Everything not included can be derived from other data
@@ -101,15 +173,138 @@ class Game():
 				self.actions
 		  )
 	
+	# 64-bit hash of the same information as get_id (hands taken as sets), O(1) per call
+	def get_hash(self):
+		if self.commons['verify_hash']:
+			self.verify_hash()
+		return hash((self.zobrist,self.game_state,self.current_turn,self.turn_phase,self.infection_counter,self.outbreak_counter,self.actions)) & 0xFFFFFFFFFFFFFFFF
+	
+	def verify_hash(self):
+		full = full_hash(self)
+		assert self.zobrist==full, "Incremental hash "+hex(self.zobrist)+" differs from full hash "+hex(full)
+		# States sharing a hash must share their get_id
+		state_id = list(self.get_id())
+		state_id[8] = tuple((position,tuple(sorted(cards))) for position,cards in state_id[8])
+		state_id = tuple(state_id)
+		h = hash((self.zobrist,self.game_state,self.current_turn,self.turn_phase,self.infection_counter,self.outbreak_counter,self.actions)) & 0xFFFFFFFFFFFFFFFF
+		hash_ids = self.commons['hash_ids']
+		# Collisions are only looked for among the last states seen, so long runs don't grow it without bound
+		if len(hash_ids) >= HASH_IDS_LIMIT and h not in hash_ids:
+			hash_ids.clear()
+		assert hash_ids.setdefault(h,state_id)==state_id, "Hash collision at "+hex(h)
+	
+	def hash_position(self,pid,old,new):
+		keys = self.zobrist_keys.position[pid]
+		self.zobrist ^= keys[old] ^ keys[new]
+	
+	def hash_card(self,pid,card):
+		self.zobrist ^= self.zobrist_keys.card[pid][card]
+	
+	def hash_cubes(self,city,color,old,new):
+		keys = self.zobrist_keys.cubes[(city,color)]
+		self.zobrist ^= keys[old] ^ keys[new]
+	
+	def hash_station(self,city):
+		self.zobrist ^= self.zobrist_keys.station[city]
+	
+	def hash_cure(self,color):
+		self.zobrist ^= self.zobrist_keys.cure[color]
+	
+	def hash_eradicated(self,color):
+		self.zobrist ^= self.zobrist_keys.eradicated[color]
+	
+	# Snapshot for lookahead: the map, cards, players' agents and configuration are shared and every
+	# mutable part is copied on first write by the copy-on-write turn steps, so both games stay independent
+	# Meant for games in play, setup resets shared objects in place
+	def clone(self):
+		other = copy.copy(self)
+		other.commons = copy.copy(self.commons)
+		other.journal = None
+		# Clones are explored by agents, they don't write to the game log, record or instruments
+		other.events = None
+		other.recorder = None
+		other.instruments = None
+		# Seeded generators are shared until either game uses them, then it takes its own copy at the same position
+		if self.generators is not None:
+			self.generators_shared = other.generators_shared = True
+		return other
+	
+	# Start recording turn steps (start_turn, do_action, draw_phase, do_discard, end_turn) so they can be undone
+	def begin_journal(self):
+		self.journal = []
+	
+	def end_journal(self):
+		self.journal = None
+	
+	# Reverts the last recorded step, including deck order and the random generator position
+	def undo(self):
+		changed, added, saved_state, rng_state = self.journal.pop()
+		for key in added:
+			del self.__dict__[key]
+		self.__dict__.update(changed)
+		if saved_state is not None:
+			self.restore_journal_state(saved_state)
+		if rng_state is not None:
+			self.rng.setstate(rng_state)
+	
+	# Hooks for state that is mutated in place instead of copy-on-write
+	def journal_state(self):
+		return None
+	
+	def restore_journal_state(self,saved_state):
+		pass
+	
+	# Records an event (see events.py), arguments are only formatted if the event is rendered
+	def emit(self,event_type,*args):
+		if self.events is not None:
+			self.events.emit((event_type,)+args)
+	
 	def log(self,new_log):
-		if self.commons['log_game']:
-			self.commons['game_log'] += new_log+"\n"
-		if self.commons['logger'] is not None:
-			self.commons['logger'].write(new_log+"\n")
-	
-	def setup(self,players_roles=None):
-		self.log("Setting game up")
-		if players_roles is None or len(players_roles)!=len(self.players):
+		self.emit(EventType.MESSAGE,new_log)
+	
+	# New independent random.Random for searches, determinizations or threads, derived from the game seed if any
+	# Every call gets the next child of SPAWN_STREAM, counted across the game and its clones (they share the counter)
+	def spawn_rng(self):
+		self.spawned[0] += 1
+		if self.seed is None:
+			return random.Random(self.rng.getrandbits(64))
+		return make_rng(self.seed,SPAWN_STREAM,self.spawned[0])
+	
+	# Makes the game draw cards and agent choices from rng alone, searches give one generator to the clones they explore
+	def use_rng(self,rng):
+		self.generators = (rng,rng)
+		self.generators_shared = False
+
+	def set_seed(self,seed):
+		self.seed = seed
+		self.generators = None if seed is None else (make_rng(seed,GAME_STREAM),make_rng(seed,AGENT_STREAM))
+		self.generators_shared = False
+		self.spawned = [0]
+	
+	# Generator of the cards, the global random module when the game is not seeded
+	@property
+	def rng(self):
+		return random if self.generators is None else self.own_generators()[0]
+	
+	# Generator meant for the agents
+	@property
+	def agent_rng(self):
+		return random if self.generators is None else self.own_generators()[1]
+	
+	def own_generators(self):
+		if self.generators_shared:
+			self.generators = tuple(copy_rng(rng) for rng in self.generators)
+			self.generators_shared = False
+		return self.generators
+	
+	# A seed makes the game reproducible: the same seed and actions give the same game
+	def setup(self,players_roles=None,seed=None):
+		if seed is not None:
+			self.set_seed(seed)
+		self.emit(EventType.SETUP)
+		# Sampling the roles draws from the generator, replays have to do the same
+		self.commons['sampled_roles'] = players_roles is None or len(players_roles)!=len(self.players)
+		if self.commons['sampled_roles']:
 			roles = list(PlayerRole)
 			roles.remove(PlayerRole.NULL)
 			# TODO: DISPATCHER and CONTINGENCY_PLANNER NOT FULLY IMPLEMENTED
@@ -117,10 +312,11 @@ class Game():
 			roles.remove(PlayerRole.DISPATCHER)
 			# REMOVED OPERATIONS_EXPERT BECAUSE OF SEARCH SPACE EXPLOSION
 			roles.remove(PlayerRole.OPERATIONS_EXPERT)
-			players_roles = random.sample(roles,len(self.players))
+			players_roles = self.rng.sample(roles,len(self.players))
 		# Player setup
 		for p,player in enumerate(self.players):
 			player.pid = p
+			player.action_cache.clear()
 			player.position = self.commons['starting_city']
 			player.playerrole = players_roles[p]
 			if player.playerrole == PlayerRole.OPERATIONS_EXPERT:
@@ -153,12 +349,12 @@ class Game():
 		self.player_deck.deck = [card for pile in self.player_deck.deck for card in pile if card.cardtype != CardType.EPIDEMIC]
 		self.player_deck.deck.extend(self.player_deck.discard)
 		self.player_deck.discard = []
-		random.shuffle(self.player_deck.deck)
+		self.rng.shuffle(self.player_deck.deck)
 		# Deal players' hands
 		for player in self.players:
 			for c in range(6-len(self.players)):
 				card = self.player_deck.deck.pop()
-				self.log(player.playerrole.name+" drew: "+card.name)
+				self.emit(EventType.DRAW,player.playerrole,card.name)
 				player.cards.append(card)
 				player.colors[card.color]+=1
 		self.player_deck.missing = False
@@ -176,7 +372,7 @@ class Game():
 			subpiles[index%self.commons['epidemic_cards']].append(card)
 		self.player_deck.deck = []
 		for pile in subpiles:
-			random.shuffle(pile)
+			self.rng.shuffle(pile)
 			self.player_deck.deck.append(pile)
 		self.player_deck.remaining = sum(len(p) for p in self.player_deck.deck)
 		self.player_deck.expecting_epidemic = True
@@ -190,7 +386,7 @@ class Game():
 		# Prepare infection deck
 		single_pile = [card for pile in self.infection_deck.deck for card in pile]
 		single_pile.extend(self.infection_deck.discard)
-		random.shuffle(single_pile)
+		self.rng.shuffle(single_pile)
 		self.infection_deck.deck = [single_pile]
 		self.infection_deck.discard = []
 		# Set initial infections
@@ -201,8 +397,10 @@ class Game():
 		for player in self.players:
 			player.move_triggers(self)
 		# Start game
+		self.zobrist = full_hash(self)
 		self.commons['error_flag'] = False
-		self.commons['game_log'] = ""
+		if self.events is not None:
+			self.events.mark_read()
 		self.current_player = starting_player
 		self.real_current_player = None
 		self.current_turn = 1
@@ -210,29 +408,19 @@ class Game():
 		self.game_state = GameState.PLAYING
 		
 	def calculate_distances(self):
-		city_distances = {
-				key: {target: (0 if target==key else (1 if target in self.cities[key].neighbors else len(self.cities))) for target in self.cities} for key in self.cities		
-		}
-		research_cities = [city for city in self.cities if self.cities[city].research_station]
-		for rs in research_cities:
-			for target in research_cities:
-				if rs!=target:
-					city_distances[rs][target] = 1
-		for key in city_distances:
-			unvisited = list(self.cities.keys())
-			while unvisited:
-				current_node = unvisited[0]
-				current_distance = city_distances[key][current_node]
-				for node in unvisited:
-					if city_distances[key][node] < current_distance:
-						current_node = node
-						current_distance = city_distances[key][node]
-				for neighbor in self.cities[current_node].neighbors:
-					new_distance = current_distance + 1
-					if new_distance < city_distances[key][neighbor]:
-						city_distances[key][neighbor] = new_distance
-				unvisited.remove(current_node)
-		self.distances = city_distances
+		self.distances = Distances(self.map_tables,[city for city in self.cities if self.cities[city].research_station])
+	
+	# Bitmask of the city indices where infections of the color are prevented (see outbreaks.py)
+	def blocked_cities(self,color):
+		if self.eradicated[color]:
+			return -1
+		index = self.map_tables.index
+		blocked = 0
+		for city in self.protected_cities:
+			blocked |= 1<<index[city]
+		if self.medic_position is not None and self.cures[color]:
+			blocked |= 1<<index[self.medic_position]
+		return blocked
 	
 	def lost(self):
 		return self.player_deck.remaining<0 or min(self.remaining_disease_cubes.values())<0 or self.outbreak_counter>=8
@@ -240,23 +428,28 @@ class Game():
 	def won(self):
 		return all(self.cures.values())
 		
+	@journaled()
 	def start_turn(self):
 		valid = self.turn_phase == TurnPhase.NEW
 		if valid:
-			self.log("Turn begin: "+self.players[self.current_player].playerrole.name)
+			self.emit(EventType.TURN_BEGIN,self.players[self.current_player].playerrole)
 			self.actions = 4
 			self.turn_phase = TurnPhase.ACTIONS
 		else:
 			print("Invalid turn start, current turn phase: "+self.turn_phase.name)
 		return valid
 		
+	@journaled()
 	def do_action(self,action,kwargs):
 		valid = self.turn_phase == TurnPhase.ACTIONS and action!=self.players[self.current_player].discard.__name__
 		if valid:
 			try:
+				entries = self.recorder.encode(self,action,kwargs) if self.recorder is not None else None
 				self.players = copy.copy(self.players)
 				self.players[self.current_player] = copy.copy(self.players[self.current_player])
 				if self.players[self.current_player].perform_action(self,action,kwargs):
+					if entries is not None:
+						self.recorder.add(self,entries)
 					self.actions -= 1
 					# Check if still in ACTIONS to see if DISCARD interruption occured
 					if self.actions == 0 and self.turn_phase == TurnPhase.ACTIONS:
@@ -283,6 +476,7 @@ class Game():
 			input("CONTINUE")
 		return valid
 	
+	@journaled(uses_rng=True)
 	def draw_phase(self):
 		valid = self.turn_phase == TurnPhase.DRAW
 		if valid:
@@ -298,12 +492,16 @@ class Game():
 				self.turn_phase = TurnPhase.INFECT
 		return valid
 	
+	@journaled()
 	def do_discard(self,discard):
 		valid = self.turn_phase == TurnPhase.DISCARD
 		if valid:
+			entries = self.recorder.encode(self,self.players[self.current_player].discard.__name__,{'discard': discard}) if self.recorder is not None else None
 			self.players = copy.copy(self.players)
 			self.players[self.current_player] = copy.copy(self.players[self.current_player])
 			if self.players[self.current_player].discard(self,discard):
+				if entries is not None:
+					self.recorder.add(self,entries)
 				if not self.players[self.current_player].must_discard():
 					if self.real_current_player == None:
 						self.turn_phase = TurnPhase.INFECT
@@ -317,6 +515,7 @@ class Game():
 			print("Invalid do discard, current turn phase: "+self.turn_phase.name)
 		return valid
 	
+	@journaled()
 	def end_turn(self):
 		valid = self.turn_phase == TurnPhase.INFECT
 		if valid:
@@ -338,32 +537,72 @@ class Game():
 			print("Invalid end turn, current turn phase: "+self.turn_phase.name)
 		return valid
 	
+	# Applies an action of the fixed integer action space (see actions.py), discards included
+	def do_action_index(self,action_index):
+		action, kwargs = self.action_space.decode(self,action_index)
+		if action == self.players[self.current_player].discard.__name__:
+			return self.do_discard(kwargs['discard'])
+		return self.do_action(action,kwargs)
+	
+	# Runs the steps that need no decision until a player must act or discard, or the game ends
+	def advance(self):
+		while self.game_state == GameState.PLAYING:
+			if self.turn_phase == TurnPhase.NEW:
+				self.start_turn()
+			elif self.turn_phase == TurnPhase.DRAW:
+				self.draw_phase()
+			elif self.turn_phase == TurnPhase.INFECT:
+				self.end_turn()
+			else:
+				break
+		return self.game_state == GameState.PLAYING and (self.turn_phase == TurnPhase.ACTIONS or self.turn_phase == TurnPhase.DISCARD)
+	
+	# Every phase runs under instruments.phase when instruments are attached (see instrumentation.py), a shared no-op otherwise
 	def game_turn(self):
+		instruments = self.instruments
+		phase = no_phase if instruments is None else instruments.phase
+		if instruments is not None:
+			instruments.turns += 1
 		if self.turn_phase == TurnPhase.NEW:
-			self.start_turn()
+			with phase('start_turn'):
+				self.start_turn()
 		while self.turn_phase == TurnPhase.ACTIONS or self.turn_phase == TurnPhase.DISCARD:
+			player = self.players[self.current_player]
+			if instruments is not None:
+				instruments.decision(self,player)
 			if self.turn_phase == TurnPhase.ACTIONS:
-				action, kwargs = self.players[self.current_player].request_action(self)
-				self.do_action(action,kwargs)
+				with phase('request_action'):
+					action, kwargs = player.request_action(self)
+				with phase('do_action',action):
+					self.do_action(action,kwargs)
 			else:
-				discard = self.players[self.current_player].request_discard(self)
-				self.do_discard(discard)
+				with phase('request_discard'):
+					discard = player.request_discard(self)
+				with phase('do_discard'):
+					self.do_discard(discard)
 		if self.turn_phase==TurnPhase.DRAW:
-			self.draw_phase()
+			with phase('draw_phase'):
+				self.draw_phase()
 		while self.turn_phase == TurnPhase.DISCARD:
-			discard = self.players[self.current_player].request_discard(self)
-			self.do_discard(discard)
+			player = self.players[self.current_player]
+			if instruments is not None:
+				instruments.decision(self,player)
+			with phase('request_discard'):
+				discard = player.request_discard(self)
+			with phase('do_discard'):
+				self.do_discard(discard)
 		if self.turn_phase == TurnPhase.INFECT:
-			self.end_turn()
+			with phase('end_turn'):
+				self.end_turn()
 
 	def game_loop(self):
-		self.log("Starting game")
+		self.emit(EventType.GAME_START)
 		while self.game_state == GameState.PLAYING and self.turn_phase!= TurnPhase.INACTIVE:
 			self.game_turn()
 		if self.game_state == GameState.WON:
-			self.log("Players won the game")
+			self.emit(EventType.GAME_WON)
 		elif self.game_state == GameState.LOST:
-			self.log("Players lost the game")
+			self.emit(EventType.GAME_LOST)
 		else:
-			self.log("This should not happen")
+			self.emit(EventType.GAME_INVALID)
 	
\ No newline at end of file
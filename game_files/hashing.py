@@ -0,0 +1,46 @@
+import random
+
+# Random 64-bit keys for every (owner, feature) pair of the game state, XOR-ed in and out as the state changes
+# Keys come from a fixed seed so hashes are comparable between processes
+class ZobristKeys():
+	_cache = {}
+
+	@classmethod
+	def get(cls,tables,players):
+		keys = cls._cache.get((id(tables),players))
+		if keys is None or keys.tables is not tables:
+			keys = cls(tables,players)
+			cls._cache[(id(tables),players)] = keys
+		return keys
+
+	def __init__(self,tables,players,seed=0x5EED):
+		rng = random.Random(seed)
+		key = lambda: rng.getrandbits(64)
+		self.tables = tables
+		self.position = [{city: key() for city in tables.names} for p in range(players)]
+		self.card = [{city: key() for city in tables.names} for p in range(players)]
+		# Index is the number of cubes, having no cubes contributes nothing
+		self.cubes = {(city,color): [0,key(),key(),key()] for city in tables.names for color in tables.colors}
+		self.station = {city: key() for city in tables.names}
+		self.cure = {color: key() for color in tables.colors}
+		self.eradicated = {color: key() for color in tables.colors}
+
+def full_hash(game):
+	keys = game.zobrist_keys
+	h = 0
+	for player in game.players:
+		if player.position is not None:
+			h ^= keys.position[player.pid][player.position]
+		for card in player.cards:
+			h ^= keys.card[player.pid][card.name]
+	for name,city in game.cities.items():
+		for color in game.commons['colors']:
+			h ^= keys.cubes[(name,color)][city.disease_cubes[color]]
+		if city.research_station:
+			h ^= keys.station[name]
+	for color in game.commons['colors']:
+		if game.cures[color]:
+			h ^= keys.cure[color]
+		if game.eradicated[color]:
+			h ^= keys.eradicated[color]
+	return h
@@ -0,0 +1,113 @@
+import contextlib
+import cProfile
+import time
+
+# Phases of a turn timed by Instrumentation, the agent's (request_*) and the engine's
+AGENT_PHASES = ('request_action','request_discard')
+ENGINE_PHASES = ('start_turn','do_action','draw_phase','do_discard','end_turn')
+
+# Opt-in counters of the games it is attached to (game.instruments): Game.game_turn runs every phase under phase and
+# reports every decision, the cities report every outbreak cascade, so a game without it only pays for the checks
+#	calls and times per phase (agent and engine), per action type of do_action
+#	cascades: outbroken cities per cascade with at least one outbreak
+#	decisions: number of options per decision (count_actions), when sizes is set
+# One instance can be attached to many games in turn to add them up
+class Instrumentation():
+	def __repr__(self):
+		return self.report()
+
+	def __init__(self,sizes=True,clock=time.perf_counter):
+		self.sizes = sizes
+		self.clock = clock
+		self.calls = {phase: 0 for phase in ENGINE_PHASES+AGENT_PHASES}
+		self.times = {phase: 0.0 for phase in ENGINE_PHASES+AGENT_PHASES}
+		self.action_calls = {}
+		self.action_times = {}
+		self.cascades = {}
+		self.decisions = {}
+		self.turns = 0
+
+	def attach(self,game):
+		game.instruments = self
+		return self
+
+	def detach(self,game):
+		if game.instruments is self:
+			game.instruments = None
+
+	def add(self,phase,elapsed):
+		self.calls[phase] += 1
+		self.times[phase] += elapsed
+
+	# Times the block as phase, and as the action type of a do_action
+	@contextlib.contextmanager
+	def phase(self,phase,action=None):
+		start = self.clock()
+		try:
+			yield
+		finally:
+			elapsed = self.clock()-start
+			self.add(phase,elapsed)
+			if action is not None:
+				self.action_calls[action] = self.action_calls.get(action,0)+1
+				self.action_times[action] = self.action_times.get(action,0.0)+elapsed
+
+	def outbreak(self,size):
+		self.cascades[size] = self.cascades.get(size,0)+1
+
+	def decision(self,game,player):
+		if self.sizes:
+			size = player.count_actions(game)
+			self.decisions[size] = self.decisions.get(size,0)+1
+
+	@property
+	def agent_time(self):
+		return sum(self.times[phase] for phase in AGENT_PHASES)
+
+	@property
+	def engine_time(self):
+		return sum(self.times[phase] for phase in ENGINE_PHASES)
+
+	def as_dict(self):
+		return {
+			'turns': self.turns,
+			'agent_time': self.agent_time,
+			'engine_time': self.engine_time,
+			'phases': {phase: {'calls': self.calls[phase], 'time': self.times[phase]} for phase in self.calls},
+			'actions': {action: {'calls': self.action_calls[action], 'time': self.action_times[action]} for action in self.action_calls},
+			'cascades': dict(sorted(self.cascades.items())),
+			'decisions': dict(sorted(self.decisions.items()))
+		}
+
+	def report(self):
+		total = self.agent_time+self.engine_time
+		share = lambda elapsed: format(100*elapsed/total if total else 0.0,".1f")+"%"
+		mean = lambda elapsed,calls: format(1e6*elapsed/calls if calls else 0.0,".1f")+"us"
+		lines = ["Turns: "+str(self.turns)+", agent: "+format(self.agent_time,".3f")+"s ("+share(self.agent_time)+"), engine: "+format(self.engine_time,".3f")+"s ("+share(self.engine_time)+")"]
+		for phase in AGENT_PHASES+ENGINE_PHASES:
+			lines.append("\t"+phase+": "+str(self.calls[phase])+" calls, "+format(self.times[phase],".3f")+"s ("+share(self.times[phase])+"), "+mean(self.times[phase],self.calls[phase])+" per call")
+		for action in sorted(self.action_calls,key=self.action_times.get,reverse=True):
+			lines.append("\t\t"+action+": "+str(self.action_calls[action])+" calls, "+mean(self.action_times[action],self.action_calls[action])+" per call")
+		if self.cascades:
+			lines.append("Outbreak cascades (cities: count): "+", ".join(str(size)+": "+str(count) for size,count in sorted(self.cascades.items())))
+		if self.decisions:
+			decisions = sum(self.decisions.values())
+			lines.append("Options per decision: mean "+format(sum(size*count for size,count in self.decisions.items())/decisions,".1f")+", max "+str(max(self.decisions))+" over "+str(decisions)+" decisions")
+		return "\n".join(lines)
+
+# Plays game.game_loop() under a profiler: cProfile.Profile by default or anything with enable/disable or start/stop
+# (e.g. a sampling profiler), returned afterwards. instruments is attached for the game if given
+def profile_game(game,profiler=None,instruments=None):
+	profiler = cProfile.Profile() if profiler is None else profiler
+	start = getattr(profiler,'enable',None) or profiler.start
+	stop = getattr(profiler,'disable',None) or profiler.stop
+	if instruments is not None:
+		instruments.attach(game)
+	start()
+	try:
+		game.game_loop()
+	finally:
+		stop()
+		if instruments is not None:
+			instruments.detach(game)
+	return profiler
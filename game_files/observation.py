@@ -0,0 +1,126 @@
+import numpy as np
+
+from .decks import CardType
+from .players import PlayerRole, TurnPhase
+
+# Scalars of the counters block, in order
+COUNTERS = ('actions','turn','outbreaks','infection_counter','infection_rate','research_stations','player_deck','epidemic_countdown','expecting_epidemic','infection_top_pile','discarding')
+
+# Fixed layout of what the players know of a game as one flat vector per game, built once per map and player count.
+# Blocks (V cities, C colors, P players, R roles), every block is a slice of the vector (see view):
+#	cubes (V,C), research_stations (V,), positions (P,V) one-hot, roles (P,R) one-hot, hands (P,V) city cards,
+#	hand_colors (P,C) card counts, cures (C,), eradicated (C,), remaining_cubes (C,), player_deck_colors (C,) city cards
+#	left in the player deck, player_discard (V,), infection_discard (V,), infection_piles (V,) known pile of every card
+#	in the infection deck counted from the top (1 is drawn next, 0 not in the deck), current_player (P,) one-hot and the
+#	counters (see COUNTERS). Hidden information (the order of the decks) is never encoded
+class ObservationEncoder():
+	_cache = {}
+
+	@classmethod
+	def get(cls,tables,players):
+		encoder = cls._cache.get((id(tables),players))
+		if encoder is None or encoder.tables is not tables:
+			encoder = cls(tables,players)
+			cls._cache[(id(tables),players)] = encoder
+		return encoder
+
+	def __repr__(self):
+		return "ObservationEncoder: "+str(self.size)+" features ("+", ".join(name+"="+str(self.slices[name].stop-self.slices[name].start) for name in self.names)+")"
+
+	def __init__(self,tables,players):
+		self.tables = tables
+		self.players = players
+		V, C, P, R = tables.n_cities, tables.n_colors, players, len(PlayerRole)
+		shapes = [
+			('cubes',(V,C)),
+			('research_stations',(V,)),
+			('positions',(P,V)),
+			('roles',(P,R)),
+			('hands',(P,V)),
+			('hand_colors',(P,C)),
+			('cures',(C,)),
+			('eradicated',(C,)),
+			('remaining_cubes',(C,)),
+			('player_deck_colors',(C,)),
+			('player_discard',(V,)),
+			('infection_discard',(V,)),
+			('infection_piles',(V,)),
+			('current_player',(P,)),
+			('counters',(len(COUNTERS),))
+		]
+		self.names = [name for name,shape in shapes]
+		self.shapes = dict(shapes)
+		self.slices = {}
+		self.size = 0
+		for name,shape in shapes:
+			self.slices[name] = slice(self.size,self.size+int(np.prod(shape)))
+			self.size += int(np.prod(shape))
+
+	# Block of one or many observations (a (size,) or (N, size) array) with its shape, writes go to the buffer
+	def view(self,observations,name):
+		return observations[...,self.slices[name]].reshape(observations.shape[:-1]+self.shapes[name])
+
+	def buffer(self,games=None,dtype=np.float32):
+		return np.zeros(self.size if games is None else (games,self.size),dtype=dtype)
+
+	# Writes the observation of a game into out (a new float32 vector if not given) and returns it
+	# Indicators are gathered as flat indices and written at once, small array writes cost more than the lists
+	def encode(self,game,out=None):
+		out = self.buffer() if out is None else out
+		out[:] = 0
+		tables = self.tables
+		index = tables.index
+		colors = tables.colors
+		color_index = tables.color_index
+		V, C = tables.n_cities, tables.n_colors
+		start = {name: block.start for name,block in self.slices.items()}
+		state = getattr(game,'state',None)
+		if state is not None:
+			# CompactGame keeps the cubes as an array already
+			out[self.slices['cubes']] = state.cubes.ravel()
+		else:
+			# Cube dictionaries keep the order of the map colors
+			out[self.slices['cubes']] = [cubes for name in tables.names for cubes in game.cities[name].disease_cubes.values()]
+		ones = [start['research_stations']+station for station in game.distances.stations]
+		hand_colors = [0]*(len(game.players)*C)
+		for p,player in enumerate(game.players):
+			ones.append(start['positions']+p*V+index[player.position])
+			ones.append(start['roles']+p*len(PlayerRole)+player.playerrole-1)
+			hand = start['hands']+p*V
+			for card in player.cards:
+				if card.cardtype==CardType.CITY:
+					ones.append(hand+index[card.name])
+					hand_colors[p*C+color_index[card.color]] += 1
+		deck = game.player_deck
+		infection = game.infection_deck
+		ones.extend(start['player_discard']+index[card.name] for card in deck.discard if card.cardtype==CardType.CITY)
+		ones.extend(start['infection_discard']+index[card.name] for card in infection.discard)
+		if game.current_player>=0:
+			ones.append(start['current_player']+game.current_player)
+		out[ones] = 1
+		piles = start['infection_piles']
+		for depth,pile in enumerate(reversed(infection.deck)):
+			out[[piles+index[card.name] for card in pile]] = depth+1
+		out[start['hand_colors']:start['cures']] = hand_colors
+		out[start['cures']:start['player_discard']] = [game.cures[color] for color in colors]+[game.eradicated[color] for color in colors]+[game.remaining_disease_cubes[color] for color in colors]+[deck.colors.get(color,0) for color in colors]
+		out[self.slices['counters']] = (
+			game.actions,
+			game.current_turn,
+			game.outbreak_counter,
+			game.infection_counter,
+			game.infection_rate,
+			game.research_station_counter,
+			deck.remaining,
+			deck.epidemic_countdown,
+			deck.expecting_epidemic,
+			len(infection.deck[-1]) if infection.deck else 0,
+			game.turn_phase==TurnPhase.DISCARD
+		)
+		return out
+
+	# Observations of many games as the rows of out ((N, size), new if not given)
+	def encode_batch(self,games,out=None):
+		out = self.buffer(len(games)) if out is None else out
+		for n,game in enumerate(games):
+			self.encode(game,out[n])
+		return out
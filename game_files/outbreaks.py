@@ -0,0 +1,89 @@
+import numpy as np
+
+from .events import EventType
+
+# Kinds of cascade steps
+INFECTED = 0
+OUTBREAK = 1
+PREVENTED = 2
+
+# Resolves one infection event of a single color and its chain reaction, without touching any state
+#	cubes: cubes of the color per city index (list, array or anything indexable), only read
+#	neighbors: neighbour indices per city index (MapTables.neighbors)
+#	blocked: bitmask of the cities where infections are prevented, -1 blocks every city (eradicated color)
+# Cities are visited in the order of the recursive rule (depth first, neighbours in map order), a city is skipped once it
+# has outbroken in this same event. Returns (steps, added, chain): steps is the list of (kind, city, net infection),
+# added the cubes added per city and chain the bitmask of the cities that outbroke
+def cascade(cubes,origin,infection,neighbors,blocked=0):
+	steps = []
+	added = {}
+	chain = 0
+	# Neighbours still to visit of every city in the chain, innermost last
+	pending = []
+	city, amount = origin, infection
+	while city is not None:
+		if blocked>>city & 1:
+			steps.append((PREVENTED,city,0))
+		else:
+			current = cubes[city]+added.get(city,0)
+			net_infection = min(3-current,amount)
+			added[city] = added.get(city,0)+net_infection
+			steps.append((INFECTED,city,net_infection))
+			if amount > net_infection:
+				steps.append((OUTBREAK,city,0))
+				chain |= 1<<city
+				pending.append(iter(neighbors[city]))
+		city, amount = None, 1
+		while pending and city is None:
+			for neighbor in pending[-1]:
+				if not chain>>neighbor & 1:
+					city = neighbor
+					break
+			else:
+				pending.pop()
+	return steps,added,chain
+
+def chain_size(chain):
+	return bin(chain).count("1")
+
+# Applies the steps of a cascade to a game (City and CompactCity share it, only their cubes storage differs)
+#	add: add(city, name, net_infection) adds the cubes to that city and takes them from the remaining ones, returns the
+#	cubes the city had before
+# Hashes the cubes, counts the outbreaks and emits the events in the order of the steps
+def apply_cascade(game,color,steps,add):
+	names = game.map_tables.names
+	for kind,city,net_infection in steps:
+		name = names[city]
+		if kind == INFECTED:
+			current = add(city,name,net_infection)
+			game.hash_cubes(name,color,current,current+net_infection)
+			game.emit(EventType.INFECT,net_infection,color,name)
+		elif kind == OUTBREAK:
+			game.emit(EventType.OUTBREAK,name)
+			game.outbreak_counter += 1
+		else:
+			game.emit(EventType.PREVENTED,name)
+
+# Same rule for a batch of independent events given as arrays, one event per row:
+#	cubes: (n, cities) cubes of the infected color, origins and amounts: (n,), protected: (n, cities) bool
+#	adjacency: (cities, cities) float matrix
+# A city outbreaks when its cubes plus its outbroken neighbours exceed 3 and every other unprotected city gets one
+# cube per outbroken neighbour, which is the final state the sequential rule reaches in any order
+# Returns the new cubes (n, cities) and the outbroken cities (n, cities)
+def cascade_batch(cubes,origins,amounts,adjacency,protected):
+	rows = np.arange(len(origins))
+	cubes = cubes.astype(np.int16)
+	infected = cubes.copy()
+	seeded = ~protected[rows,origins]
+	infected[rows,origins] = np.where(seeded,np.minimum(cubes[rows,origins]+amounts,3),cubes[rows,origins])
+	outbroken = np.zeros(cubes.shape,dtype=bool)
+	outbroken[rows,origins] = seeded & (cubes[rows,origins]+amounts>3)
+	frontier = outbroken
+	while frontier.any():
+		incoming = (frontier.astype(np.float32) @ adjacency).astype(np.int16)
+		incoming[outbroken | protected] = 0
+		total = infected+incoming
+		frontier = (total>3) & ~outbroken
+		infected = np.minimum(total,3)
+		outbroken = outbroken | frontier
+	return infected,outbroken
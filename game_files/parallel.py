@@ -0,0 +1,190 @@
+import multiprocessing
+import os
+import pickle
+import random
+import time
+
+import numpy as np
+
+from .actions import ActionSpace
+from .agents import ISMCTSNode, ISMCTSPlayer
+from .cities import CITY_CARDS, MapTables
+from .determinization import DeterminizationSampler
+from .hashing import ZobristKeys
+
+# Parallel ISMCTS over a pool of processes:
+#	root parallelism: every worker grows its own tree from the same decision and the root statistics are summed
+#	leaf parallelism: the tree stays in the caller, which selects a batch of leaves and sends their rollouts to the workers.
+#	Selection and expansion (determinizing, descending the tree and playing the path) stay serial in the caller, only the
+#	rollouts run in parallel, so the speedup is bounded by the share of the search spent selecting (search.stats
+#	'selection_time', Benchmark.py search)
+# Workers are started once and kept (SearchPool.get), with the map tables and action spaces already built
+
+# Worker side, the root game of the current decision is unpickled once per worker
+_root_game = (None,None)
+
+def warm_worker():
+	tables = MapTables.get(CITY_CARDS)
+	for players in range(2,5):
+		ActionSpace.get(tables,players)
+		ZobristKeys.get(tables,players)
+
+def worker_game(key,payload):
+	global _root_game
+	if _root_game[0] != key:
+		_root_game = (key,pickle.loads(payload))
+	return _root_game[1]
+
+# Root parallelism task: (key, pickled game, agent parameters, seed, iterations, time limit)
+# Returns the iterations, the tree nodes visited and (visits, available, value) of every child of the worker's root
+def root_search(task):
+	key, payload, parameters, seed, iterations, time_limit = task
+	game = worker_game(key,payload).clone()
+	game.use_rng(random.Random(seed))
+	agent = ISMCTSPlayer(iterations=iterations,time_limit=time_limit,report=False,**parameters)
+	root = ISMCTSNode()
+	iterations, nodes = agent.grow(root,game,time.perf_counter())
+	return iterations,nodes,{action: (child.visits,child.available,child.value) for action,child in root.children.items()}
+
+# Leaf parallelism task: (key, pickled game, agent parameters, leaves), every leaf is (player deck order, infection deck
+# order, seed, actions): the worker determinizes the game the same way as the caller, replays the actions of the path
+# with the same generator and plays the rollout. Returns the value of every leaf
+def leaf_rollouts(task):
+	key, payload, parameters, leaves = task
+	game = worker_game(key,payload)
+	agent = ISMCTSPlayer(report=False,**parameters)
+	sampler = DeterminizationSampler(game,1,rng=np.random.default_rng(0))
+	values = []
+	for player_order, infection_order, seed, actions in leaves:
+		sampler.player_orders[0] = player_order
+		sampler.infection_orders[0] = infection_order
+		state = sampler.determinize(game,0)
+		rng = random.Random(seed)
+		state.use_rng(rng)
+		for action in actions:
+			state.advance()
+			state.do_action_index(action)
+		values.append(agent.rollout(state,rng))
+	return values
+
+class SearchPool():
+	_pools = {}
+
+	# Pool with the given number of workers, started on first use and shared by every agent
+	@classmethod
+	def get(cls,workers=None):
+		workers = workers or os.cpu_count()
+		pool = cls._pools.get(workers)
+		if pool is None:
+			pool = cls._pools[workers] = cls(workers)
+		return pool
+
+	@classmethod
+	def close_all(cls):
+		for pool in cls._pools.values():
+			pool.close()
+		cls._pools = {}
+
+	def __repr__(self):
+		return "SearchPool: "+str(self.workers)+" workers"
+
+	def __init__(self,workers):
+		self.workers = workers
+		self.pool = multiprocessing.Pool(workers,initializer=warm_worker)
+
+	def map(self,function,tasks):
+		return self.pool.map(function,tasks,chunksize=1)
+
+	def close(self):
+		self.pool.terminate()
+		self.pool.join()
+
+# ISMCTSPlayer searching with every worker of a SearchPool under the same budget (time_limit or iterations in total)
+#	mode "root": independent trees merged at the root
+#	mode "leaf": one tree, batch leaves per worker are selected (with virtual loss) and rolled out in parallel, the
+#	selection itself is serial
+class ParallelISMCTSPlayer(ISMCTSPlayer):
+	def __init__(self,workers=None,mode="root",batch=8,**kwargs):
+		super().__init__(**kwargs)
+		self.workers = workers
+		self.mode = mode
+		self.batch = batch
+		self.selection_time = 0.0
+
+	# Parameters the workers' agents are built with
+	def parameters(self):
+		return {'exploration': self.exploration, 'rollout_turns': self.rollout_turns, 'samples': self.samples}
+
+	# Also keeps the seconds spent selecting in the caller (leaf mode) in search.stats['selection_time']
+	def search_action(self,game):
+		self.selection_time = 0.0
+		action = super().search_action(game)
+		self.search.stats['selection_time'] = self.selection_time
+		return action
+
+	def grow(self,root,game,start):
+		pool = SearchPool.get(self.workers)
+		rng = random.Random(game.agent_rng.getrandbits(64))
+		# Clones share the players' agents, whose trees are left out of the pickle, and the log stream stays here
+		state = game.clone()
+		state.commons['logger'] = None
+		payload = pickle.dumps(state,pickle.HIGHEST_PROTOCOL)
+		key = rng.getrandbits(64)
+		if self.mode == "leaf":
+			return self.grow_leaves(root,game,start,pool,rng,key,payload)
+		return self.grow_roots(root,start,pool,rng,key,payload)
+
+	def grow_roots(self,root,start,pool,rng,key,payload):
+		workers = pool.workers
+		if self.iterations is not None:
+			budgets = [self.iterations//workers+(1 if w<self.iterations%workers else 0) for w in range(workers)]
+			time_limit = None
+		else:
+			budgets = [None]*workers
+			time_limit = max(self.time_limit-(time.perf_counter()-start),0.0)
+		tasks = [(key,payload,self.parameters(),rng.getrandbits(64),budget,time_limit) for budget in budgets]
+		iterations = nodes = 0
+		for worker_iterations, worker_nodes, children in pool.map(root_search,tasks):
+			iterations += worker_iterations
+			nodes += worker_nodes
+			root.visits += worker_iterations
+			for action, (visits, available, value) in children.items():
+				child = root.children.get(action)
+				if child is None:
+					child = root.children[action] = ISMCTSNode(action)
+				child.visits += visits
+				child.available += available
+				child.value += value
+		return iterations,nodes
+
+	def grow_leaves(self,root,game,start,pool,rng,key,payload):
+		sampler = DeterminizationSampler(game,self.samples,rng=np.random.default_rng(rng.getrandbits(64)))
+		iterations = nodes = 0
+		k = self.samples
+		while self.searching(iterations,start):
+			size = pool.workers*self.batch
+			if self.iterations is not None:
+				size = min(size,self.iterations-iterations)
+			paths = []
+			leaves = []
+			selecting = time.perf_counter()
+			for i in range(size):
+				if k==self.samples:
+					sampler.sample()
+					k = 0
+				state = sampler.determinize(game,k)
+				seed = rng.getrandbits(64)
+				state.use_rng(random.Random(seed))
+				path = self.select(root,state,rng)
+				paths.append(path)
+				leaves.append((sampler.player_orders[k].copy(),sampler.infection_orders[k].copy(),seed,[node.action for node in path[1:]]))
+				k += 1
+			self.selection_time += time.perf_counter()-selecting
+			chunks = [leaves[w::pool.workers] for w in range(pool.workers)]
+			results = pool.map(leaf_rollouts,[(key,payload,self.parameters(),chunk) for chunk in chunks if chunk])
+			for w, values in enumerate(results):
+				for path, value in zip(paths[w::pool.workers],values):
+					self.backup(path,value)
+			iterations += size
+			nodes += sum(len(path) for path in paths)
+		return iterations,nodes
@@ -1,9 +1,11 @@
 import copy
 import itertools
+import math
+import random
 from enum import IntEnum, auto
-import numpy as np
 
 from .decks import CardType
+from .events import EventType
 
 class PlayerRole(IntEnum):
 	NULL = auto()
@@ -23,7 +25,49 @@ class TurnPhase(IntEnum):
 	DISCARD = auto()
 	INFECT = auto()
 
+# Cached lists of available actions shared by the copies of a player
+# A whole result is reused while the game state hash is unchanged, otherwise the costly action types are checked
+# against the part of the state they depend on. available_actions hands out copies (see copy_options), so agents can
+# change what they get without touching the cache shared with the clones
+class ActionCache():
+	def __repr__(self):
+		return "Action cache state hits: "+str(self.state_hits)+", misses: "+str(self.state_misses)+" - Action type hits: "+str(sum(self.hits.values()))+", misses: "+str(sum(self.misses.values()))
+	
+	def __init__(self):
+		self.state_hits = 0
+		self.state_misses = 0
+		self.hits = {}
+		self.misses = {}
+		self.clear()
+	
+	def clear(self):
+		self.state = None
+		self.actions = {}
+		self.entries = {}
+	
+	def lookup(self,action,key):
+		entry = self.entries.get(action)
+		if entry is not None and entry[0]==key:
+			self.hits[action] = self.hits.get(action,0)+1
+			return entry[1]
+		self.misses[action] = self.misses.get(action,0)+1
+		return None
+	
+	def store(self,action,key,options):
+		self.entries[action] = (key,options)
+		return options
+
+# Fresh lists and option dicts (and chosen_cards lists) of cached actions
+def copy_options(actions):
+	copies = {action: [dict(option) for option in options] for action,options in actions.items()}
+	for option in copies.get('discover_cure',()):
+		option['chosen_cards'] = list(option['chosen_cards'])
+	return copies
+
 class Player():
+	# Whether available_actions lists every choice of cards for a cure or only the canonical one
+	cure_variants = True
+	
 	def __repr__(self):
 		return self.playerrole.name+" Current location: "+str(self.position)+" - Cards: "+str(self.cards)
 	
@@ -40,6 +84,7 @@ class Player():
 		self.position = None
 		self.playerrole = PlayerRole.NULL
 		self.colors = {}
+		self.action_cache = ActionCache()
 		
 	def get_id(self):
 		return (self.position,tuple(c.name for c in self.cards))
@@ -57,19 +102,20 @@ class Player():
 				# Infect x3 bottom card				
 				game.infection_deck = copy.copy(game.infection_deck)
 				city_name = game.infection_deck.draw_bottom().name
-				game.log(self.playerrole.name+" drew: epidemic\nEpidemic at: "+city_name)
+				game.emit(EventType.EPIDEMIC,self.playerrole,city_name)
 				game.cities = copy.copy(game.cities)
 				game.cities[city_name] = copy.copy(game.cities[city_name])
 				city = game.cities[city_name]
 				city.infect(game,infection=3,color=city.color)
 				# Shuffle infect discard pile
-				game.infection_deck.intensify()
+				game.infection_deck.intensify(game.rng)
 			elif card.cardtype != CardType.MISSING:
-				game.log(self.playerrole.name+" drew: "+card.name)
+				game.emit(EventType.DRAW,self.playerrole,card.name)
 				self.colors = copy.copy(self.colors)
 				self.colors[card.color]+=1
 				# Normal card
 				self.cards.append(card)
+				game.hash_card(self.pid,card.name)
 		# Draws at end of turn, so resets Operations Expert special ability
 		if self.playerrole==PlayerRole.OPERATIONS_EXPERT:
 			self.special_move = True
@@ -82,7 +128,7 @@ class Player():
 					game.cities = copy.copy(game.cities)
 					game.cities[self.position] = copy.copy(game.cities[self.position])
 					game.cities[self.position].disinfect(game,game.cities[self.position].disease_cubes[color],color)
-					game.log("MEDIC healed "+str(color)+" at "+str(self.position))
+					game.emit(EventType.HEAL,color,self.position)
 		elif self.playerrole == PlayerRole.QUARANTINE_SPECIALIST:
 			game.protected_cities = [self.position]
 			game.protected_cities.extend(game.cities[self.position].neighbors)
@@ -124,32 +170,229 @@ class Player():
 		return actions[action](game,**kwargs) if action in actions else False
 	
 	def available_actions(self,game):
-		valid_cities = [city for city in game.cities if city!=self.position]
 		actions = {}
+		if game.turn_phase!=TurnPhase.ACTIONS and game.turn_phase!=TurnPhase.DISCARD:
+			return actions
+		cache = self.action_cache
+		# Same game state hash as the last call: nothing changed
+		# The hash takes hands as sets, the order of the cards (which orders the options) and cure_variants are keyed apart
+		state = (game.zobrist,game.turn_phase,self.pid,getattr(self,'special_move',None),self.cure_variants,tuple([card.name for player in game.players for card in player.cards]))
+		if cache.state==state:
+			cache.state_hits += 1
+			return copy_options(cache.actions)
+		cache.state_misses += 1
+		# Otherwise the costly action types are checked against the part of the state they depend on
+		# Hands and station tuples are replaced (copy-on-write) when they change so the checks are mostly identity checks
 		if game.turn_phase==TurnPhase.ACTIONS:
-			actions[self.drive_ferry.__name__] = [ {'target':city} for city in game.cities[self.position].neighbors ]
+			location = game.cities[self.position]
+			hand = (self.position,self.cards,len(self.cards))
+			stations = game.distances.stations
+			actions[self.drive_ferry.__name__] = [ {'target':city} for city in location.neighbors ]
 			actions[self.direct_flight.__name__] = [ {'target':card.name} for card in self.cards if (card.cardtype==CardType.CITY and card.name!=self.position) ]
-			actions[self.charter_flight.__name__] = [ {'target':city} for city in valid_cities] if self.position in self.cards else []
-			actions[self.shuttle_flight.__name__] = [ {'target':city} for city in valid_cities if game.cities[city].research_station] if (game.cities[self.position].research_station and game.research_station_counter>1) else []
-			actions[self.build_researchstation.__name__] = ([{'replace':"none"}] if game.research_station_counter < 6 else [{'replace':city} for city in game.cities if game.cities[city].research_station]) if ((self.position in self.cards or self.playerrole == PlayerRole.OPERATIONS_EXPERT) and not game.cities[self.position].research_station) else []
-			actions[self.treat_disease.__name__] = [ {'color':color} for color in game.commons['colors'] if game.cities[self.position].disease_cubes[color]>0 ]
-			actions[self.give_knowledge.__name__] = [{'receiver':player.pid, 'target':card.name} for player in game.players for card in self.cards  if (player!=self and self.position==player.position and card.cardtype==CardType.CITY and (self.position==card.name or self.playerrole==PlayerRole.RESEARCHER))]
-			actions[self.receive_knowledge.__name__] = [{'giver':player.pid, 'target':card.name} for player in game.players for card in player.cards if (player!=self and self.position==player.position and card.cardtype==CardType.CITY and (self.position==card.name or player.playerrole==PlayerRole.RESEARCHER))]
-			actions[self.discover_cure.__name__] = [{'color':color,'chosen_cards':[self.cards[i].name for i in chosen_cards]} for chosen_cards in list(itertools.combinations(np.arange(len(self.cards)),4 if self.playerrole==PlayerRole.SCIENTIST else 5)) for color in game.commons['colors'] if all([city in game.cities.keys() and game.cities[city].color==color for city in [self.cards[i].name for i in chosen_cards]])] if game.cities[self.position].research_station and len(self.cards)>=(4 if self.playerrole==PlayerRole.SCIENTIST else 5) else []
+			options = cache.lookup(self.charter_flight.__name__,hand)
+			if options is None:
+				options = cache.store(self.charter_flight.__name__,hand,[ {'target':city} for city in game.cities if city!=self.position] if self.position in self.cards else [])
+			actions[self.charter_flight.__name__] = options
+			options = cache.lookup(self.shuttle_flight.__name__,(self.position,stations))
+			if options is None:
+				options = cache.store(self.shuttle_flight.__name__,(self.position,stations),[ {'target':city} for city in game.cities if city!=self.position and game.cities[city].research_station] if (location.research_station and game.research_station_counter>1) else [])
+			actions[self.shuttle_flight.__name__] = options
+			options = cache.lookup(self.build_researchstation.__name__,(hand,stations,self.playerrole))
+			if options is None:
+				options = cache.store(self.build_researchstation.__name__,(hand,stations,self.playerrole),([{'replace':"none"}] if game.research_station_counter < 6 else [{'replace':city} for city in game.cities if game.cities[city].research_station]) if ((self.position in self.cards or self.playerrole == PlayerRole.OPERATIONS_EXPERT) and not location.research_station) else [])
+			actions[self.build_researchstation.__name__] = options
+			actions[self.treat_disease.__name__] = [ {'color':color} for color in game.commons['colors'] if location.disease_cubes[color]>0 ]
+			sharing = (hand,self.playerrole,tuple((player.pid,player.position,player.playerrole,player.cards,len(player.cards)) for player in game.players if player is not self))
+			options = cache.lookup(self.give_knowledge.__name__,sharing)
+			if options is None:
+				options = cache.store(self.give_knowledge.__name__,sharing,[{'receiver':player.pid, 'target':card.name} for player in game.players for card in self.cards  if (player!=self and self.position==player.position and card.cardtype==CardType.CITY and (self.position==card.name or self.playerrole==PlayerRole.RESEARCHER))])
+			actions[self.give_knowledge.__name__] = options
+			options = cache.lookup(self.receive_knowledge.__name__,sharing)
+			if options is None:
+				options = cache.store(self.receive_knowledge.__name__,sharing,[{'giver':player.pid, 'target':card.name} for player in game.players for card in player.cards if (player!=self and self.position==player.position and card.cardtype==CardType.CITY and (self.position==card.name or player.playerrole==PlayerRole.RESEARCHER))])
+			actions[self.receive_knowledge.__name__] = options
+			options = cache.lookup(self.discover_cure.__name__,(hand,stations,self.playerrole,self.cure_variants))
+			if options is None:
+				options = cache.store(self.discover_cure.__name__,(hand,stations,self.playerrole,self.cure_variants),self.cure_options(game))
+			actions[self.discover_cure.__name__] = options
 			actions[self.rally_flight.__name__] = [{'player':player.pid,'target_player':target.pid} for player in game.players for target in game.players if player.position!=target.position] if self.playerrole==PlayerRole.DISPATCHER else []
-			actions[self.special_charter_flight.__name__] = [{'discard':card.name,'target':city} for card in self.cards for city in valid_cities if card.name in game.cities.keys()] if self.playerrole==PlayerRole.OPERATIONS_EXPERT and self.special_move and game.cities[self.position].research_station else []
-		elif game.turn_phase==TurnPhase.DISCARD:
+			special = (hand,stations,self.playerrole,getattr(self,'special_move',None))
+			options = cache.lookup(self.special_charter_flight.__name__,special)
+			if options is None:
+				options = cache.store(self.special_charter_flight.__name__,special,[{'discard':card.name,'target':city} for card in self.cards for city in game.cities if city!=self.position and card.name in game.cities.keys()] if self.playerrole==PlayerRole.OPERATIONS_EXPERT and self.special_move and location.research_station else [])
+			actions[self.special_charter_flight.__name__] = options
+		else:
 			actions[self.discard.__name__] = [{'discard':card.name} for card in self.cards]
-		return actions
+		cache.state = state
+		cache.actions = actions
+		return copy_options(actions)
+	
+	# Action types in the order available_actions lists them for the current turn phase
+	def action_types(self,game):
+		if game.turn_phase==TurnPhase.ACTIONS:
+			return (self.drive_ferry.__name__,self.direct_flight.__name__,self.charter_flight.__name__,self.shuttle_flight.__name__,self.build_researchstation.__name__,self.treat_disease.__name__,self.give_knowledge.__name__,self.receive_knowledge.__name__,self.discover_cure.__name__,self.rally_flight.__name__,self.special_charter_flight.__name__)
+		if game.turn_phase==TurnPhase.DISCARD:
+			return (self.discard.__name__,)
+		return ()
+	
+	# Lazily yields (action, kwargs) in the same order as the flattened available_actions
+	def iter_actions(self,game):
+		for action in self.action_types(game):
+			for kwargs in self.iter_options(game,action):
+				yield action,kwargs
+	
+	def iter_options(self,game,action):
+		location = game.cities[self.position]
+		if action == self.drive_ferry.__name__:
+			for city in location.neighbors:
+				yield {'target':city}
+		elif action == self.direct_flight.__name__:
+			for card in self.cards:
+				if card.cardtype==CardType.CITY and card.name!=self.position:
+					yield {'target':card.name}
+		elif action == self.charter_flight.__name__:
+			if self.position in self.cards:
+				for city in game.cities:
+					if city!=self.position:
+						yield {'target':city}
+		elif action == self.shuttle_flight.__name__:
+			if location.research_station and game.research_station_counter>1:
+				for city in self.station_cities(game):
+					if city!=self.position:
+						yield {'target':city}
+		elif action == self.build_researchstation.__name__:
+			if (self.position in self.cards or self.playerrole == PlayerRole.OPERATIONS_EXPERT) and not location.research_station:
+				if game.research_station_counter < 6:
+					yield {'replace':"none"}
+				else:
+					for city in self.station_cities(game):
+						yield {'replace':city}
+		elif action == self.treat_disease.__name__:
+			for color in game.commons['colors']:
+				if location.disease_cubes[color]>0:
+					yield {'color':color}
+		elif action == self.give_knowledge.__name__:
+			for player in game.players:
+				if player is not self and self.position==player.position:
+					for card in self.cards:
+						if card.cardtype==CardType.CITY and (self.position==card.name or self.playerrole==PlayerRole.RESEARCHER):
+							yield {'receiver':player.pid, 'target':card.name}
+		elif action == self.receive_knowledge.__name__:
+			for player in game.players:
+				if player is not self and self.position==player.position:
+					for card in player.cards:
+						if card.cardtype==CardType.CITY and (self.position==card.name or player.playerrole==PlayerRole.RESEARCHER):
+							yield {'giver':player.pid, 'target':card.name}
+		elif action == self.discover_cure.__name__:
+			yield from self.cure_options(game)
+		elif action == self.rally_flight.__name__:
+			if self.playerrole==PlayerRole.DISPATCHER:
+				for player in game.players:
+					for target in game.players:
+						if player.position!=target.position:
+							yield {'player':player.pid,'target_player':target.pid}
+		elif action == self.special_charter_flight.__name__:
+			if self.playerrole==PlayerRole.OPERATIONS_EXPERT and self.special_move and location.research_station:
+				for card in self.cards:
+					if card.name in game.cities:
+						for city in game.cities:
+							if city!=self.position:
+								yield {'discard':card.name,'target':city}
+		elif action == self.discard.__name__:
+			for card in self.cards:
+				yield {'discard':card.name}
+	
+	# Cities with research station in the order of game.cities
+	def station_cities(self,game):
+		names = game.distances.tables.names
+		return [names[station] for station in sorted(game.distances.stations)]
+	
+	# Number of options of every action type (same order as available_actions), without listing them
+	def action_counts(self,game):
+		if game.turn_phase==TurnPhase.DISCARD:
+			return [(self.discard.__name__,len(self.cards))]
+		if game.turn_phase!=TurnPhase.ACTIONS:
+			return []
+		location = game.cities[self.position]
+		position_card = self.position in self.cards
+		hand = [card.name for card in self.cards if card.cardtype==CardType.CITY]
+		stations = len(game.distances.stations)
+		others = [player for player in game.players if player is not self and player.position==self.position]
+		cures = 0
+		needed = 4 if self.playerrole==PlayerRole.SCIENTIST else 5
+		if location.research_station and len(self.cards)>=needed:
+			colors = {}
+			for card in hand:
+				if card in game.cities:
+					colors[game.cities[card].color] = colors.get(game.cities[card].color,0)+1
+			for cards in colors.values():
+				if cards>=needed:
+					cures += math.comb(cards,needed) if self.cure_variants else 1
+		return [
+			(self.drive_ferry.__name__,len(location.neighbors)),
+			(self.direct_flight.__name__,len(hand)-(1 if self.position in hand else 0)),
+			(self.charter_flight.__name__,len(game.cities)-1 if position_card else 0),
+			(self.shuttle_flight.__name__,stations-1 if location.research_station and game.research_station_counter>1 else 0),
+			(self.build_researchstation.__name__,(1 if game.research_station_counter < 6 else stations) if (position_card or self.playerrole == PlayerRole.OPERATIONS_EXPERT) and not location.research_station else 0),
+			(self.treat_disease.__name__,sum([location.disease_cubes[color]>0 for color in game.commons['colors']])),
+			(self.give_knowledge.__name__,len(others)*(len(hand) if self.playerrole==PlayerRole.RESEARCHER else (1 if self.position in hand else 0))),
+			(self.receive_knowledge.__name__,sum([sum([card.cardtype==CardType.CITY for card in player.cards]) if player.playerrole==PlayerRole.RESEARCHER else (1 if self.position in player.cards else 0) for player in others])),
+			(self.discover_cure.__name__,cures),
+			(self.rally_flight.__name__,sum([player.position!=target.position for player in game.players for target in game.players]) if self.playerrole==PlayerRole.DISPATCHER else 0),
+			(self.special_charter_flight.__name__,sum([card.name in game.cities for card in self.cards])*(len(game.cities)-1) if self.playerrole==PlayerRole.OPERATIONS_EXPERT and self.special_move and location.research_station else 0)
+		]
+	
+	def count_actions(self,game):
+		return sum([count for action,count in self.action_counts(game)])
+	
+	# Draws one action uniformly among the flattened available_actions without listing them
+	# Consumes the generator exactly as rng.choice over that list would
+	def sample_action(self,game,rng=random):
+		counts = self.action_counts(game)
+		index = rng.randrange(sum([count for action,count in counts]))
+		for action,count in counts:
+			if index<count:
+				return action,self.option_at(game,action,index)
+			index -= count
+	
+	# The index-th option of an action type, computed directly for the large charter flight lists
+	def option_at(self,game,action,index):
+		if action == self.charter_flight.__name__:
+			tables = game.distances.tables
+			return {'target': tables.names[index if index<tables.index[self.position] else index+1]}
+		if action == self.special_charter_flight.__name__:
+			cards = [card.name for card in self.cards if card.name in game.cities]
+			per_card = len(game.cities)-1
+			return {'discard':cards[index//per_card],'target':self.option_at(game,self.charter_flight.__name__,index%per_card)['target']}
+		return next(itertools.islice(self.iter_options(game,action),index,None))
+	
+	# Cure options are combined per color from the cards of that color only
+	# With cure_variants set to False only the canonical choice of cards is offered (see ActionSpace.cure_cards)
+	def cure_options(self,game,all_variants=None):
+		needed = 4 if self.playerrole==PlayerRole.SCIENTIST else 5
+		if not game.cities[self.position].research_station or len(self.cards)<needed:
+			return []
+		if not (self.cure_variants if all_variants is None else all_variants):
+			options = [{'color':color,'chosen_cards':game.action_space.cure_cards(game,self,color)} for color in game.commons['colors']]
+			return [option for option in options if option['chosen_cards'] is not None]
+		variants = []
+		for color in game.commons['colors']:
+			indices = [i for i,card in enumerate(self.cards) if card.cardtype==CardType.CITY and card.name in game.cities and game.cities[card.name].color==color]
+			if len(indices)>=needed:
+				variants.extend((chosen_cards,color) for chosen_cards in itertools.combinations(indices,needed))
+		# Same order as combining the whole hand
+		variants.sort()
+		return [{'color':color,'chosen_cards':[self.cards[i].name for i in chosen_cards]} for chosen_cards,color in variants]
 	
 	# Card is a string with the card name
 	def discard(self,game,card):
 		valid = card in self.cards
 		if valid:
-			game.log(self.playerrole.name+" discarded: "+card)
+			game.emit(EventType.DISCARD,self.playerrole,card)
 			self.cards = copy.copy(self.cards)
 			game.player_deck = copy.copy(game.player_deck)
 			card = self.cards.pop(self.cards.index(card))
+			game.hash_card(self.pid,card.name)
 			self.colors = copy.copy(self.colors)
 			self.colors[card.color]-=1
 			game.player_deck.discard = copy.copy(game.player_deck.discard)
@@ -160,7 +403,8 @@ class Player():
 	def drive_ferry(self,game,target):
 		valid = target in game.cities[self.position].neighbors
 		if valid:
-			game.log(self.playerrole.name+" drove to: "+target)
+			game.emit(EventType.DRIVE_FERRY,self.playerrole,target)
+			game.hash_position(self.pid,self.position,target)
 			self.position = target
 			self.move_triggers(game)
 		return valid
@@ -169,8 +413,9 @@ class Player():
 	def direct_flight(self,game,target):
 		valid = target in self.cards and self.position!=target and target in game.cities.keys()
 		if valid:
-			game.log(self.playerrole.name+" direct flew to: "+target)
+			game.emit(EventType.DIRECT_FLIGHT,self.playerrole,target)
 			self.discard(game,target)
+			game.hash_position(self.pid,self.position,target)
 			self.position = target
 			self.move_triggers(game)
 		return valid
@@ -179,8 +424,9 @@ class Player():
 	def charter_flight(self,game,target):
 		valid = self.position in self.cards and self.position!=target and target in game.cities.keys()
 		if valid:
-			game.log(self.playerrole.name+" charter flew to: "+target)
+			game.emit(EventType.CHARTER_FLIGHT,self.playerrole,target)
 			self.discard(game,self.position)
+			game.hash_position(self.pid,self.position,target)
 			self.position = target
 			self.move_triggers(game)
 		return valid
@@ -189,7 +435,8 @@ class Player():
 	def shuttle_flight(self,game,target):
 		valid = game.cities[self.position].research_station and self.position!=target and target in game.cities.keys() and game.cities[target].research_station
 		if valid:
-			game.log(self.playerrole.name+" shuttle flew to: "+target)
+			game.emit(EventType.SHUTTLE_FLIGHT,self.playerrole,target)
+			game.hash_position(self.pid,self.position,target)
 			self.position = target
 			self.move_triggers(game)
 		return valid
@@ -200,26 +447,30 @@ class Player():
 			replace=None
 		valid = (self.position in self.cards or self.playerrole == PlayerRole.OPERATIONS_EXPERT) and not game.cities[self.position].research_station and (game.research_station_counter<6 or (replace in game.cities.keys() and game.cities[replace].research_station))
 		if valid:
-			game.log(self.playerrole.name+" built research station")
+			game.emit(EventType.BUILD,self.playerrole)
 			game.cities = copy.copy(game.cities)
+			game.distances = copy.copy(game.distances)
 			if game.research_station_counter == 6:
 				game.cities[replace] = copy.copy(game.cities[replace])
 				game.cities[replace].research_station = False
-				game.log(self.playerrole.name+" removed research station at: "+replace)
+				game.hash_station(replace)
+				game.distances.remove_station(replace)
+				game.emit(EventType.REMOVE_STATION,self.playerrole,replace)
 			else:
 				game.research_station_counter += 1
 			if self.playerrole != PlayerRole.OPERATIONS_EXPERT:
 				self.discard(game,self.position)
 			game.cities[self.position] = copy.copy(game.cities[self.position])
 			game.cities[self.position].research_station = True
-			game.calculate_distances()
+			game.hash_station(self.position)
+			game.distances.add_station(self.position)
 		return valid
 	
 	# Color is string object of the color name
 	def treat_disease(self,game,color):
 		valid = game.cities[self.position].disease_cubes[color] > 0
 		if valid:
-			game.log(self.playerrole.name+" treated: "+color)
+			game.emit(EventType.TREAT,self.playerrole,color)
 			game.cities = copy.copy(game.cities)
 			game.cities[self.position] = copy.copy(game.cities[self.position])
 			game.cities[self.position].disinfect(game,game.cities[self.position].disease_cubes[color] if (self.playerrole == PlayerRole.MEDIC or game.cures[color]) else 1 ,color)
@@ -231,12 +482,14 @@ class Player():
 		receiver_player = game.players[receiver  % len(game.players)]
 		valid = receiver_player!=self and self.position==receiver_player.position and target in self.cards and (self.position==target or self.playerrole==PlayerRole.RESEARCHER)
 		if valid:
-			game.log(self.playerrole.name+" gave "+target+" to: "+receiver_player.playerrole.name)
+			game.emit(EventType.GIVE,self.playerrole,target,receiver_player.playerrole)
 			receiver_player.cards = copy.copy(receiver_player.cards)
 			self.cards = copy.copy(self.cards)
 			receiver_player.cards.append(self.cards.pop(self.cards.index(target)))
+			game.hash_card(self.pid,target)
+			game.hash_card(receiver_player.pid,target)
 			if receiver_player.must_discard():
-				game.log(receiver_player.playerrole.name + " must discard")
+				game.emit(EventType.MUST_DISCARD,receiver_player.playerrole)
 				game.real_current_player = game.current_player
 				game.current_player = receiver
 				game.turn_phase = TurnPhase.DISCARD
@@ -248,12 +501,14 @@ class Player():
 		giver = game.players[giver % len(game.players)]
 		valid = giver!=self and self.position==giver.position and target in giver.cards and (self.position==target or giver.playerrole==PlayerRole.RESEARCHER)
 		if valid:
-			game.log(self.playerrole.name+" received "+target+" from: "+giver.playerrole.name)
+			game.emit(EventType.RECEIVE,self.playerrole,target,giver.playerrole)
 			giver.cards = copy.copy(giver.cards)
 			self.cards = copy.copy(self.cards)
 			self.cards.append(giver.cards.pop(giver.cards.index(target)))
+			game.hash_card(giver.pid,target)
+			game.hash_card(self.pid,target)
 			if self.must_discard():
-				game.log(self.playerrole.name + " must discard")
+				game.emit(EventType.MUST_DISCARD,self.playerrole)
 				game.real_current_player = game.current_player
 				game.turn_phase = TurnPhase.DISCARD
 		return valid
@@ -262,15 +517,19 @@ class Player():
 	def discover_cure(self,game,color,chosen_cards):
 		valid = game.cities[self.position].research_station and len(chosen_cards)==(4 if self.playerrole==PlayerRole.SCIENTIST else 5) and all([(card in self.cards and self.cards[self.cards.index(card)].cardtype==CardType.CITY and game.cities[card].color==color) for card in chosen_cards])
 		if valid:
-			game.log(self.playerrole.name+" found cure for: "+color)
+			game.emit(EventType.CURE,self.playerrole,color)
 			for card in chosen_cards:
 				self.discard(game,card)
+			if not game.cures[color]:
+				game.hash_cure(color)
 			game.cures = copy.copy(game.cures)
 			game.cures[color] = True
 			if game.remaining_disease_cubes[color]==game.commons['number_cubes']:
+				if not game.eradicated[color]:
+					game.hash_eradicated(color)
 				game.eradicated = copy.copy(game.eradicated)
 				game.eradicated[color] = True
-				game.log("Eradicated "+color+" disease")
+				game.emit(EventType.ERADICATED,color)
 			for player in game.players:
 				if player.playerrole == PlayerRole.MEDIC:
 					player.move_triggers(game)
@@ -283,7 +542,8 @@ class Player():
 		target_player = game.players[target_player % len(game.players)]
 		valid = self.playerrole==PlayerRole.DISPATCHER and player.position!=target_player.position
 		if valid:
-			game.log("DISPATCHER rallied "+player.playerrole.name+" to: "+target_player.playerrole.name)
+			game.emit(EventType.RALLY,player.playerrole,target_player.playerrole)
+			game.hash_position(player.pid,player.position,target_player.position)
 			player.position = target_player.position
 			player.move_triggers(game)
 		return valid
@@ -292,9 +552,10 @@ class Player():
 	def special_charter_flight(self,game,discard,target):
 		valid = self.playerrole==PlayerRole.OPERATIONS_EXPERT and self.special_move and game.cities[self.position].research_station and discard in self.cards and discard in game.cities.keys() and target!=self.position
 		if valid:
-			game.log(self.playerrole.name+" special charter flew to: "+target+" discarding: "+discard)
+			game.emit(EventType.SPECIAL_CHARTER_FLIGHT,self.playerrole,target,discard)
 			self.special_move = False
 			self.discard(game,discard)
+			game.hash_position(self.pid,self.position,target)
 			self.position = target
 		return valid
 	
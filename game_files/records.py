@@ -0,0 +1,265 @@
+import os
+import struct
+import sys
+from array import array
+
+from .cities import CITY_CARDS, MapTables
+from .game import Game, GameState
+from .players import Player, PlayerRole
+
+# Compact binary records of seeded games: the configuration, the seed and the integer action ids (see actions.py) of every
+# decision, enough to replay the game exactly since the seed fixes every card drawn. Layout of a record (little endian):
+#	header (HEADER): magic, version, flags, players, epidemic cards, starting city index, result (GameState), number of
+#	cubes, turns, seed, number of entries
+#	roles: one byte per player
+#	entries: uint16 action ids, a cure with other cards than the canonical ones of ActionSpace.cure_cards is escaped as
+#	CURE_CARDS, action id, number of cards, city indices
+# Records are appended one after another to a file, whose offset index (uint64 per record) is kept next to it in .idx
+MAGIC = b"PR"
+VERSION = 1
+HEADER = struct.Struct("<2sBBBBBBHHQI")
+SAMPLED_ROLES = 1
+CURE_CARDS = 0xFFFF
+# Seeds are stored as they are (the generators depend on every bit of them), so only the ones of the Q header field fit
+MAX_SEED = (1<<64)-1
+
+def check_seed(seed):
+	if not 0 <= seed <= MAX_SEED:
+		raise ValueError("Seed "+str(seed)+" does not fit in a record, only seeds in [0, 2**64) can be recorded")
+	return seed
+
+def to_little(values):
+	if sys.byteorder == "big":
+		values.byteswap()
+	return values
+
+class GameRecord():
+	def __repr__(self):
+		return "GameRecord: "+str(self.players)+" players, seed "+str(self.seed)+", "+str(len(self.steps()))+" steps, "+self.result.name
+
+	def __init__(self,players,epidemic_cards,starting_city,number_cubes,roles,seed,sampled_roles=False,result=GameState.PLAYING,turns=0,entries=None):
+		self.players = players
+		self.epidemic_cards = epidemic_cards
+		self.starting_city = starting_city
+		self.number_cubes = number_cubes
+		self.roles = list(roles)
+		self.seed = seed
+		self.sampled_roles = sampled_roles
+		self.result = result
+		self.turns = turns
+		self.entries = array('H') if entries is None else entries
+
+	def to_bytes(self):
+		check_seed(self.seed)
+		tables = MapTables.get(CITY_CARDS)
+		header = HEADER.pack(MAGIC,VERSION,SAMPLED_ROLES if self.sampled_roles else 0,self.players,self.epidemic_cards,tables.index[self.starting_city],self.result,self.number_cubes,self.turns,self.seed,len(self.entries))
+		return header+bytes(self.roles)+to_little(array('H',self.entries)).tobytes()
+
+	# Record starting at offset of buffer and its size in bytes
+	@classmethod
+	def from_bytes(cls,buffer,offset=0):
+		magic, version, flags, players, epidemic_cards, starting_city, result, number_cubes, turns, seed, length = HEADER.unpack_from(buffer,offset)
+		if magic != MAGIC or version != VERSION:
+			raise ValueError("Not a game record at offset "+str(offset))
+		start = offset+HEADER.size
+		roles = [PlayerRole(role) for role in bytes(buffer[start:start+players])]
+		start += players
+		entries = array('H')
+		entries.frombytes(bytes(buffer[start:start+2*length]))
+		if len(entries) != length:
+			raise ValueError("Truncated game record at offset "+str(offset))
+		record = cls(players,epidemic_cards,MapTables.get(CITY_CARDS).names[starting_city],number_cubes,roles,seed,bool(flags&SAMPLED_ROLES),GameState(result),turns,to_little(entries))
+		return record,start+2*length-offset
+
+	# Decisions as (action id, chosen cards of an escaped cure or None)
+	def steps(self):
+		entries = self.entries
+		names = MapTables.get(CITY_CARDS).names
+		steps = []
+		i = 0
+		while i < len(entries):
+			if entries[i] == CURE_CARDS:
+				needed = entries[i+2]
+				steps.append((entries[i+1],[names[card] for card in entries[i+3:i+3+needed]]))
+				i += 3+needed
+			else:
+				steps.append((entries[i],None))
+				i += 1
+		return steps
+
+	# Game right after setup, played by placeholder players
+	def new_game(self,log_game=False,external_log=None):
+		game = Game([Player() for p in range(self.players)],self.epidemic_cards,starting_city=self.starting_city,number_cubes=self.number_cubes,log_game=log_game,external_log=external_log)
+		game.setup(None if self.sampled_roles else self.roles,seed=self.seed)
+		if [player.playerrole for player in game.players] != self.roles:
+			raise ValueError("Record roles differ from the replayed setup")
+		return game
+
+# Applies one step of GameRecord.steps to a game waiting for a decision
+def apply_step(game,step):
+	action_index, cards = step
+	game.advance()
+	if cards is not None:
+		action, kwargs = game.action_space.decode(game,action_index)
+		kwargs['chosen_cards'] = cards
+		return game.do_action(action,kwargs)
+	return game.do_action_index(action_index)
+
+# Writes the decisions of a seeded game as they are taken (Game.do_action and Game.do_discard call it), finish returns the record
+# Attach it before the first decision
+class GameRecorder():
+	def __init__(self,game):
+		if game.seed is not None:
+			check_seed(int(game.seed))
+		self.game = game
+		self.entries = array('H')
+		game.recorder = self
+		game.recorded = 0
+
+	# Entries of an action, computed before it is performed since cures change the hand
+	def encode(self,game,action,kwargs):
+		action_index = game.action_space.encode(action,kwargs)
+		if action == Player.discover_cure.__name__:
+			canonical = game.action_space.cure_cards(game,game.players[game.current_player],kwargs['color'])
+			chosen = kwargs['chosen_cards']
+			if canonical is None or sorted(chosen) != sorted(canonical):
+				index = game.map_tables.index
+				return (CURE_CARDS,action_index,len(chosen))+tuple(index[card] for card in chosen)
+		return (action_index,)
+
+	# Entries past game.recorded were undone (see Game.undo)
+	def add(self,game,entries):
+		del self.entries[game.recorded:]
+		self.entries.extend(entries)
+		game.recorded = len(self.entries)
+
+	def finish(self):
+		game = self.game
+		if game.recorder is self:
+			game.recorder = None
+		del self.entries[game.recorded:]
+		if game.seed is None:
+			raise ValueError("Only seeded games can be replayed from a record")
+		return GameRecord(len(game.players),game.commons['epidemic_cards'],game.commons['starting_city'],game.commons['number_cubes'],[player.playerrole for player in game.players],check_seed(int(game.seed)),game.commons.get('sampled_roles',False),game.game_state,max(game.current_turn,0),self.entries)
+
+# Appends records to path and their offsets to path.idx, the file stays readable while it grows
+class RecordWriter():
+	def __init__(self,path):
+		self.path = path
+		self.file = open(path,"ab")
+		self.index = open(path+".idx","ab")
+		self.file.seek(0,os.SEEK_END)
+		self.written = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+	def write(self,record):
+		data = record if isinstance(record,bytes) else record.to_bytes()
+		offset = self.file.tell()
+		self.file.write(data)
+		self.index.write(struct.pack("<Q",offset))
+		self.written += 1
+
+	def flush(self):
+		self.file.flush()
+		self.index.flush()
+
+	def close(self):
+		self.file.close()
+		self.index.close()
+
+# Random access to the records of a file through its index, rebuilt by scanning the file if it is missing or behind
+class RecordFile():
+	def __init__(self,path):
+		self.path = path
+		self.file = open(path,"rb")
+		self.offsets = array('Q')
+		self.reindex()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*args):
+		self.close()
+
+	def __len__(self):
+		return len(self.offsets)
+
+	def __getitem__(self,i):
+		return self.read(self.offsets[i])[0]
+
+	def __iter__(self):
+		for offset in self.offsets:
+			yield self.read(offset)[0]
+
+	# Loads path.idx and scans what was appended after its last record
+	def reindex(self):
+		size = os.path.getsize(self.path)
+		self.offsets = array('Q')
+		if os.path.exists(self.path+".idx"):
+			with open(self.path+".idx","rb") as index:
+				data = index.read()
+			self.offsets.frombytes(data[:len(data)-len(data)%8])
+			to_little(self.offsets)
+			while self.offsets and self.offsets[-1] >= size:
+				self.offsets.pop()
+		offset = 0
+		if self.offsets:
+			offset = self.offsets.pop()
+		while offset+HEADER.size <= size:
+			try:
+				record, length = self.read(offset)
+			except ValueError:
+				break
+			self.offsets.append(offset)
+			offset += length
+
+	def read(self,offset):
+		self.file.seek(offset)
+		header = self.file.read(HEADER.size)
+		if len(header) < HEADER.size:
+			raise ValueError("Truncated game record at offset "+str(offset))
+		players, length = header[4], HEADER.unpack(header)[-1]
+		return GameRecord.from_bytes(header+self.file.read(players+2*length))
+
+	def close(self):
+		self.file.close()
+
+# Game of a record after any number of steps, replayed from the closest checkpoint (a clone kept every interval steps)
+class Replayer():
+	def __init__(self,record,interval=32,log_game=False):
+		self.record = record
+		self.steps = record.steps()
+		self.interval = interval
+		game = record.new_game(log_game)
+		game.advance()
+		self.checkpoints = {0: game}
+
+	def __len__(self):
+		return len(self.steps)
+
+	# Game after the first step decisions, advanced to the next decision (or the end)
+	def game_at(self,step):
+		if step < 0 or step > len(self.steps):
+			raise IndexError("Step "+str(step)+" out of 0.."+str(len(self.steps)))
+		start = max(s for s in self.checkpoints if s <= step)
+		game = self.checkpoints[start].clone()
+		for s in range(start,step):
+			apply_step(game,self.steps[s])
+			game.advance()
+			if (s+1)%self.interval == 0 and s+1 not in self.checkpoints:
+				self.checkpoints[s+1] = game.clone()
+		return game
+
+	# Every position in order from the setup to the end
+	def __iter__(self):
+		game = self.checkpoints[0].clone()
+		yield game.clone()
+		for step in self.steps:
+			apply_step(game,step)
+			game.advance()
+			yield game.clone()
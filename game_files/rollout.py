@@ -0,0 +1,344 @@
+import bisect
+
+from .decks import CardType
+from .game import GameState
+from .outbreaks import cascade, chain_size
+from .players import PlayerRole, TurnPhase
+
+# Per map and player count tables of RolloutGame, built once
+class RolloutTables():
+	_cache = {}
+
+	@classmethod
+	def get(cls,space):
+		tables = cls._cache.get(id(space))
+		if tables is None or tables.space is not space:
+			tables = cls(space)
+			cls._cache[id(space)] = tables
+		return tables
+
+	def __init__(self,space):
+		self.space = space
+		self.map_tables = space.tables
+		self.V = space.tables.n_cities
+		self.C = space.tables.n_colors
+		self.P = space.players
+		self.neighbors = space.tables.neighbors
+		self.city_color = space.tables.city_color.tolist()
+		self.offsets = [space.offsets[name] for name in space.names]
+		# Bitmask of every city and its neighbours, the cities a Quarantine Specialist protects
+		self.neighborhood = [1<<city | sum(1<<neighbor for neighbor in neighbors) for city,neighbors in enumerate(self.neighbors)]
+
+# Headless copy of a Game for rollouts: the state is held in plain lists owned by this object and mutated in place,
+# actions are indices of the integer action space (see actions.py) and are trusted to be legal, nothing is logged,
+# hashed or copied. Follows the rules of Game (as VectorGame does) and draws from the same generator in the same way,
+# so with the same generator state it plays exactly as the game it was built from. Illegal actions are not checked
+# unless step is called with check=True, which raises ValueError
+#	cubes[color][city], stations (set of city indices), hands[player] (list of city indices)
+#	player_deck and infection_deck are flat lists in reverse draw order (the top card last), epidemics are n_cities
+class RolloutGame():
+	def __repr__(self):
+		return "RolloutGame: turn "+str(self.current_turn)+", player "+str(self.current_player)+", "+self.turn_phase.name+", "+self.game_state.name+", outbreaks: "+str(self.outbreak_counter)+", cures: "+str(sum(self.cures))
+
+	def __init__(self,game,rng=None):
+		tables = RolloutTables.get(game.action_space)
+		index = tables.map_tables.index
+		colors = tables.map_tables.colors
+		self.tables = tables
+		self.rng = game.rng if rng is None else rng
+		self.number_cubes = game.commons['number_cubes']
+		cities = [game.cities[name] for name in tables.map_tables.names]
+		self.cubes = [[city.disease_cubes[color] for city in cities] for color in colors]
+		self.stations = {i for i,city in enumerate(cities) if city.research_station}
+		self.research_station_counter = game.research_station_counter
+		self.cures = [game.cures[color] for color in colors]
+		self.eradicated = [game.eradicated[color] for color in colors]
+		self.remaining_disease_cubes = [game.remaining_disease_cubes[color] for color in colors]
+		self.positions = [index[player.position] for player in game.players]
+		self.roles = [player.playerrole for player in game.players]
+		self.hands = [[index[card.name] for card in player.cards if card.cardtype==CardType.CITY] for player in game.players]
+		self.special_move = [getattr(player,'special_move',False) for player in game.players]
+		self.player_deck = [tables.V if card.cardtype==CardType.EPIDEMIC else index[card.name] for pile in game.player_deck.deck for card in pile]
+		self.player_remaining = game.player_deck.remaining
+		self.infection_deck = [index[card.name] for pile in game.infection_deck.deck for card in pile]
+		self.infection_discard = [index[card.name] for card in game.infection_deck.discard]
+		self.infection_counter = game.infection_counter
+		self.infection_rate = game.infection_rate
+		self.outbreak_counter = game.outbreak_counter
+		self.current_player = game.current_player
+		self.real_current_player = game.real_current_player
+		self.actions = game.actions
+		self.current_turn = game.current_turn
+		self.turn_phase = game.turn_phase
+		self.game_state = game.game_state
+		self.handlers = [self.drive_ferry,self.direct_flight,self.charter_flight,self.shuttle_flight,self.build_researchstation,self.treat_disease,self.give_knowledge,self.receive_knowledge,self.discover_cure,self.rally_flight,self.special_charter_flight,self.discard]
+
+	# Independent copy, to play several rollouts from the same state
+	def copy(self,rng=None):
+		other = object.__new__(RolloutGame)
+		other.__dict__.update(self.__dict__)
+		other.rng = self.rng if rng is None else rng
+		other.cubes = [list(cubes) for cubes in self.cubes]
+		other.stations = set(self.stations)
+		other.cures = list(self.cures)
+		other.eradicated = list(self.eradicated)
+		other.remaining_disease_cubes = list(self.remaining_disease_cubes)
+		other.positions = list(self.positions)
+		other.hands = [list(hand) for hand in self.hands]
+		other.special_move = list(self.special_move)
+		other.player_deck = list(self.player_deck)
+		other.infection_deck = list(self.infection_deck)
+		other.infection_discard = list(self.infection_discard)
+		other.handlers = [getattr(other,handler.__name__) for handler in self.handlers]
+		return other
+
+	# Legal action indices of the current decision, in increasing order (same as ActionSpace.legal_action_mask)
+	def legal_actions(self):
+		tables = self.tables
+		V, P = tables.V, tables.P
+		offsets = tables.offsets
+		cp = self.current_player
+		hand = self.hands[cp]
+		if self.turn_phase == TurnPhase.DISCARD:
+			return sorted(offsets[11]+card for card in hand)
+		if self.turn_phase != TurnPhase.ACTIONS:
+			return []
+		position = self.positions[cp]
+		role = self.roles[cp]
+		at_station = position in self.stations
+		position_card = position in hand
+		legal = sorted(offsets[0]+neighbor for neighbor in tables.neighbors[position])
+		legal.extend(sorted(offsets[1]+card for card in hand if card != position))
+		if position_card:
+			legal.extend(offsets[2]+city for city in range(V) if city != position)
+		if at_station and self.research_station_counter>1:
+			legal.extend(sorted(offsets[3]+station for station in self.stations if station != position))
+		if (position_card or role==PlayerRole.OPERATIONS_EXPERT) and not at_station:
+			if self.research_station_counter < 6:
+				legal.append(offsets[4])
+			else:
+				legal.extend(sorted(offsets[4]+1+station for station in self.stations))
+		legal.extend(offsets[5]+c for c in range(tables.C) if self.cubes[c][position]>0)
+		others = [p for p in range(P) if p != cp and self.positions[p]==position]
+		for p in others:
+			legal.extend(sorted(offsets[6]+p*V+card for card in hand if card==position or role==PlayerRole.RESEARCHER))
+		for p in others:
+			legal.extend(sorted(offsets[7]+p*V+card for card in self.hands[p] if card==position or self.roles[p]==PlayerRole.RESEARCHER))
+		if at_station:
+			needed = 4 if role==PlayerRole.SCIENTIST else 5
+			counts = [0]*tables.C
+			for card in hand:
+				counts[tables.city_color[card]] += 1
+			legal.extend(offsets[8]+c for c in range(tables.C) if counts[c]>=needed)
+		if role == PlayerRole.DISPATCHER:
+			legal.extend(offsets[9]+p*P+t for p in range(P) for t in range(P) if self.positions[p]!=self.positions[t])
+		if role==PlayerRole.OPERATIONS_EXPERT and self.special_move[cp] and at_station:
+			for card in sorted(hand):
+				legal.extend(offsets[10]+card*V+city for city in range(V) if city != position)
+		return legal
+
+	def random_action(self,rng=None):
+		return (self.rng if rng is None else rng).choice(self.legal_actions())
+
+	# Applies an action of the current player (or a discard) and resolves the game until the next decision
+	def step(self,action,check=False):
+		if check and action not in self.legal_actions():
+			raise ValueError("Illegal action "+str(action)+" in "+repr(self))
+		block = bisect.bisect_right(self.tables.offsets,action)-1
+		self.handlers[block](action-self.tables.offsets[block])
+		if block != 11:
+			self.actions -= 1
+			if self.actions == 0 and self.turn_phase == TurnPhase.ACTIONS:
+				self.turn_phase = TurnPhase.DRAW
+			if all(self.cures):
+				self.turn_phase = TurnPhase.INACTIVE
+				self.game_state = GameState.WON
+		return self.advance()
+
+	# Runs the steps without decisions (as Game.advance), True while the game waits for an action or a discard
+	def advance(self):
+		while self.game_state == GameState.PLAYING:
+			if self.turn_phase == TurnPhase.NEW:
+				self.actions = 4
+				self.turn_phase = TurnPhase.ACTIONS
+			elif self.turn_phase == TurnPhase.DRAW:
+				self.draw_phase()
+			elif self.turn_phase == TurnPhase.INFECT:
+				self.end_turn()
+			else:
+				return self.turn_phase == TurnPhase.ACTIONS or self.turn_phase == TurnPhase.DISCARD
+		return False
+
+	# Random legal actions until the game ends or turns more turns have started, returns the game state
+	def play(self,turns=None,rng=None):
+		rng = self.rng if rng is None else rng
+		last_turn = None if turns is None else self.current_turn+turns
+		while self.advance() and (last_turn is None or self.current_turn<last_turn):
+			self.step(rng.choice(self.legal_actions()))
+		return self.game_state
+
+	def move(self,p,target):
+		self.positions[p] = target
+		if self.roles[p] == PlayerRole.MEDIC:
+			for c in range(self.tables.C):
+				if self.cures[c] and self.cubes[c][target]>0:
+					self.disinfect(target,c,self.cubes[c][target])
+
+	def disinfect(self,city,c,cubes):
+		self.cubes[c][city] -= cubes
+		self.remaining_disease_cubes[c] += cubes
+		if self.cures[c] and self.remaining_disease_cubes[c]==self.number_cubes:
+			self.eradicated[c] = True
+
+	def drive_ferry(self,i):
+		self.move(self.current_player,i)
+
+	def direct_flight(self,i):
+		self.hands[self.current_player].remove(i)
+		self.move(self.current_player,i)
+
+	def charter_flight(self,i):
+		self.hands[self.current_player].remove(self.positions[self.current_player])
+		self.move(self.current_player,i)
+
+	def shuttle_flight(self,i):
+		self.move(self.current_player,i)
+
+	def build_researchstation(self,i):
+		cp = self.current_player
+		position = self.positions[cp]
+		if self.research_station_counter == 6:
+			self.stations.discard(i-1)
+		else:
+			self.research_station_counter += 1
+		if self.roles[cp] != PlayerRole.OPERATIONS_EXPERT:
+			self.hands[cp].remove(position)
+		self.stations.add(position)
+
+	def treat_disease(self,c):
+		cp = self.current_player
+		position = self.positions[cp]
+		self.disinfect(position,c,self.cubes[c][position] if (self.roles[cp]==PlayerRole.MEDIC or self.cures[c]) else 1)
+
+	def give_knowledge(self,i):
+		cp = self.current_player
+		receiver, card = divmod(i,self.tables.V)
+		self.hands[cp].remove(card)
+		self.hands[receiver].append(card)
+		if len(self.hands[receiver])>7:
+			self.real_current_player = cp
+			self.current_player = receiver
+			self.turn_phase = TurnPhase.DISCARD
+
+	def receive_knowledge(self,i):
+		cp = self.current_player
+		giver, card = divmod(i,self.tables.V)
+		self.hands[giver].remove(card)
+		self.hands[cp].append(card)
+		if len(self.hands[cp])>7:
+			self.real_current_player = cp
+			self.turn_phase = TurnPhase.DISCARD
+
+	# Uses the canonical cards: the ones of that color with the lowest index (see ActionSpace.cure_cards)
+	def discover_cure(self,c):
+		cp = self.current_player
+		needed = 4 if self.roles[cp]==PlayerRole.SCIENTIST else 5
+		city_color = self.tables.city_color
+		for card in sorted(card for card in self.hands[cp] if city_color[card]==c)[:needed]:
+			self.hands[cp].remove(card)
+		self.cures[c] = True
+		if self.remaining_disease_cubes[c]==self.number_cubes:
+			self.eradicated[c] = True
+		for p in range(self.tables.P):
+			if self.roles[p] == PlayerRole.MEDIC:
+				self.move(p,self.positions[p])
+
+	def rally_flight(self,i):
+		moved, target = divmod(i,self.tables.P)
+		self.move(moved,self.positions[target])
+
+	def special_charter_flight(self,i):
+		cp = self.current_player
+		card, target = divmod(i,self.tables.V)
+		self.hands[cp].remove(card)
+		self.special_move[cp] = False
+		self.positions[cp] = target
+
+	def discard(self,card):
+		cp = self.current_player
+		self.hands[cp].remove(card)
+		if len(self.hands[cp])<=7:
+			if self.real_current_player is None:
+				self.turn_phase = TurnPhase.INFECT
+			else:
+				self.current_player = self.real_current_player
+				self.real_current_player = None
+				self.turn_phase = TurnPhase.ACTIONS if self.actions > 0 else TurnPhase.DRAW
+
+	# Bitmask of the cities where infections of color c are prevented, -1 when it is eradicated (see outbreaks.py)
+	def blocked_cities(self,c):
+		if self.eradicated[c]:
+			return -1
+		blocked = 0
+		for p,role in enumerate(self.roles):
+			if role == PlayerRole.QUARANTINE_SPECIALIST:
+				blocked |= self.tables.neighborhood[self.positions[p]]
+			elif role == PlayerRole.MEDIC and self.cures[c]:
+				blocked |= 1<<self.positions[p]
+		return blocked
+
+	def infect(self,city,infection):
+		c = self.tables.city_color[city]
+		cubes = self.cubes[c]
+		steps, added, chain = cascade(cubes,city,infection,self.tables.neighbors,self.blocked_cities(c))
+		for infected,amount in added.items():
+			cubes[infected] += amount
+			self.remaining_disease_cubes[c] -= amount
+		if chain:
+			self.outbreak_counter += chain_size(chain)
+
+	def draw_phase(self):
+		cp = self.current_player
+		for c in range(2):
+			self.player_remaining -= 1
+			if not self.player_deck:
+				continue
+			card = self.player_deck.pop()
+			if card == self.tables.V:
+				self.infection_counter += 1
+				if self.infection_counter == 3 or self.infection_counter == 5:
+					self.infection_rate += 1
+				city = self.infection_deck.pop(0)
+				self.infection_discard.append(city)
+				self.infect(city,3)
+				# Discard pile shuffled on top of the deck
+				self.rng.shuffle(self.infection_discard)
+				self.infection_deck.extend(self.infection_discard)
+				self.infection_discard = []
+			else:
+				self.hands[cp].append(card)
+		if self.roles[cp] == PlayerRole.OPERATIONS_EXPERT:
+			self.special_move[cp] = True
+		if self.lost():
+			self.turn_phase = TurnPhase.INACTIVE
+			self.game_state = GameState.LOST
+		elif len(self.hands[cp])>7:
+			self.turn_phase = TurnPhase.DISCARD
+		else:
+			self.turn_phase = TurnPhase.INFECT
+
+	def end_turn(self):
+		for i in range(self.infection_rate):
+			city = self.infection_deck.pop()
+			self.infection_discard.append(city)
+			self.infect(city,1)
+		self.current_player = (self.current_player+1)%self.tables.P
+		if self.lost():
+			self.turn_phase = TurnPhase.INACTIVE
+			self.game_state = GameState.LOST
+		else:
+			self.current_turn += 1
+			self.turn_phase = TurnPhase.NEW
+
+	def lost(self):
+		return self.player_remaining<0 or min(self.remaining_disease_cubes)<0 or self.outbreak_counter>=8
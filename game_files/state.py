@@ -0,0 +1,324 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+from .cities import CITY_CARDS, City, MapTables
+from .events import EventType
+from .outbreaks import apply_cascade, cascade, chain_size
+from .game import Game
+
+class CompactState():
+	def __repr__(self):
+		return "Cubes: "+str(int(self.cubes.sum()))+", Stations: "+str(int(self.research_stations.sum()))+", Cures: "+bin(self.cures)+", Eradicated: "+bin(self.eradicated)
+
+	def __init__(self,tables,number_cubes):
+		self.tables = tables
+		self.number_cubes = number_cubes
+		# Disease cubes per city (rows) and color (columns)
+		self.cubes = np.zeros((tables.n_cities,tables.n_colors),dtype=np.int8)
+		self.research_stations = np.zeros(tables.n_cities,dtype=bool)
+		self.remaining = np.full(tables.n_colors,number_cubes,dtype=np.int16)
+		# Set while the arrays are shared with the state of a clone
+		self.shared = False
+		# Bitmasks, bit c set means color c is cured/eradicated
+		self.cures = 0
+		self.eradicated = 0
+
+	def copy(self):
+		other = CompactState.__new__(CompactState)
+		other.__dict__.update(self.__dict__)
+		other.shared = True
+		other.own()
+		return other
+
+	# New state of the same arrays, both copy them before their next write (own)
+	def share(self):
+		other = CompactState.__new__(CompactState)
+		other.__dict__.update(self.__dict__)
+		self.shared = other.shared = True
+		return other
+
+	def own(self):
+		if self.shared:
+			self.cubes = self.cubes.copy()
+			self.research_stations = self.research_stations.copy()
+			self.remaining = self.remaining.copy()
+			self.shared = False
+
+	# Overwrites this state with the values of other, keeps every view bound to it valid
+	def restore(self,other):
+		self.cubes = other.cubes.copy()
+		self.research_stations = other.research_stations.copy()
+		self.remaining = other.remaining.copy()
+		self.shared = False
+		self.cures = other.cures
+		self.eradicated = other.eradicated
+
+	def reset(self):
+		self.own()
+		self.cubes[:] = 0
+		self.research_stations[:] = False
+		self.remaining[:] = self.number_cubes
+		self.cures = 0
+		self.eradicated = 0
+
+# Views behave as the color keyed dictionaries used by City and Game but read and write the arrays
+class ColorView(MutableMapping):
+	def __repr__(self):
+		return str(dict(self))
+
+	def __init__(self,state):
+		self.state = state
+		self.colors = state.tables.colors
+		self.color_index = state.tables.color_index
+
+	# Copy-on-write callers copy before writing, the arrays are owned by the state so the view itself is shared
+	def __copy__(self):
+		return self
+
+	def __iter__(self):
+		return iter(self.colors)
+
+	def __len__(self):
+		return len(self.colors)
+
+	def __delitem__(self,color):
+		raise TypeError("Colors can not be removed from a compact state")
+
+	def bound_to(self,state):
+		return self.state is state
+
+	def rebind(self,state):
+		view = object.__new__(self.__class__)
+		view.__dict__.update(self.__dict__)
+		view.state = state
+		return view
+
+class CubesView(ColorView):
+	def __init__(self,state,index):
+		super().__init__(state)
+		self.index = index
+
+	def __getitem__(self,color):
+		return int(self.state.cubes[self.index,self.color_index[color]])
+
+	def __setitem__(self,color,value):
+		self.state.own()
+		self.state.cubes[self.index,self.color_index[color]] = value
+
+class RemainingView(ColorView):
+	def __getitem__(self,color):
+		return int(self.state.remaining[self.color_index[color]])
+
+	def __setitem__(self,color,value):
+		self.state.own()
+		self.state.remaining[self.color_index[color]] = value
+
+class FlagsView(ColorView):
+	def __init__(self,state,field):
+		super().__init__(state)
+		self.field = field
+
+	def __getitem__(self,color):
+		return bool(getattr(self.state,self.field)>>self.color_index[color] & 1)
+
+	def __setitem__(self,color,value):
+		bit = 1<<self.color_index[color]
+		mask = getattr(self.state,self.field)
+		setattr(self.state,self.field,(mask | bit) if value else (mask & ~bit))
+
+class CompactCity(City):
+	def __call__(self):
+		return {
+			'disease_cubes': dict(self.disease_cubes),
+			'research_station': self.research_station
+		}
+
+	def __init__(self,name,color,neighbors,state):
+		self.name = name
+		self.color = color
+		self.neighbors = neighbors
+		self.state = state
+		self.index = state.tables.index[name]
+		self.neighbor_indices = state.tables.neighbors[self.index]
+		self.cubes_view = CubesView(state,self.index)
+
+	# Everything the city holds is in the state of its game, copy-on-write callers get the same city back
+	def __copy__(self):
+		return self
+
+	@property
+	def disease_cubes(self):
+		return self.cubes_view
+
+	@disease_cubes.setter
+	def disease_cubes(self,cubes):
+		if isinstance(cubes,CubesView) and cubes.bound_to(self.state) and cubes.index==self.index:
+			return
+		self.state.own()
+		for color in cubes:
+			self.state.cubes[self.index,self.state.tables.color_index[color]] = cubes[color]
+
+	@property
+	def research_station(self):
+		return bool(self.state.research_stations[self.index])
+
+	@research_station.setter
+	def research_station(self,value):
+		self.state.own()
+		self.state.research_stations[self.index] = value
+
+	def get_id(self):
+		return (
+				tuple(self.state.cubes[self.index].tolist()),
+				self.research_station
+		)
+
+	# Same as City.infect, the cascade reads the cubes column of the color
+	def infect(self,game,infection,color):
+		state = self.state
+		c = state.tables.color_index[color]
+		steps, added, chain = cascade(state.cubes[:,c].tolist(),self.index,infection,state.tables.neighbors,game.blocked_cities(color))
+		state.own()
+		def add(city,name,net_infection):
+			current = int(state.cubes[city,c])
+			state.cubes[city,c] = current+net_infection
+			state.remaining[c] -= net_infection
+			return current
+		apply_cascade(game,color,steps,add)
+		if chain and game.instruments is not None:
+			game.instruments.outbreak(chain_size(chain))
+
+	def disinfect(self,game,disinfection,color):
+		state = self.state
+		state.own()
+		c = state.tables.color_index[color]
+		current = int(state.cubes[self.index,c])
+		game.hash_cubes(self.name,color,current,current-disinfection)
+		state.cubes[self.index,c] = current-disinfection
+		state.remaining[c] += disinfection
+		if state.cures>>c & 1 and state.remaining[c]==state.number_cubes:
+			if not state.eradicated>>c & 1:
+				game.hash_eradicated(color)
+			state.eradicated |= 1<<c
+			game.emit(EventType.ERADICATED,color)
+
+# Cities of one CompactGame by name, created on first access and bound to the state of that game alone
+# Like the views, copy-on-write callers get the same mapping back
+class CompactCities(MutableMapping):
+	def __repr__(self):
+		return "CompactCities: "+str(len(self.cities))+" of "+str(len(self.names))+" cities created"
+
+	def __init__(self,state,cities=CITY_CARDS):
+		self.state = state
+		self.map_cities = cities
+		self.names = state.tables.names
+		self.cities = {}
+
+	def __copy__(self):
+		return self
+
+	def __getitem__(self,name):
+		city = self.cities.get(name)
+		if city is None:
+			city = CompactCity(name=name,color=self.map_cities[name]['color'],neighbors=self.map_cities[name]['connects'],state=self.state)
+			self.cities[name] = city
+		return city
+
+	# Only its own cities can be put back (copy-on-write idiom)
+	def __setitem__(self,name,city):
+		if city is not self[name]:
+			raise TypeError("Cities of a compact game can not be replaced")
+
+	def __delitem__(self,name):
+		raise TypeError("Cities can not be removed from a compact game")
+
+	def __contains__(self,name):
+		return name in self.map_cities
+
+	def __iter__(self):
+		return iter(self.names)
+
+	def __len__(self):
+		return len(self.names)
+
+	# Same mapping over the state of a clone, its cities are created again when it reads them
+	def rebind(self,state):
+		return CompactCities(state,self.map_cities)
+
+# Game whose cubes, research stations, cures and eradications live in a CompactState
+# Cities and the color dictionaries of the game are thin views over it
+# Clones get a state of their own over the same arrays, which either game copies before writing to them (see
+# CompactState.own), so a clone costs a few microseconds more than Game.clone and its first write a copy of three small arrays
+class CompactGame(Game):
+	def __call__(self):
+		game = super().__call__()
+		game['cures'] = dict(self.cures)
+		game['eradicated'] = dict(self.eradicated)
+		game['disease_cubes'] = dict(self.remaining_disease_cubes)
+		return game
+
+	def __init__(self,players,epidemic_cards=4,cities=CITY_CARDS,starting_city="atlanta",number_cubes=24,log_game=True,external_log=None,verify_hash=False,seed=None):
+		super().__init__(players,epidemic_cards,cities,starting_city,number_cubes,log_game,external_log,verify_hash,seed)
+		self.state = CompactState(MapTables.get(CITY_CARDS),number_cubes)
+		self.cities = CompactCities(self.state)
+		self.views = {
+			'cures': FlagsView(self.state,'cures'),
+			'eradicated': FlagsView(self.state,'eradicated'),
+			'remaining_disease_cubes': RemainingView(self.state)
+		}
+
+	def clone(self):
+		other = super().clone()
+		other.state = self.state.share()
+		other.cities = self.cities.rebind(other.state)
+		other.views = {name: view.rebind(other.state) for name,view in self.views.items()}
+		return other
+
+	@property
+	def cures(self):
+		return self.views['cures']
+
+	@cures.setter
+	def cures(self,cures):
+		self.set_view(self.cures,cures)
+
+	@property
+	def eradicated(self):
+		return self.views['eradicated']
+
+	@eradicated.setter
+	def eradicated(self,eradicated):
+		self.set_view(self.eradicated,eradicated)
+
+	@property
+	def remaining_disease_cubes(self):
+		return self.views['remaining_disease_cubes']
+
+	@remaining_disease_cubes.setter
+	def remaining_disease_cubes(self,remaining):
+		self.set_view(self.remaining_disease_cubes,remaining)
+
+	# Assigning a view of this same state (copy-on-write idiom) is a no-op, dictionaries are written into the state
+	def set_view(self,view,values):
+		if isinstance(values,ColorView) and values.bound_to(self.state):
+			return
+		self.state.own()
+		for color in values:
+			view[color] = values[color]
+
+	def setup(self,players_roles=None,seed=None):
+		self.state.reset()
+		super().setup(players_roles,seed)
+
+	def journal_state(self):
+		return self.state.copy()
+
+	def restore_journal_state(self,saved_state):
+		self.state.restore(saved_state)
+
+	def lost(self):
+		return self.player_deck.remaining<0 or self.state.remaining.min()<0 or self.outbreak_counter>=8
+
+	def won(self):
+		return self.state.cures == (1<<self.state.tables.n_colors)-1
@@ -0,0 +1,195 @@
+import importlib
+import math
+import multiprocessing
+import random
+import time
+import traceback
+
+import numpy as np
+
+from . import agents
+from .game import Game, GameState
+from .records import GameRecorder
+
+# Game parameters of a configuration and their defaults, anything else in a configuration is ignored
+CONFIG_DEFAULTS = {
+	'players': 2,
+	'epidemic_cards': 4,
+	'starting_city': "atlanta",
+	'number_cubes': 24,
+	'roles': None
+}
+
+# Agents are given by class or by name: a class of game_files.agents or "module:Class"
+def resolve_agent(agent):
+	if not isinstance(agent,str):
+		return agent
+	if ":" in agent:
+		module, name = agent.split(":",1)
+		return getattr(importlib.import_module(module),name)
+	return getattr(agents,agent)
+
+def agent_name(agent):
+	return agent if isinstance(agent,str) else agent.__name__
+
+# Short description of a configuration, without commas so it fits in a CSV field
+def config_name(config):
+	value_name = lambda value: "/".join(getattr(item,'name',str(item)) for item in value) if isinstance(value,(list,tuple)) else str(value)
+	return " ".join(key+"="+value_name(value) for key,value in sorted(config.items()))
+
+# Seed of a game, independent of the worker that plays it so a tournament is reproducible with any number of workers
+def game_seed(seed,agent_index,config_index,game_index):
+	return int(np.random.SeedSequence([seed,agent_index,config_index,game_index]).generate_state(1)[0])
+
+# Plays one game in a worker, task is (agent, config, agent_index, config_index, game_index, seed, record)
+# Returns the same fields as the results line of Server.py plus the turn count and whether the game errored,
+# and the game record as bytes (see records.py) under 'record' when record is set
+def play_game(task):
+	agent, config, agent_index, config_index, game_index, seed, record = task
+	parameters = dict(CONFIG_DEFAULTS,**config)
+	start = time.perf_counter()
+	result = {
+		'agent': agent_name(agent),
+		'config': config_name(config),
+		'agent_index': agent_index,
+		'config_index': config_index,
+		'game': game_index,
+		'seed': seed
+	}
+	try:
+		# Agents drawing from the global generators (rather than game.agent_rng) are reproducible per game seed too
+		random.seed(seed)
+		np.random.seed(seed%(1<<32))
+		agent_class = resolve_agent(agent)
+		game = Game([agent_class() for p in range(parameters['players'])],parameters['epidemic_cards'],starting_city=parameters['starting_city'],number_cubes=parameters['number_cubes'],log_game=False)
+		game.setup(parameters['roles'],seed=seed)
+		recorder = GameRecorder(game) if record else None
+		game.game_loop()
+		if recorder is not None:
+			result['record'] = recorder.finish().to_bytes()
+		result.update({
+			'game_state': game.game_state.name,
+			'error': bool(game.commons.get('error_flag',False)),
+			'cures': sum(game.cures.values()),
+			'eradicated': sum(game.eradicated.values()),
+			'player_deck': len(game.player_deck.deck),
+			'outbreaks': game.outbreak_counter,
+			'turns': game.current_turn
+		})
+		for color,value in game.remaining_disease_cubes.items():
+			result['remaining_'+color] = value
+	except Exception:
+		result.update({'game_state': GameState.NOT_PLAYING.name, 'error': True, 'traceback': traceback.format_exc()})
+	result['time'] = time.perf_counter()-start
+	return result
+
+def tasks(agent_list,configs,games,seed,record=False):
+	for game_index in range(games):
+		for a,agent in enumerate(agent_list):
+			for c,config in enumerate(configs):
+				yield (agent,config,a,c,game_index,game_seed(seed,a,c,game_index),record)
+
+# Plays games games for every agent and configuration over a process pool, yielding results as they finish
+# workers=1 plays in this process, agents must be importable by name or picklable classes for more workers
+def iter_results(agent_list,configs=({},),games=1,workers=None,seed=0,chunksize=16,record=False):
+	agent_list, configs = list(agent_list), list(configs)
+	if workers == 1:
+		for task in tasks(agent_list,configs,games,seed,record):
+			yield play_game(task)
+		return
+	with multiprocessing.Pool(workers) as pool:
+		for result in pool.imap_unordered(play_game,tasks(agent_list,configs,games,seed,record),chunksize):
+			yield result
+
+# Wilson score interval of a proportion, z=1.96 for 95%
+def wilson_interval(successes,n,z=1.96):
+	if n == 0:
+		return (0.0,1.0)
+	p = successes/n
+	center = (p+z*z/(2*n))/(1+z*z/n)
+	margin = z*math.sqrt(p*(1-p)/n+z*z/(4*n*n))/(1+z*z/n)
+	return (max(0.0,center-margin),min(1.0,center+margin))
+
+# Running mean and variance (Welford)
+class RunningStat():
+	def __repr__(self):
+		low, high = self.interval()
+		return format(self.mean,".3f")+" ["+format(low,".3f")+", "+format(high,".3f")+"]"
+
+	def __init__(self):
+		self.n = 0
+		self.mean = 0.0
+		self.m2 = 0.0
+
+	def add(self,value):
+		self.n += 1
+		delta = value-self.mean
+		self.mean += delta/self.n
+		self.m2 += delta*(value-self.mean)
+
+	@property
+	def variance(self):
+		return self.m2/(self.n-1) if self.n > 1 else 0.0
+
+	# Normal approximation interval of the mean
+	def interval(self,z=1.96):
+		margin = z*math.sqrt(self.variance/self.n) if self.n > 0 else 0.0
+		return (self.mean-margin,self.mean+margin)
+
+# Aggregates the results of one agent and configuration
+class Summary():
+	STATS = ('cures','eradicated','outbreaks','turns','time')
+
+	def __repr__(self):
+		low, high = self.win_interval()
+		return self.agent+" | "+self.config+" | games: "+str(self.games)+", wins: "+str(self.wins)+" ("+format(self.win_rate,".3f")+" ["+format(low,".3f")+", "+format(high,".3f")+"]), errors: "+str(self.errors)+", "+", ".join(name+": "+str(self.stats[name]) for name in self.STATS)
+
+	def __init__(self,agent,config):
+		self.agent = agent
+		self.config = config
+		self.games = 0
+		self.wins = 0
+		self.errors = 0
+		self.stats = {name: RunningStat() for name in self.STATS}
+
+	def add(self,result):
+		self.games += 1
+		self.wins += result['game_state'] == GameState.WON.name
+		self.errors += result['error']
+		for name in self.STATS:
+			if name in result:
+				self.stats[name].add(result[name])
+
+	@property
+	def win_rate(self):
+		return self.wins/self.games if self.games else 0.0
+
+	def win_interval(self,z=1.96):
+		return wilson_interval(self.wins,self.games,z)
+
+# Summaries of an agent x configuration matrix, keyed by (agent_index, config_index)
+class Tournament():
+	def __repr__(self):
+		return "\n".join(str(summary) for key,summary in sorted(self.summaries.items()))
+
+	def __init__(self,agent_list,configs=({},),games=1,workers=None,seed=0,record=False):
+		self.agent_list = list(agent_list)
+		self.configs = list(configs)
+		self.games = games
+		self.workers = workers
+		self.seed = seed
+		self.record = record
+		self.summaries = {(a,c): Summary(agent_name(agent),config_name(config)) for a,agent in enumerate(self.agent_list) for c,config in enumerate(self.configs)}
+
+	# Yields every result as it arrives after adding it to its summary
+	def run(self,chunksize=16):
+		for result in iter_results(self.agent_list,self.configs,self.games,self.workers,self.seed,chunksize,self.record):
+			self.summaries[(result['agent_index'],result['config_index'])].add(result)
+			yield result
+
+def run_tournament(agent_list,configs=({},),games=1,workers=None,seed=0,callback=None):
+	tournament = Tournament(agent_list,configs,games,workers,seed)
+	for result in tournament.run():
+		if callback is not None:
+			callback(result)
+	return tournament
@@ -0,0 +1,444 @@
+import numpy as np
+
+from .actions import ActionSpace
+from .cities import CITY_CARDS, MapTables
+from .decks import CardType
+from .game import GameState
+from .outbreaks import cascade_batch
+from .players import PlayerRole, TurnPhase
+
+# Roles dealt by Game.setup when none are given
+SETUP_ROLES = [PlayerRole.MEDIC,PlayerRole.QUARANTINE_SPECIALIST,PlayerRole.RESEARCHER,PlayerRole.SCIENTIST]
+
+# N games of the same configuration held as stacked arrays and stepped in lockstep with one integer action per game
+# (see actions.py), following the rules of game_files.Game. Every game rests at a decision point (ACTIONS or DISCARD):
+# drawing, infecting and starting the next turn are resolved inside step. Arrays:
+#	cubes (N,V,C), research_stations (N,V), cures/eradicated (N,C), remaining_disease_cubes (N,C)
+#	positions (N,P), hands (N,P,V) card counts, roles (N,P), special_move (N,P)
+#	player_deck (N,L) draw order with player_top, infection_deck (N,V) where the first infection_drawn cards are the
+#	discard pile (in discard order) and the rest the deck in draw order, so an epidemic shuffles a prefix
+class VectorGame():
+	def __repr__(self):
+		return "VectorGame: "+str(self.n_games)+" games, playing: "+str(int((self.game_state==GameState.PLAYING).sum()))+", won: "+str(int((self.game_state==GameState.WON).sum()))+", lost: "+str(int((self.game_state==GameState.LOST).sum()))
+
+	def __init__(self,n_games,players=2,epidemic_cards=4,starting_city="atlanta",number_cubes=24,players_roles=None,seed=None,reset=True):
+		self.tables = MapTables.get(CITY_CARDS)
+		self.action_space = ActionSpace.get(self.tables,players)
+		self.n_games = n_games
+		self.n_players = players
+		self.epidemic_cards = epidemic_cards
+		self.starting_city = self.tables.index[starting_city]
+		self.number_cubes = number_cubes
+		self.players_roles = players_roles
+		self.rng = np.random.default_rng(seed)
+		N, P, V, C = n_games, players, self.tables.n_cities, self.tables.n_colors
+		# Static tables
+		self.adjacency = self.tables.adjacency.astype(np.float32)
+		self.neighborhood = self.tables.adjacency | np.eye(V,dtype=bool)
+		self.city_color = self.tables.city_color.astype(np.intp)
+		self.color_cards = np.eye(C,dtype=np.int16)[self.city_color]
+		self.epidemic = V
+		self.deck_size = V-P*(6-P)+epidemic_cards
+		self.block_offsets = np.array([self.action_space.offsets[name] for name in self.action_space.names])
+		# Game state
+		self.cubes = np.zeros((N,V,C),dtype=np.int8)
+		self.research_stations = np.zeros((N,V),dtype=bool)
+		self.research_station_counter = np.zeros(N,dtype=np.int8)
+		self.cures = np.zeros((N,C),dtype=bool)
+		self.eradicated = np.zeros((N,C),dtype=bool)
+		self.remaining_disease_cubes = np.zeros((N,C),dtype=np.int16)
+		self.positions = np.zeros((N,P),dtype=np.intp)
+		self.hands = np.zeros((N,P,V),dtype=np.int8)
+		self.roles = np.zeros((N,P),dtype=np.int8)
+		self.special_move = np.zeros((N,P),dtype=bool)
+		self.player_deck = np.zeros((N,self.deck_size),dtype=np.intp)
+		self.player_top = np.zeros(N,dtype=np.intp)
+		self.player_remaining = np.zeros(N,dtype=np.int16)
+		self.infection_deck = np.zeros((N,V),dtype=np.intp)
+		self.infection_drawn = np.zeros(N,dtype=np.intp)
+		self.infection_counter = np.zeros(N,dtype=np.int8)
+		self.infection_rate = np.zeros(N,dtype=np.int8)
+		self.outbreak_counter = np.zeros(N,dtype=np.int16)
+		self.current_player = np.zeros(N,dtype=np.intp)
+		self.real_current_player = np.full(N,-1,dtype=np.intp)
+		self.actions = np.zeros(N,dtype=np.int8)
+		self.current_turn = np.zeros(N,dtype=np.int32)
+		self.turn_phase = np.full(N,TurnPhase.INACTIVE,dtype=np.int8)
+		self.game_state = np.full(N,GameState.NOT_PLAYING,dtype=np.int8)
+		if reset:
+			self.reset()
+
+	@property
+	def done(self):
+		return self.game_state!=GameState.PLAYING
+
+	# Keys in [0,1) used to shuffle, one per card
+	def random_keys(self,shape):
+		return self.rng.random(shape)
+
+	def hand_size(self,g,p):
+		return self.hands[g,p].sum(axis=1,dtype=np.int16)
+
+	# Sets up the given games (all by default) as Game.setup does
+	def reset(self,games=None):
+		g = np.arange(self.n_games) if games is None else np.flatnonzero(games) if np.asarray(games).dtype==bool else np.asarray(games)
+		n, P, V = len(g), self.n_players, self.tables.n_cities
+		if self.players_roles is None:
+			pool = np.array(SETUP_ROLES,dtype=np.int8)
+			self.roles[g] = pool[np.argsort(self.random_keys((n,len(pool))),axis=1)[:,:P]]
+		else:
+			self.roles[g] = np.array(self.players_roles,dtype=np.int8)
+		self.positions[g] = self.starting_city
+		self.special_move[g] = False
+		self.cubes[g] = 0
+		self.research_stations[g] = False
+		self.research_stations[g,self.starting_city] = True
+		self.research_station_counter[g] = 1
+		self.remaining_disease_cubes[g] = self.number_cubes
+		self.cures[g] = False
+		self.eradicated[g] = False
+		self.outbreak_counter[g] = 0
+		self.infection_counter[g] = 0
+		self.infection_rate[g] = 2
+		# Deal hands from a shuffled deck of city cards
+		cards = np.argsort(self.random_keys((n,V)),axis=1)
+		dealt = 6-P
+		self.hands[g] = 0
+		for p in range(P):
+			self.hands[g[:,None],p,cards[:,p*dealt:(p+1)*dealt]] = 1
+		# Starting player holds the most populated city, later players win ties
+		population = np.where(self.hands[g]>0,self.tables.population[None,None,:],0).max(axis=2)
+		starting_player = P-1-np.argmax(population[:,::-1],axis=1)
+		# Remaining cards are dealt round robin into piles with one epidemic each, piles are shuffled and the last one is drawn first
+		rest = cards[:,P*dealt:]
+		piles = np.concatenate([np.arange(rest.shape[1])%self.epidemic_cards,np.arange(self.epidemic_cards)])
+		cards = np.concatenate([rest,np.full((n,self.epidemic_cards),self.epidemic)],axis=1)
+		keys = (self.epidemic_cards-1-piles)[None,:]+self.random_keys(cards.shape)
+		self.player_deck[g] = np.take_along_axis(cards,np.argsort(keys,axis=1),axis=1)
+		self.player_top[g] = 0
+		self.player_remaining[g] = self.deck_size
+		# Initial infections, 1, 2 and 3 cubes on three cities each
+		self.infection_deck[g] = np.argsort(self.random_keys((n,V)),axis=1)
+		for i in range(9):
+			city = self.infection_deck[g,i]
+			self.cubes[g,city,self.city_color[city]] = i//3+1
+			self.remaining_disease_cubes[g,self.city_color[city]] -= i//3+1
+		self.infection_drawn[g] = 9
+		# First turn
+		self.current_player[g] = starting_player
+		self.real_current_player[g] = -1
+		self.current_turn[g] = 1
+		self.actions[g] = 4
+		self.turn_phase[g] = TurnPhase.ACTIONS
+		self.game_state[g] = GameState.PLAYING
+
+	# Legal actions of every game (N, actions), same as legal_action_mask on the equivalent Game, none for finished games
+	def legal_action_mask(self,out=None):
+		space = self.action_space
+		N, P, V, C = self.n_games, self.n_players, self.tables.n_cities, self.tables.n_colors
+		mask = np.zeros((N,space.size),dtype=bool) if out is None else out
+		mask[:] = False
+		rows = np.arange(N)
+		cp = self.current_player
+		position = self.positions[rows,cp]
+		here = np.zeros((N,V),dtype=bool)
+		here[rows,position] = True
+		hand = self.hands[rows,cp]>0
+		role = self.roles[rows,cp]
+		playing = self.game_state==GameState.PLAYING
+		acting = playing & (self.turn_phase==TurnPhase.ACTIONS)
+		discarding = playing & (self.turn_phase==TurnPhase.DISCARD)
+		at_station = self.research_stations[rows,position]
+		position_card = hand[rows,position]
+		block = lambda name: mask[:,space.offsets[name]:space.offsets[name]+space.sizes[name]]
+		block('drive_ferry')[:] = self.tables.adjacency[position] & acting[:,None]
+		block('direct_flight')[:] = hand & ~here & acting[:,None]
+		block('charter_flight')[:] = ~here & (acting & position_card)[:,None]
+		block('shuttle_flight')[:] = self.research_stations & ~here & (acting & at_station & (self.research_station_counter>1))[:,None]
+		build = acting & (position_card | (role==PlayerRole.OPERATIONS_EXPERT)) & ~at_station
+		block('build_researchstation')[:,0] = build & (self.research_station_counter<6)
+		block('build_researchstation')[:,1:] = self.research_stations & (build & (self.research_station_counter>=6))[:,None]
+		block('treat_disease')[:] = (self.cubes[rows,position]>0) & acting[:,None]
+		others = (self.positions==position[:,None]) & (np.arange(P)[None,:]!=cp[:,None]) & acting[:,None]
+		shareable = hand & (here | (role==PlayerRole.RESEARCHER)[:,None])
+		block('give_knowledge').reshape(N,P,V)[:] = others[:,:,None] & shareable[:,None,:]
+		giving = (self.hands>0) & (here[:,None,:] | (self.roles==PlayerRole.RESEARCHER)[:,:,None])
+		block('receive_knowledge').reshape(N,P,V)[:] = others[:,:,None] & giving
+		needed = np.where(role==PlayerRole.SCIENTIST,4,5)
+		block('discover_cure')[:] = ((hand.astype(np.int16) @ self.color_cards)>=needed[:,None]) & (acting & at_station)[:,None]
+		block('rally_flight').reshape(N,P,P)[:] = (self.positions[:,:,None]!=self.positions[:,None,:]) & (acting & (role==PlayerRole.DISPATCHER))[:,None,None]
+		# Largest block, only written for the games that can use it
+		special = np.flatnonzero(acting & (role==PlayerRole.OPERATIONS_EXPERT) & self.special_move[rows,cp] & at_station)
+		block('special_charter_flight').reshape(N,V,V)[special] = hand[special,:,None] & ~here[special,None,:]
+		block('discard')[:] = hand & discarding[:,None]
+		return mask
+
+	# Uniformly random legal action per game (0 for finished games), picks a chunk of 64 actions and then an action inside it
+	def random_actions(self,mask=None):
+		mask = self.legal_action_mask() if mask is None else mask
+		N, A, width = mask.shape[0], mask.shape[1], 64
+		padded = np.zeros((N,-(-A//width)*width),dtype=np.uint8)
+		padded[:,:A] = mask
+		chunks = padded.reshape(N,-1,width)
+		counts = chunks.sum(axis=2,dtype=np.int32)
+		cumulative = np.cumsum(counts,axis=1)
+		choice = (self.rng.random(N)*cumulative[:,-1]).astype(np.int32)
+		chunk = (cumulative>choice[:,None]).argmax(axis=1)
+		rows = np.arange(N)
+		choice -= cumulative[rows,chunk]-counts[rows,chunk]
+		inside = (np.cumsum(chunks[rows,chunk],axis=1)>choice[:,None]).argmax(axis=1)
+		return np.where(cumulative[:,-1]>0,chunk*width+inside,0)
+
+	# Applies one action per game (ignored for finished games) and resolves the game until the next decision
+	# Returns the reward (1 won, -1 lost, 0 otherwise) and whether each game finished during this step
+	def step(self,actions,check=False):
+		actions = np.asarray(actions)
+		before = self.game_state.copy()
+		g_all = np.flatnonzero(self.game_state==GameState.PLAYING)
+		if check and len(g_all) and not self.legal_action_mask()[g_all,actions[g_all]].all():
+			raise ValueError("Illegal action in games: "+str(g_all[~self.legal_action_mask()[g_all,actions[g_all]]]))
+		blocks = self.action_space.block_of[actions[g_all]]
+		local = actions[g_all]-self.block_offsets[blocks]
+		for b,name in enumerate(self.action_space.names):
+			selected = blocks==b
+			if selected.any():
+				getattr(self,'apply_'+name)(g_all[selected],local[selected])
+		acted = g_all[blocks!=self.action_space.names.index('discard')]
+		self.medic_triggers(g_all)
+		self.actions[acted] -= 1
+		ended = acted[(self.actions[acted]==0) & (self.turn_phase[acted]==TurnPhase.ACTIONS)]
+		self.turn_phase[ended] = TurnPhase.DRAW
+		won = acted[self.cures[acted].all(axis=1)]
+		self.turn_phase[won] = TurnPhase.INACTIVE
+		self.game_state[won] = GameState.WON
+		self.advance()
+		finished = (before==GameState.PLAYING) & (self.game_state!=GameState.PLAYING)
+		reward = np.where(finished,np.where(self.game_state==GameState.WON,1.0,-1.0),0.0).astype(np.float32)
+		return reward,finished
+
+	def advance(self):
+		drawing = np.flatnonzero((self.game_state==GameState.PLAYING) & (self.turn_phase==TurnPhase.DRAW))
+		if len(drawing):
+			self.draw_phase(drawing)
+		infecting = np.flatnonzero((self.game_state==GameState.PLAYING) & (self.turn_phase==TurnPhase.INFECT))
+		if len(infecting):
+			self.end_turn(infecting)
+
+	def move(self,g,p,target):
+		self.positions[g,p] = target
+
+	# Medic removes cured cubes where it stands (move triggers and cures), diseases without cubes become eradicated
+	def medic_triggers(self,g):
+		for p in range(self.n_players):
+			medic = g[self.roles[g,p]==PlayerRole.MEDIC]
+			if len(medic):
+				position = self.positions[medic,p]
+				healed = self.cubes[medic,position]*self.cures[medic]
+				self.cubes[medic,position] -= healed
+				self.remaining_disease_cubes[medic] += healed
+		self.eradicated[g] |= self.cures[g] & (self.remaining_disease_cubes[g]==self.number_cubes)
+
+	def apply_drive_ferry(self,g,i):
+		self.move(g,self.current_player[g],i)
+
+	def apply_direct_flight(self,g,i):
+		self.hands[g,self.current_player[g],i] = 0
+		self.move(g,self.current_player[g],i)
+
+	def apply_charter_flight(self,g,i):
+		cp = self.current_player[g]
+		self.hands[g,cp,self.positions[g,cp]] = 0
+		self.move(g,cp,i)
+
+	def apply_shuttle_flight(self,g,i):
+		self.move(g,self.current_player[g],i)
+
+	def apply_build_researchstation(self,g,i):
+		cp = self.current_player[g]
+		position = self.positions[g,cp]
+		replacing = self.research_station_counter[g]==6
+		self.research_stations[g[replacing],i[replacing]-1] = False
+		self.research_station_counter[g[~replacing]] += 1
+		discarding = self.roles[g,cp]!=PlayerRole.OPERATIONS_EXPERT
+		self.hands[g[discarding],cp[discarding],position[discarding]] = 0
+		self.research_stations[g,position] = True
+
+	def apply_treat_disease(self,g,i):
+		cp = self.current_player[g]
+		position = self.positions[g,cp]
+		cubes = self.cubes[g,position,i]
+		treated = np.where((self.roles[g,cp]==PlayerRole.MEDIC) | self.cures[g,i],cubes,1)
+		self.cubes[g,position,i] = cubes-treated
+		self.remaining_disease_cubes[g,i] += treated
+
+	def apply_give_knowledge(self,g,i):
+		V = self.tables.n_cities
+		cp = self.current_player[g]
+		receiver, card = i//V, i%V
+		self.hands[g,cp,card] = 0
+		self.hands[g,receiver,card] = 1
+		# Receiver over the hand limit discards before the turn continues
+		over = self.hand_size(g,receiver)>7
+		self.real_current_player[g[over]] = cp[over]
+		self.current_player[g[over]] = receiver[over]
+		self.turn_phase[g[over]] = TurnPhase.DISCARD
+
+	def apply_receive_knowledge(self,g,i):
+		V = self.tables.n_cities
+		cp = self.current_player[g]
+		giver, card = i//V, i%V
+		self.hands[g,giver,card] = 0
+		self.hands[g,cp,card] = 1
+		over = self.hand_size(g,cp)>7
+		self.real_current_player[g[over]] = cp[over]
+		self.turn_phase[g[over]] = TurnPhase.DISCARD
+
+	# Uses the canonical cards: the ones of that color with the lowest index
+	def apply_discover_cure(self,g,i):
+		cp = self.current_player[g]
+		needed = np.where(self.roles[g,cp]==PlayerRole.SCIENTIST,4,5)
+		colored = (self.hands[g,cp]>0) & (self.city_color[None,:]==i[:,None])
+		used = colored & (np.cumsum(colored,axis=1)<=needed[:,None])
+		self.hands[g,cp] = np.where(used,0,self.hands[g,cp])
+		self.cures[g,i] = True
+
+	def apply_rally_flight(self,g,i):
+		P = self.n_players
+		self.move(g,i//P,self.positions[g,i%P])
+
+	def apply_special_charter_flight(self,g,i):
+		V = self.tables.n_cities
+		cp = self.current_player[g]
+		self.hands[g,cp,i//V] = 0
+		self.special_move[g,cp] = False
+		self.move(g,cp,i%V)
+
+	def apply_discard(self,g,i):
+		cp = self.current_player[g]
+		self.hands[g,cp,i] = 0
+		done = g[self.hand_size(g,cp)<=7]
+		interrupted = done[self.real_current_player[done]>=0]
+		self.turn_phase[done[self.real_current_player[done]<0]] = TurnPhase.INFECT
+		self.current_player[interrupted] = self.real_current_player[interrupted]
+		self.real_current_player[interrupted] = -1
+		self.turn_phase[interrupted] = np.where(self.actions[interrupted]>0,TurnPhase.ACTIONS,TurnPhase.DRAW)
+
+	# Cities where an infection of the given color (one per game) is prevented
+	def protected(self,g,color):
+		protected = np.zeros((len(g),self.tables.n_cities),dtype=bool)
+		protected |= self.eradicated[g,color][:,None]
+		for p in range(self.n_players):
+			quarantine = np.flatnonzero(self.roles[g,p]==PlayerRole.QUARANTINE_SPECIALIST)
+			protected[quarantine] |= self.neighborhood[self.positions[g[quarantine],p]]
+			medic = np.flatnonzero((self.roles[g,p]==PlayerRole.MEDIC) & self.cures[g,color])
+			protected[medic,self.positions[g[medic],p]] = True
+		return protected
+
+	# Infects one city per game with its own color, outbreak chains are resolved for all the games at once (see outbreaks.py)
+	def infect(self,g,city,amount):
+		color = self.city_color[city]
+		cubes = self.cubes[g,:,color].astype(np.int16)
+		infected, outbroken = cascade_batch(cubes,city,amount,self.adjacency,self.protected(g,color))
+		self.cubes[g,:,color] = infected
+		self.remaining_disease_cubes[g,color] -= (infected-cubes).sum(axis=1,dtype=np.int16)
+		self.outbreak_counter[g] += outbroken.sum(axis=1,dtype=np.int16)
+
+	# Shuffles the infection discard pile (the first infection_drawn cards) back on top of the deck
+	def intensify(self,g):
+		V = self.tables.n_cities
+		columns = np.arange(V)[None,:]
+		keys = np.where(columns<self.infection_drawn[g][:,None],self.random_keys((len(g),V)),columns+1)
+		self.infection_deck[g] = np.take_along_axis(self.infection_deck[g],np.argsort(keys,axis=1),axis=1)
+		self.infection_drawn[g] = 0
+
+	def draw_phase(self,g):
+		V = self.tables.n_cities
+		cp = self.current_player[g]
+		for c in range(2):
+			top = self.player_top[g]
+			available = top<self.deck_size
+			card = np.where(available,self.player_deck[g,np.minimum(top,self.deck_size-1)],-1)
+			self.player_top[g] += available
+			self.player_remaining[g] -= 1
+			epidemic = card==self.epidemic
+			if epidemic.any():
+				e = g[epidemic]
+				self.infection_counter[e] += 1
+				self.infection_rate[e] += (self.infection_counter[e]==3) | (self.infection_counter[e]==5)
+				# Bottom card moves to the discard pile and gets 3 cubes
+				drawn = self.infection_drawn[e][:,None]
+				columns = np.arange(V)[None,:]
+				source = np.where(columns>drawn,columns-1,columns)
+				source = np.where(columns==drawn,V-1,source)
+				self.infection_deck[e] = np.take_along_axis(self.infection_deck[e],source,axis=1)
+				city = self.infection_deck[e,self.infection_drawn[e]]
+				self.infection_drawn[e] += 1
+				self.infect(e,city,3)
+				self.intensify(e)
+			normal = (card>=0) & ~epidemic
+			self.hands[g[normal],cp[normal],card[normal]] = 1
+		# Drawing ends the turn, Operations Expert may use its special move again
+		self.special_move[g,cp] |= self.roles[g,cp]==PlayerRole.OPERATIONS_EXPERT
+		lost = self.lost(g)
+		self.turn_phase[g] = np.where(lost,TurnPhase.INACTIVE,np.where(self.hand_size(g,cp)>7,TurnPhase.DISCARD,TurnPhase.INFECT))
+		self.game_state[g[lost]] = GameState.LOST
+
+	def end_turn(self,g):
+		for r in range(int(self.infection_rate[g].max())):
+			active = g[self.infection_rate[g]>r]
+			city = self.infection_deck[active,self.infection_drawn[active]]
+			self.infection_drawn[active] += 1
+			self.infect(active,city,1)
+		self.current_player[g] = (self.current_player[g]+1)%self.n_players
+		lost = self.lost(g)
+		self.turn_phase[g[lost]] = TurnPhase.INACTIVE
+		self.game_state[g[lost]] = GameState.LOST
+		# Next turn starts right away
+		next_turn = g[~lost]
+		self.current_turn[next_turn] += 1
+		self.actions[next_turn] = 4
+		self.turn_phase[next_turn] = TurnPhase.ACTIONS
+
+	def lost(self,g):
+		return (self.player_remaining[g]<0) | (self.remaining_disease_cubes[g]<0).any(axis=1) | (self.outbreak_counter[g]>=8)
+
+	# VectorGame holding the current state of the given games (set up and at a decision point), decks included
+	@classmethod
+	def from_games(cls,games,seed=None):
+		first = games[0]
+		vector = cls(len(games),len(first.players),first.commons['epidemic_cards'],first.commons['starting_city'],first.commons['number_cubes'],seed=seed,reset=False)
+		tables = vector.tables
+		index = tables.index
+		for n,game in enumerate(games):
+			for name,city in game.cities.items():
+				i = index[name]
+				vector.cubes[n,i] = [city.disease_cubes[color] for color in tables.colors]
+				vector.research_stations[n,i] = city.research_station
+			vector.research_station_counter[n] = game.research_station_counter
+			vector.cures[n] = [game.cures[color] for color in tables.colors]
+			vector.eradicated[n] = [game.eradicated[color] for color in tables.colors]
+			vector.remaining_disease_cubes[n] = [game.remaining_disease_cubes[color] for color in tables.colors]
+			for p,player in enumerate(game.players):
+				vector.positions[n,p] = index[player.position]
+				vector.roles[n,p] = player.playerrole
+				vector.special_move[n,p] = getattr(player,'special_move',False)
+				for card in player.cards:
+					if card.cardtype==CardType.CITY:
+						vector.hands[n,p,index[card.name]] = 1
+			deck = [vector.epidemic if card.cardtype==CardType.EPIDEMIC else index[card.name] for pile in reversed(game.player_deck.deck) for card in reversed(pile)]
+			vector.player_top[n] = vector.deck_size-len(deck)
+			vector.player_deck[n,vector.player_top[n]:] = deck
+			vector.player_remaining[n] = game.player_deck.remaining
+			discard = [index[card.name] for card in game.infection_deck.discard]
+			vector.infection_deck[n] = discard+[index[card.name] for pile in reversed(game.infection_deck.deck) for card in reversed(pile)]
+			vector.infection_drawn[n] = len(discard)
+			vector.infection_counter[n] = game.infection_counter
+			vector.infection_rate[n] = game.infection_rate
+			vector.outbreak_counter[n] = game.outbreak_counter
+			vector.current_player[n] = game.current_player
+			vector.real_current_player[n] = -1 if game.real_current_player is None else game.real_current_player
+			vector.actions[n] = game.actions
+			vector.current_turn[n] = game.current_turn
+			vector.turn_phase[n] = game.turn_phase
+			vector.game_state[n] = game.game_state
+		return vector
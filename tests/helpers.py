@@ -0,0 +1,41 @@
+from game_files.game import Game, GameState
+from game_files.players import Player
+
+# Seeded game of placeholder players waiting for its first decision
+def new_game(seed,players=2,game_class=Game,**kwargs):
+	game = game_class([Player() for p in range(players)],log_game=False,**kwargs)
+	game.setup(seed=seed)
+	game.advance()
+	return game
+
+# Random legal action index of the decision the game waits for
+def random_action(game,rng):
+	return rng.choice(game.action_space.legal_action_mask(game).nonzero()[0].tolist())
+
+# Plays random legal decisions until the game ends or after steps decisions, check is called after each one
+def play(game,rng,steps=None,check=None):
+	played = 0
+	while game.game_state==GameState.PLAYING and (steps is None or played<steps):
+		game.do_action_index(random_action(game,rng))
+		game.advance()
+		played += 1
+		if check is not None:
+			check(game)
+	return played
+
+# Everything a step can change: state, hash, deck orders and generator position
+def snapshot(game):
+	return (
+		game.get_id(),
+		game.zobrist,
+		game.current_player,
+		game.infection_rate,
+		game.research_station_counter,
+		tuple(game.protected_cities),
+		game.medic_position,
+		tuple(tuple(card.name for card in pile) for pile in game.player_deck.deck),
+		tuple(card.name for card in game.player_deck.discard),
+		tuple(tuple(card.name for card in pile) for pile in game.infection_deck.deck),
+		tuple(card.name for card in game.infection_deck.discard),
+		game.rng.getstate()
+	)
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from game_files.decks import Card, CardType
+from game_files.game import GameState
+from game_files.players import ActionCache, TurnPhase
+
+from helpers import new_game, random_action
+
+SEEDS = range(12)
+
+# available_actions of the player computed with an empty cache
+def cold_actions(game,player):
+	cache = player.action_cache
+	player.action_cache = ActionCache()
+	try:
+		return player.available_actions(game)
+	finally:
+		player.action_cache = cache
+
+def flatten(actions):
+	return [(action,option) for action,options in actions.items() for option in options]
+
+# Decision states of seeded random games
+def decisions(seed):
+	game = new_game(seed,players=2+seed%3)
+	rng = random.Random(seed)
+	while game.game_state==GameState.PLAYING:
+		yield game
+		game.do_action_index(random_action(game,rng))
+		game.advance()
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_cached_actions_match_cold_actions(seed):
+	for game in decisions(seed):
+		player = game.players[game.current_player]
+		# Twice: once filling the cache and once from the whole result
+		for repeat in range(2):
+			assert player.available_actions(game)==cold_actions(game,player)
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_sample_action_matches_choice(seed):
+	for game in decisions(seed):
+		if game.turn_phase!=TurnPhase.ACTIONS:
+			continue
+		player = game.players[game.current_player]
+		options = flatten(player.available_actions(game))
+		assert player.sample_action(game,random.Random(seed))==random.Random(seed).choice(options)
+
+def test_hand_order_is_part_of_the_key():
+	for game in decisions(3):
+		player = game.players[game.current_player]
+		if game.turn_phase==TurnPhase.ACTIONS and len(player.cards)>1:
+			break
+	player.available_actions(game)
+	# Same cards in another order: same hash, different option order
+	player.cards = player.cards[::-1]
+	assert player.available_actions(game)==cold_actions(game,player)
+
+def test_cure_variants_is_part_of_the_key():
+	game = new_game(0)
+	player = game.players[game.current_player]
+	# Six blue cards at the research station of the starting city: several choices of five
+	player.cards = [Card(name,CardType.CITY,game.cities[name].color) for name in ('atlanta','chicago','montreal','new_york','washington','san_francisco')]
+	variants = player.available_actions(game)['discover_cure']
+	player.cure_variants = False
+	canonical = player.available_actions(game)['discover_cure']
+	assert canonical==cold_actions(game,player)['discover_cure']
+	assert len(canonical)==1 and len(variants)>1
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from game_files.dataset import FIELDS, TrajectoryDataset, generate_trajectories
+
+def test_empty_dataset_has_no_rows(tmp_path):
+	dataset = TrajectoryDataset(str(tmp_path))
+	assert len(dataset)==0
+	rows = dataset.rows([],unpack=True)
+	assert all(len(rows[field])==0 for field in FIELDS)
+	assert list(dataset.batches(16))==[]
+	with pytest.raises(IndexError):
+		dataset.rows([0])
+
+def test_generate_trajectories_with_default_config(tmp_path):
+	dataset = generate_trajectories(str(tmp_path/"games"),games=2,workers=1,games_per_task=1)
+	again = generate_trajectories(str(tmp_path/"again"),games=2,workers=1,games_per_task=1)
+	assert len(dataset)==len(again)>0
+	rows = dataset.rows(np.arange(len(dataset)),unpack=True)
+	assert rows['dones'].sum()==2
+	assert rows['masks'][np.arange(len(dataset)),rows['actions']].all()
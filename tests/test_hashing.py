@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+from game_files.game import HASH_IDS_LIMIT, GameState
+from game_files.hashing import full_hash
+
+from helpers import new_game, play, random_action, snapshot
+
+SEEDS = range(12)
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_incremental_hash_matches_full_hash(seed):
+	game = new_game(seed,players=2+seed%3,verify_hash=True)
+	def check(game):
+		assert game.zobrist==full_hash(game)
+		game.get_hash()
+	play(game,random.Random(seed),check=check)
+	assert game.game_state!=GameState.PLAYING
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_undo_restores_every_step(seed):
+	game = new_game(seed,players=2+seed%3)
+	rng = random.Random(seed)
+	game.begin_journal()
+	while game.game_state==GameState.PLAYING:
+		before = snapshot(game)
+		steps = len(game.journal)
+		action = random_action(game,rng)
+		game.do_action_index(action)
+		game.advance()
+		after = snapshot(game)
+		while len(game.journal)>steps:
+			game.undo()
+		assert snapshot(game)==before
+		# Replaying the decision draws the same cards again
+		game.do_action_index(action)
+		game.advance()
+		assert snapshot(game)==after
+	while game.journal:
+		game.undo()
+	assert snapshot(game)==snapshot(new_game(seed,players=2+seed%3))
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_clones_are_independent(seed):
+	game = new_game(seed,players=2+seed%3)
+	rng = random.Random(seed)
+	while game.game_state==GameState.PLAYING:
+		clone = game.clone()
+		before = snapshot(game)
+		# The clone plays on (generators included) without touching the original
+		play(clone,random.Random(rng.random()),steps=8)
+		assert snapshot(game)==before
+		assert clone.zobrist==full_hash(clone)
+		# and the original plays on without touching a clone
+		clone = game.clone()
+		cloned = snapshot(clone)
+		play(game,rng,steps=1)
+		assert snapshot(clone)==cloned
+
+def test_verify_hash_keeps_a_bounded_history():
+	game = new_game(0,verify_hash=True)
+	game.commons['hash_ids'].update((-i,None) for i in range(HASH_IDS_LIMIT))
+	game.get_hash()
+	assert len(game.commons['hash_ids'])==1
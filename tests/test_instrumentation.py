@@ -0,0 +1,31 @@
+import pytest
+
+from game_files.agents import RandomPlayer
+from game_files.game import Game, GameState
+from game_files.instrumentation import AGENT_PHASES, ENGINE_PHASES, Instrumentation
+
+SEEDS = range(8)
+
+def played(seed,instruments=None):
+	game = Game([RandomPlayer() for p in range(2+seed%3)],log_game=False)
+	game.setup(seed=seed)
+	if instruments is not None:
+		instruments.attach(game)
+	states = []
+	while game.game_state==GameState.PLAYING and game.turn_phase.name!="INACTIVE":
+		game.game_turn()
+		states.append(game.get_id())
+	return game, states
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_instrumented_games_play_as_plain_games(seed):
+	instruments = Instrumentation()
+	game, states = played(seed,instruments)
+	plain, plain_states = played(seed)
+	assert states==plain_states
+	assert instruments.turns==len(states)
+	assert instruments.calls['do_action']==sum(instruments.action_calls.values())
+	assert instruments.calls['request_action']==instruments.calls['do_action']
+	assert instruments.calls['request_discard']==instruments.calls['do_discard']
+	assert sum(instruments.decisions.values())==instruments.calls['do_action']+instruments.calls['do_discard']
+	assert set(instruments.as_dict()['phases'])==set(AGENT_PHASES+ENGINE_PHASES)
@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from game_files.game import GameState
+from game_files.records import MAX_SEED, GameRecord, GameRecorder, Replayer
+
+from helpers import new_game, play
+
+@pytest.mark.parametrize("seed",[0,12345,MAX_SEED])
+def test_records_replay_any_64_bit_seed(seed):
+	game = new_game(seed)
+	recorder = GameRecorder(game)
+	play(game,random.Random(0))
+	record, size = GameRecord.from_bytes(recorder.finish().to_bytes())
+	assert record.seed==seed and record.result==game.game_state!=GameState.PLAYING
+	replayer = Replayer(record)
+	assert replayer.game_at(len(replayer)).get_id()==game.get_id()
+
+@pytest.mark.parametrize("seed",[-1,MAX_SEED+1])
+def test_seeds_out_of_range_are_rejected(seed):
+	record = GameRecord(2,4,"atlanta",24,[],seed)
+	with pytest.raises(ValueError,match="does not fit"):
+		record.to_bytes()
+	game = new_game(0)
+	game.seed = seed
+	with pytest.raises(ValueError,match="does not fit"):
+		GameRecorder(game)
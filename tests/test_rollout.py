@@ -0,0 +1,44 @@
+import random
+
+import pytest
+
+from game_files.game import GameState, copy_rng
+from game_files.rollout import RolloutGame
+
+from helpers import new_game
+
+SEEDS = range(40)
+
+# State of a RolloutGame, hands as sets of cards (their order does not change any rule)
+def rollout_state(rollout):
+	state = {key: value for key,value in rollout.__dict__.items() if key not in ('rng','tables','handlers')}
+	state['hands'] = [sorted(hand) for hand in rollout.hands]
+	return state
+
+def lockstep(seed):
+	game = new_game(seed,players=2+seed%3)
+	rollout = RolloutGame(game,copy_rng(game.rng))
+	rng = random.Random(seed)
+	epidemics = cascades = 0
+	while game.game_state==GameState.PLAYING:
+		legal = game.action_space.legal_action_mask(game).nonzero()[0].tolist()
+		assert rollout.legal_actions()==legal
+		action = rng.choice(legal)
+		infections, outbreaks = game.infection_counter, game.outbreak_counter
+		game.do_action_index(action)
+		game.advance()
+		rollout.step(action)
+		epidemics += game.infection_counter-infections
+		cascades += game.outbreak_counter-outbreaks>1
+		assert rollout_state(rollout)==rollout_state(RolloutGame(game))
+		# Cards were drawn and shuffled from the same generator in the same way
+		assert rollout.rng.getstate()==game.rng.getstate()
+	return epidemics, cascades
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_rollout_game_plays_as_game(seed):
+	lockstep(seed)
+
+def test_lockstep_covers_epidemics_and_cascades():
+	epidemics, cascades = map(sum,zip(*[lockstep(seed) for seed in SEEDS]))
+	assert epidemics>0 and cascades>0
@@ -0,0 +1,72 @@
+import random
+
+import numpy as np
+import pytest
+
+from game_files.game import Game, GameState
+from game_files.hashing import full_hash
+from game_files.state import CompactGame
+
+from helpers import new_game, play, random_action, snapshot
+
+SEEDS = range(12)
+
+# Everything a client or an agent reads from a game
+def observed(game):
+	state = game()
+	state['game_log'] = None
+	return state, game.get_id(), game.zobrist, game.lost(), game.won(), game.observation().tolist(), game.action_space.legal_action_mask(game).tolist()
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_compact_game_plays_as_game(seed):
+	game = new_game(seed,players=2+seed%3)
+	compact = new_game(seed,players=2+seed%3,game_class=CompactGame)
+	rng = random.Random(seed)
+	assert observed(compact)==observed(game)
+	while game.game_state==GameState.PLAYING:
+		action = random_action(game,rng)
+		for g in (game,compact):
+			g.do_action_index(action)
+			g.advance()
+		assert observed(compact)==observed(game)
+	assert compact.game_state==game.game_state
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_compact_clones_copy_the_arrays_on_write(seed):
+	game = new_game(seed,players=2+seed%3,game_class=CompactGame)
+	rng = random.Random(seed)
+	while game.game_state==GameState.PLAYING:
+		clone = game.clone()
+		before = snapshot(game)
+		cubes = game.state.cubes.copy()
+		play(clone,random.Random(rng.random()),steps=8)
+		assert snapshot(game)==before
+		assert np.array_equal(game.state.cubes,cubes)
+		assert clone.zobrist==full_hash(clone)
+		clone = game.clone()
+		cloned = snapshot(clone)
+		play(game,rng,steps=1)
+		assert snapshot(clone)==cloned
+
+@pytest.mark.parametrize("seed",SEEDS)
+def test_compact_undo_restores_every_step(seed):
+	game = new_game(seed,players=2+seed%3,game_class=CompactGame)
+	shared = game.clone()
+	shared_state = snapshot(shared)
+	rng = random.Random(seed)
+	game.begin_journal()
+	while game.game_state==GameState.PLAYING:
+		before = snapshot(game)
+		steps = len(game.journal)
+		action = random_action(game,rng)
+		game.do_action_index(action)
+		game.advance()
+		after = snapshot(game)
+		while len(game.journal)>steps:
+			game.undo()
+		assert snapshot(game)==before
+		game.do_action_index(action)
+		game.advance()
+		assert snapshot(game)==after
+	# The clone taken before the first step never saw any of it
+	assert snapshot(shared)==shared_state
@@ -0,0 +1,67 @@
+import random
+
+import numpy as np
+import pytest
+
+from game_files.game import GameState
+from game_files.vector import VectorGame
+
+from helpers import new_game
+
+FIELDS = ('cubes','research_stations','research_station_counter','cures','eradicated','remaining_disease_cubes','positions','hands','roles','special_move','player_top','player_remaining','infection_deck','infection_drawn','infection_counter','infection_rate','outbreak_counter',
+	'current_player','real_current_player','actions','current_turn','turn_phase','game_state')
+
+# VectorGame shuffles with its own generator: after the last epidemic of a step the intensified pile takes the order Game gave it,
+# then the infections of the step draw the same cards
+def follow_intensify(vector,games,epidemics):
+	intensify = vector.intensify
+	calls = np.zeros(len(games),dtype=int)
+	def follow(g):
+		intensify(g)
+		calls[g] += 1
+		for n in g[calls[g]==epidemics[g]]:
+			shuffled = VectorGame.from_games([games[n]]).infection_deck[0]
+			assert sorted(vector.infection_deck[n])==sorted(shuffled)
+			vector.infection_deck[n] = shuffled
+	vector.intensify = follow
+
+def lockstep(seed,n_games=4):
+	players = 2+seed%3
+	games = [new_game(seed*n_games+n,players=players) for n in range(n_games)]
+	vector = VectorGame.from_games(games,seed=seed)
+	rng = random.Random(seed)
+	epidemics = cascades = 0
+	while not vector.done.all():
+		mask = vector.legal_action_mask()
+		actions = np.zeros(n_games,dtype=np.intp)
+		infections = np.array([game.infection_counter for game in games])
+		outbreaks = np.array([game.outbreak_counter for game in games])
+		for n,game in enumerate(games):
+			if game.game_state!=GameState.PLAYING:
+				continue
+			legal = game.action_space.legal_action_mask(game)
+			assert np.array_equal(mask[n],legal)
+			actions[n] = rng.choice(legal.nonzero()[0].tolist())
+			game.do_action_index(actions[n])
+			game.advance()
+		stepped = np.array([game.infection_counter for game in games])-infections
+		follow_intensify(vector,games,stepped)
+		vector.step(actions,check=True)
+		del vector.intensify
+		epidemics += stepped.sum()
+		cascades += (np.array([game.outbreak_counter for game in games])-outbreaks>1).sum()
+		expected = VectorGame.from_games(games)
+		for field in FIELDS:
+			assert np.array_equal(getattr(vector,field),getattr(expected,field)), field
+		# Cards above player_top were drawn already
+		for n in range(n_games):
+			assert np.array_equal(vector.player_deck[n,vector.player_top[n]:],expected.player_deck[n,expected.player_top[n]:])
+	return epidemics, cascades
+
+@pytest.mark.parametrize("seed",range(10))
+def test_vector_game_plays_as_game(seed):
+	lockstep(seed)
+
+def test_lockstep_covers_epidemics_and_cascades():
+	epidemics, cascades = map(sum,zip(*[lockstep(seed) for seed in range(10)]))
+	assert epidemics>0 and cascades>0